@@ -1,8 +1,25 @@
+import os
 import streamlit as st
+# Imported ahead of the page modules, which it times as the first run's imports phase
+from rerun_profiler import (
+    RERUN_PROFILE_OVERLAY,
+    import_seconds,
+    phase,
+    profile_overlay,
+    profiled_rerun,
+    record_phase,
+)
+import pandas as pd
 from auth import sign_up, sign_in, sign_out, get_user_data, update_user_data
 from scoreboard import display_scoreboard
-from teaching_assistant import teaching_assistant_tab
-from quiz import main as quiz_main
+from teaching_assistant import teaching_assistant_tab, semantic_cache
+from quiz import main as quiz_main, quiz_cache, hint_cache
+from question_bank import question_bank
+from asset_cache import assets
+from session_store import restore_session, persist_session
+import llm_metrics
+from llm_router import router
+IMPORT_SECONDS = import_seconds()
 
 # Set page configuration at the very beginning
 st.set_page_config(page_title="Linguify", page_icon="🌍", layout="wide")
@@ -23,16 +40,65 @@ page_bg_color = '''
     </style>
 '''
 
+# Usernames allowed to see the model metrics panel
+ADMIN_USERS = {
+    name.strip() for name in os.getenv("LINGUIFY_ADMINS", "").split(",") if name.strip()
+}
+
+def metrics_panel():
+    with st.sidebar.expander("Model metrics"):
+        rows = llm_metrics.summary()
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        else:
+            st.write("No model calls recorded yet.")
+        caches = {
+            "Quiz cache": quiz_cache,
+            "Question bank": question_bank,
+            "Hint cache": hint_cache,
+            "Assistant semantic cache": semantic_cache,
+        }
+        st.dataframe(
+            pd.DataFrame(
+                [{"cache": name, **cache.stats()} for name, cache in caches.items()]
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
+        providers, hedges, failovers = router.stats()
+        st.dataframe(pd.DataFrame(providers), hide_index=True, use_container_width=True)
+        st.caption(f"{hedges} hedged request(s), {failovers} failover(s)")
+        st.download_button(
+            "Download Prometheus metrics",
+            llm_metrics.render_prometheus(),
+            file_name="linguify_metrics.prom",
+            mime="text/plain",
+        )
+
+@profiled_rerun("Sign in")
 def main():
-    # Apply the custom CSS
-    st.markdown(page_bg_color, unsafe_allow_html=True)
+    llm_metrics.start_exporter()
+    record_phase("imports", IMPORT_SECONDS)
+
+    with phase("header"):
+        # Apply the custom CSS
+        st.markdown(page_bg_color, unsafe_allow_html=True)
+
+        # Create two columns for the logo
+        col1, col2 = st.columns([1, 3])
 
-    # Create two columns for the logo
-    col1, col2 = st.columns([1, 3])
+        # Place the image in the first column
+        with col1:
+            st.image(
+                assets.read_static("Linguify-Blue-logo latest.png"),
+                use_column_width="auto",
+            )
 
-    # Place the image in the first column
-    with col1:
-        st.image("Linguify-Blue-logo latest.png", use_column_width="auto") 
+    # Pick up this session's quiz state from the shared store.
+    # The session id in the URL doesn't sign anyone in, so a
+    # new replica restores it once the learner signs in again.
+    with phase("restore_session"):
+        restore_session()
 
     # Check if user is in session state
     if "user" not in st.session_state:
@@ -63,6 +129,10 @@ def main():
             sign_out()
             st.rerun()
 
+        if st.session_state.user in ADMIN_USERS:
+            with phase("metrics_panel"):
+                metrics_panel()
+
         # Main content area
         if app_mode == "Quiz":
             st.title("Quiz")
@@ -74,5 +144,12 @@ def main():
             st.title("Scoreboard")
             display_scoreboard()
 
+    # Rendered last, so it shows every phase of this run but its own
+    if RERUN_PROFILE_OVERLAY or st.session_state.user in ADMIN_USERS:
+        profile_overlay()
+
+    with phase("persist_session"):
+        persist_session()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
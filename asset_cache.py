@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+import urllib.request
+from collections import OrderedDict
+from contextlib import suppress
+
+from cache import CACHE_DIR
+
+
+class AssetCache:
+    """Content-addressed store for binary assets such as generated images.
+
+    Each asset is written once under the SHA-256 of its bytes, and the directory is
+    trimmed back to max_disk_bytes by evicting the least recently used files. Recently
+    used assets are also kept in memory, up to max_memory_bytes, so serving them does
+    not touch the disk.
+    """
+
+    def __init__(
+        self, name, max_disk_bytes=200 * 1024 * 1024, max_memory_bytes=32 * 1024 * 1024
+    ):
+        self.directory = os.path.join(CACHE_DIR, name)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._static = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest)
+
+    def _remember(self, digest, data):
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return
+            self._memory[digest] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def put(self, data):
+        """Store data and return its content hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._evict()
+        self._remember(digest, data)
+        return digest
+
+    def fetch(self, url, timeout=30):
+        """Download url once and return the content hash of its bytes."""
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return self.put(response.read())
+
+    def get(self, digest):
+        """Return the bytes stored under digest, or None if it has been evicted."""
+        with self._lock:
+            data = self._memory.get(digest)
+            if data is not None:
+                self._memory.move_to_end(digest)
+                return data
+        try:
+            with open(self._path(digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        # Touch the file so disk eviction sees it as recently used
+        os.utime(self._path(digest))
+        self._remember(digest, data)
+        return data
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            with suppress(OSError):
+                os.remove(path)
+            total -= size
+
+    def read_static(self, path):
+        """Return a static file's bytes, re-reading it only when its mtime changes."""
+        mtime = os.path.getmtime(path)
+        cached = self._static.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, "rb") as f:
+                cached = (mtime, f.read())
+            self._static[path] = cached
+        return cached[1]
+
+
+# Process-wide cache shared by every module that serves assets
+assets = AssetCache(
+    "assets",
+    max_disk_bytes=int(os.getenv("ASSET_CACHE_MAX_BYTES", str(200 * 1024 * 1024))),
+)
@@ -1,7 +1,13 @@
+import os
 import streamlit as st
+from user_store import SQLiteUserStore
+from session_store import end_session
 
-# User data storage
-users = {}
+# User data storage, shared by every app process through one SQLite database
+users = SQLiteUserStore(
+    os.getenv("LINGUIFY_DB_PATH", "linguify.db"),
+    pool_size=int(os.getenv("LINGUIFY_DB_POOL_SIZE", "4")),
+)
 
 def sign_up():
     st.subheader("Sign Up")
@@ -9,15 +15,14 @@ def sign_up():
     password = st.text_input("Password", type="password", key="signup_password")
     if st.button("Create Account"):
         if username and password:
-            if username not in users:
-                users[username] = {
+            if users.create_user(username, {
                     "password": password,
                     "level": 1,
                     "experience": 0,
                     "streak": 0,
                     "completed_quizzes": 0,
                     "weak_areas": []
-                }
+                }):
                 return True
             else:
                 st.error("Username already exists.")
@@ -30,7 +35,7 @@ def sign_in():
     username = st.text_input("Username", key="signin_username")
     password = st.text_input("Password", type="password", key="signin_password")
     if st.button("Sign In"):
-        if username in users and users[username]["password"] == password:
+        if users.verify_password(username, password):
             return username
         else:
             st.error("Invalid username or password.")
@@ -38,10 +43,18 @@ def sign_in():
 
 def sign_out():
     st.session_state.user = None
+    end_session()
 
 def get_user_data(username):
-    return users.get(username, None)
+    return users.get_user(username)
 
 def update_user_data(username, data):
-    if username in users:
-        users[username].update(data)
\ No newline at end of file
+    users.update_user(username, data)
+
+def add_weak_area(username, topic):
+    """Atomically record topic as the user's most recent weak area."""
+    users.add_weak_area(username, topic)
+
+def increment_user_data(username, level_threshold=None, **deltas):
+    """Atomically add deltas to a user's counters and return the updated user data."""
+    return users.increment(username, deltas, level_threshold=level_threshold)
\ No newline at end of file
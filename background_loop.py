@@ -0,0 +1,25 @@
+import asyncio
+import threading
+
+# One event loop per process, running in a daemon thread. Async
+# clients and semaphores are bound to the loop they are first used
+# on, so sharing a single loop lets every Streamlit session reuse
+# them instead of building new ones under asyncio.run on each rerun.
+_loop = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="background-loop", daemon=True
+            ).start()
+    return _loop
+
+
+def submit(coro):
+    """Schedule coro on the background loop; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
@@ -0,0 +1,289 @@
+"""Micro-benchmarks for the app's hot paths: python benchmarks.py [name ...]"""
+
+import random
+import sys
+import time
+
+
+def timed(fn, repeat=5):
+    """Return the best wall-clock time of fn() over repeat runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_leaderboard(sizes=(10_000, 100_000, 1_000_000)):
+    """Indexed SQLite top-10 and rank queries vs. the old DataFrame sort."""
+    import os
+    import sqlite3
+    import tempfile
+
+    import pandas as pd
+
+    from user_store import SQLiteUserStore
+
+    for n in sizes:
+        users = {
+            f"user{i}": {
+                "experience": random.randint(0, 5000),
+                "completed_quizzes": random.randint(0, 200),
+            }
+            for i in range(n)
+        }
+
+        def dataframe_top(users=users):
+            df = pd.DataFrame(
+                [
+                    {
+                        "Username": username,
+                        "Experience": data["experience"],
+                        "Quizzes Completed": data["completed_quizzes"],
+                    }
+                    for username, data in users.items()
+                ]
+            )
+            df = df.sort_values(by="Experience", ascending=False).reset_index(drop=True)
+            df.insert(0, "Rank", df.index + 1)
+            return df.head(10)
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteUserStore(os.path.join(directory, "users.db"))
+            with sqlite3.connect(store.path) as conn:
+                conn.executemany(
+                    "INSERT INTO users "
+                    "(username, password, experience, completed_quizzes) "
+                    "VALUES (?, '', ?, ?)",
+                    [
+                        (username, data["experience"], data["completed_quizzes"])
+                        for username, data in users.items()
+                    ],
+                )
+            names = list(users)
+
+            def top(store=store):
+                return store.leaderboard(10)
+
+            def rank(store=store, names=names):
+                return store.rank(random.choice(names))
+
+            # The worst case for counting the users ahead
+            bottom = min(users, key=lambda name, users=users: users[name]["experience"])
+
+            def bottom_rank(store=store, bottom=bottom):
+                return store.rank(bottom)
+
+            def count(store=store):
+                return store.count()
+
+            print(
+                f"leaderboard n={n:>9,}: "
+                f"dataframe top10 {timed(dataframe_top, 3):9.2f} ms | "
+                f"sqlite top10 {timed(top):.4f} ms | "
+                f"sqlite rank {timed(rank):.4f} ms | "
+                f"bottom rank {timed(bottom_rank):.4f} ms | "
+                f"count {timed(count):.4f} ms"
+            )
+
+
+def bench_parsers(directory=None):
+    """Parse throughput and invalid-question rate over recorded responses.
+
+    Without a corpus recorded with RECORD_RESPONSES_DIR, uses the sample one in
+    fixtures/responses.
+    """
+    import os
+
+    import response_corpus
+    from quiz import parse_quiz_data, parse_structured_quiz, validate_question
+    from teaching_assistant import parse_lesson_data, parse_structured_lesson
+
+    parsers = {
+        "quiz": (parse_structured_quiz, parse_quiz_data, validate_question),
+        "lesson": (parse_structured_lesson, parse_lesson_data, lambda row: bool(row)),
+    }
+    directory = (
+        directory
+        or response_corpus.CORPUS_DIR
+        or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "fixtures", "responses"
+        )
+    )
+    for kind, (structured_parser, text_parser, is_valid) in parsers.items():
+        corpus = response_corpus.load(kind, directory)
+        if not corpus:
+            print(
+                f"parsers {kind}: no responses in {directory} "
+                "(set RECORD_RESPONSES_DIR while using the app)"
+            )
+            continue
+        for structured in (True, False):
+            contents = [
+                entry["content"]
+                for entry in corpus
+                if entry["structured"] == structured
+            ]
+            if not contents:
+                continue
+            parser = structured_parser if structured else text_parser
+            elapsed = (
+                timed(
+                    lambda parser=parser, contents=contents: [
+                        parser(c) for c in contents
+                    ]
+                )
+                / 1000
+            )
+            items = [item for c in contents for item in parser(c)]
+            invalid = sum(1 for item in items if not is_valid(item))
+            empty = sum(
+                1 for c in contents if not any(is_valid(item) for item in parser(c))
+            )
+            label = "structured" if structured else "text"
+            print(
+                f"parsers {kind} {label:>10}: {len(contents)} responses, "
+                f"{len(contents) / elapsed:,.0f} responses/s, "
+                f"{len(items) / elapsed:,.0f} items/s, "
+                f"invalid items {invalid / max(len(items), 1):.1%}, "
+                f"unusable responses {empty / len(contents):.1%}"
+            )
+
+
+def bench_grading(submissions=500, questions=20):
+    """AnswerKey.grade_batch vs. check_answer per answer, as quiz.main used to grade."""
+    from grading import AnswerKey
+    from quiz import check_answer
+
+    words = ["casa", "perro", "café", "niño", "árbol", "ciudad", "comer", "hablar"]
+    quiz = []
+    for i in range(questions):
+        if i % 3 == 2:
+            quiz.append(
+                {
+                    "question": "Yo ___ y tú ___.",
+                    "clue": "verbs",
+                    "answer": "como, hablas",
+                }
+            )
+        else:
+            quiz.append({"question": f"Question {i}", "answer": random.choice(words)})
+    batch = []
+    for _ in range(submissions):
+        answers = {}
+        for i, question in enumerate(quiz):
+            if "clue" in question:
+                answers[i] = random.choice([["como", "hablas"], ["Como ", "hablo"]])
+            else:
+                answers[i] = random.choice(
+                    [
+                        question["answer"],
+                        question["answer"].upper(),
+                        random.choice(words),
+                    ]
+                )
+        batch.append(answers)
+
+    def per_answer():
+        return [
+            [
+                check_answer(answers.get(i, ""), question["answer"])
+                for i, question in enumerate(quiz)
+            ]
+            for answers in batch
+        ]
+
+    def vectorized():
+        return AnswerKey(quiz).grade_batch(batch)
+
+    per_answer_ms, vectorized_ms = timed(per_answer), timed(vectorized)
+    total = submissions * questions
+    print(
+        f"grading {submissions} submissions x {questions} questions: "
+        f"check_answer {per_answer_ms:.2f} ms "
+        f"({total / per_answer_ms * 1000:,.0f} answers/s) | "
+        f"grade_batch {vectorized_ms:.2f} ms "
+        f"({total / vectorized_ms * 1000:,.0f} answers/s, "
+        f"including NFKC and accent folding)"
+    )
+
+
+def bench_reviews(sizes=(10_000, 100_000, 1_000_000)):
+    """Due-queue lookups in review.UserReviews vs. scanning every item."""
+    from review import ReviewItem, UserReviews
+
+    now = time.time()
+    for n in sizes:
+        items = [
+            ReviewItem(f"q{i}", "{}", "", now + random.uniform(-86400, 30 * 86400))
+            for i in range(n)
+        ]
+        user = UserReviews(items, time.monotonic())
+
+        def scan(items=items):
+            return sorted(
+                (item for item in items if item.due <= now), key=lambda item: item.due
+            )[:10]
+
+        def reschedule(user=user, items=items, n=n):
+            user.push(items[0], n)
+
+        print(
+            f"reviews n={n:>9,}: scan {timed(scan, 3):9.2f} ms | "
+            f"heap due10 {timed(lambda user=user: user.due(now, 10)):.4f} ms | "
+            f"reschedule {timed(reschedule):.4f} ms"
+        )
+
+
+def bench_progress(users=10_000, days=180, events_per_day=5_000):
+    """Weekly leaderboard from ProgressLog's rollups vs. the raw event log."""
+    import os
+    import tempfile
+
+    import numpy as np
+    import pandas as pd
+
+    from progress_log import DAY, EVENT_DTYPE, ProgressLog
+
+    directory = tempfile.mkdtemp()
+    log = ProgressLog(
+        os.path.join(directory, "events.bin"), os.path.join(directory, "progress.db")
+    )
+    now = time.time()
+    events = np.zeros(days * events_per_day, dtype=EVENT_DTYPE)
+    events["time"] = np.sort(np.random.uniform(now - days * DAY, now, len(events)))
+    events["user"] = np.random.randint(1, users + 1, len(events))
+    events["experience"] = np.random.randint(0, 100, len(events))
+    events["quizzes"] = 1
+    events.tofile(log.log_path)
+    log.rebuild_rollups()
+
+    def raw_top():
+        frame = pd.DataFrame(np.fromfile(log.log_path, dtype=EVENT_DTYPE))
+        recent = frame[frame["time"] >= int(now // DAY - 6) * DAY]
+        return (
+            recent.groupby("user")[["experience", "quizzes"]]
+            .sum()
+            .nlargest(10, "experience")
+        )
+
+    print(
+        f"progress {len(events):,} events, {users:,} users, {days} days: "
+        f"raw events top10/week {timed(raw_top, 3):.1f} ms | "
+        f"daily rollups top10/week {timed(lambda: log.top(7, now=now), 3):.1f} ms | "
+        f"user history/30 days {timed(lambda: log.history(1, 30, now=now)):.2f} ms"
+    )
+
+
+BENCHMARKS = {
+    "leaderboard": bench_leaderboard,
+    "parsers": bench_parsers,
+    "grading": bench_grading,
+    "reviews": bench_reviews,
+    "progress": bench_progress,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
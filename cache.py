@@ -0,0 +1,115 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from sqlite_db import SQLiteDatabase
+
+# Directory for on-disk cache files (excluded from pyright via pyproject.toml)
+CACHE_DIR = os.getenv("LINGUIFY_CACHE_DIR", ".cache")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_by_use ON entries (used_at);
+"""
+
+
+class PersistentLRUCache:
+    """Size-bounded LRU cache with a per-entry TTL, stored in SQLite.
+
+    Each entry is its own row, so a set writes only that entry, and every app process
+    sharing CACHE_DIR reads and writes the same entries instead of overwriting each
+    other's.
+    """
+
+    def __init__(self, name, max_entries=256, ttl=3600, timeout=10.0):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.path = os.path.join(CACHE_DIR, f"{name}.db")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._db = SQLiteDatabase(self.path, pool_size=2, timeout=timeout)
+        self._db.executescript(SCHEMA)
+        # Guards the hit and miss counters
+        self._lock = threading.Lock()
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def get(self, key):
+        try:
+            with self._db.connection() as conn:
+                row = conn.execute(
+                    "SELECT stored_at, value FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self._expired(row[0]):
+                    conn.execute(
+                        "DELETE FROM entries WHERE key = ? AND stored_at = ?",
+                        (key, row[0]),
+                    )
+                    row = None
+                if row is not None:
+                    conn.execute(
+                        "UPDATE entries SET used_at = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+        except sqlite3.Error as e:
+            print(f"Could not read cache {self.path}: {str(e)}")
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[1])
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        """Store several (key, value) pairs in one transaction."""
+        now = time.time()
+        rows = [(key, now, now, json.dumps(value)) for key, value in items]
+        if not rows:
+            return
+        try:
+            with self._db.transaction() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"Could not persist cache {self.path}: {str(e)}")
+
+    def _evict(self, conn, now):
+        # Drop expired entries, then the least recently used beyond max_entries
+        if self.ttl is not None:
+            conn.execute("DELETE FROM entries WHERE stored_at < ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+            "ORDER BY used_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        with self._db.connection() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        with self._db.connection() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
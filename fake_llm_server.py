@@ -0,0 +1,420 @@
+"""Local stand-in for the OpenAI and Gemini HTTP APIs, for load tests.
+
+Serves OpenAI chat completions and image generations under /v1 and Gemini
+generateContent / streamGenerateContent under /v1beta, answering from
+fixtures/llm_responses.json with configurable latency, streaming chunk delay and
+injected failures.
+
+python fake_llm_server.py --port 8900 --latency 0.5 --jitter 0.5 --failure-rate 0.02
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1 and
+GEMINI_API_ENDPOINT=http://127.0.0.1:8900.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import struct
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "llm_responses.json"
+)
+
+
+def tiny_png():
+    # A 1x1 white PNG, served as every generated image
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(b"\x00\xff\xff\xff"))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeLLMConfig:
+    def __init__(
+        self,
+        latency=0.5,
+        jitter=0.0,
+        chunk_delay=0.02,
+        chunk_size=40,
+        failure_rate=0.0,
+        fixtures_path=FIXTURES_PATH,
+        provider_latency=None,
+        provider_failure_rate=None,
+    ):
+        self.latency = latency
+        # Per-provider overrides ("openai", "gemini"),
+        # to simulate one provider degrading
+        self.provider_latency = provider_latency or {}
+        self.provider_failure_rate = provider_failure_rate or {}
+        self.jitter = jitter
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.failure_rate = failure_rate
+        with open(fixtures_path) as f:
+            self.fixtures = json.load(f)
+        self.requests = 0
+        self.failures = 0
+
+
+def quiz_text(fixtures, count, structured=False):
+    """Build a quiz of count questions in the prompt's format from the fixtures."""
+    questions = []
+    for i in range(count):
+        question = dict(fixtures["quiz_questions"][i % len(fixtures["quiz_questions"])])
+        # Keep questions distinct so generate_quiz's de-duplication accepts all of them
+        question["question"] = f"{question['question']} (#{random.randrange(10**6)})"
+        questions.append(question)
+    if structured:
+        return json.dumps({"questions": questions})
+    lines = []
+    for question in questions:
+        lines.append(f"Question: {question['question']}")
+        if "choices" in question:
+            lines.append(
+                "Choices: "
+                + ", ".join(
+                    f"{label}) {choice}"
+                    for label, choice in zip("ABCD", question["choices"], strict=False)
+                )
+            )
+        if "clue" in question:
+            lines.append(f"Clue: {question['clue']}")
+        lines.append(f"Correct answer: {question['answer']}")
+        lines.append(f"Explanation: {question['explanation']}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def role_answer(fixtures, text, structured):
+    """Answer prompts written for a system role; either provider may be sent them."""
+    if "language teacher" in text:
+        rows = fixtures["lesson_rows"]
+        return json.dumps({"rows": rows} if structured else rows)
+    for marker, fixture in (
+        ("exercise creator", "exercise"),
+        ("career counselor", "roadmap"),
+        ("storyteller", "story"),
+        ("cover art", "cover"),
+    ):
+        if marker in text:
+            return fixtures[fixture]
+    return None
+
+
+def gemini_answer(fixtures, prompt, structured):
+    answer = role_answer(fixtures, prompt, structured)
+    if answer is not None:
+        return answer
+    if "hint for each of the following" in prompt:
+        count = len(re.findall(r'^\s*\d+\. "', prompt, re.M))
+        return "\n".join(f"Hint {i + 1}: {fixtures['hint']}" for i in range(count))
+    if "Provide a helpful hint" in prompt:
+        return fixtures["hint"]
+    match = re.search(r"Include (\d+) questions", prompt)
+    return quiz_text(fixtures, int(match.group(1)) if match else 5, structured)
+
+
+def openai_answer(fixtures, messages, structured):
+    system = (
+        messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    )
+    answer = role_answer(fixtures, system, structured)
+    if answer is not None:
+        return answer
+    prompt = " ".join(message.get("content") or "" for message in messages)
+    # Quiz and hint prompts, failed over from Gemini
+    if "helpful hint" in prompt or re.search(r"Include \d+ questions", prompt):
+        return gemini_answer(fixtures, prompt, structured)
+    return fixtures["chat"]
+
+
+def token_count(text):
+    return max(1, len(text) // 4)
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _pieces(self, text):
+        size = self.config.chunk_size
+        return [text[i : i + size] for i in range(0, len(text), size)] or [""]
+
+    def _inject(self, provider):
+        """Sleep for the configured latency; return True if this request should fail."""
+        config = self.config
+        config.requests += 1
+        time.sleep(
+            config.provider_latency.get(provider, config.latency)
+            + random.uniform(0, config.jitter)
+        )
+        if random.random() < config.provider_failure_rate.get(
+            provider, config.failure_rate
+        ):
+            config.failures += 1
+            status = random.choice([429, 500, 503])
+            self._send_json(
+                status,
+                {
+                    "error": {
+                        "code": status,
+                        "message": "Injected failure",
+                        "status": "UNAVAILABLE",
+                    }
+                },
+            )
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path.startswith("/images/"):
+            body = tiny_png()
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = json.loads(
+            self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}"
+        )
+        provider = (
+            "gemini"
+            if url.path.rsplit(":", 1)[-1]
+            in ("generateContent", "streamGenerateContent")
+            else "openai"
+        )
+        if self._inject(provider):
+            return
+        if url.path.endswith("/chat/completions"):
+            self._openai_chat(body)
+        elif url.path.endswith("/images/generations"):
+            host = self.headers.get("Host", f"127.0.0.1:{self.server.server_port}")
+            self._send_json(
+                200,
+                {
+                    "created": int(time.time()),
+                    "data": [{"url": f"http://{host}/images/fake.png"}],
+                },
+            )
+        elif ":generateContent" in url.path or ":streamGenerateContent" in url.path:
+            self._gemini(url, body)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {url.path}"}})
+
+    def _openai_chat(self, body):
+        structured = (body.get("response_format") or {}).get("type") in (
+            "json_schema",
+            "json_object",
+        )
+        text = openai_answer(self.config.fixtures, body.get("messages", []), structured)
+        prompt_tokens = sum(
+            token_count(m.get("content") or "") for m in body.get("messages", [])
+        )
+        base = {
+            "id": f"chatcmpl-fake{random.randrange(10**9)}",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+        }
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": token_count(text),
+            "total_tokens": prompt_tokens + token_count(text),
+        }
+        if not body.get("stream"):
+            self._send_json(
+                200,
+                {
+                    **base,
+                    "object": "chat.completion",
+                    "usage": usage,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": text},
+                        }
+                    ],
+                },
+            )
+            return
+        self._start_stream("text/event-stream")
+        for piece in self._pieces(text):
+            chunk = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [
+                    {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                ],
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            time.sleep(self.config.chunk_delay)
+        final = {
+            **base,
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        self._write_chunk(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+        self._end_stream()
+
+    def _gemini(self, url, body):
+        prompt = " ".join(
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        config = body.get("generationConfig") or body.get("generation_config") or {}
+        structured = (
+            config.get("responseMimeType") or config.get("response_mime_type")
+        ) == "application/json"
+        text = gemini_answer(self.config.fixtures, prompt, structured)
+        usage = {
+            "promptTokenCount": token_count(prompt),
+            "candidatesTokenCount": token_count(text),
+            "totalTokenCount": token_count(prompt) + token_count(text),
+        }
+
+        def response(piece, final):
+            candidate = {
+                "content": {"parts": [{"text": piece}], "role": "model"},
+                "index": 0,
+            }
+            if final:
+                candidate["finishReason"] = "STOP"
+            payload = {"candidates": [candidate]}
+            if final:
+                payload["usageMetadata"] = usage
+            return payload
+
+        if ":generateContent" in url.path:
+            self._send_json(200, response(text, True))
+            return
+        pieces = self._pieces(text)
+        sse = parse_qs(url.query).get("alt", [""])[0] == "sse"
+        self._start_stream("text/event-stream" if sse else "application/json")
+        if not sse:
+            self._write_chunk(b"[")
+        for i, piece in enumerate(pieces):
+            data = json.dumps(response(piece, i == len(pieces) - 1))
+            if sse:
+                self._write_chunk(f"data: {data}\r\n\r\n".encode())
+            else:
+                self._write_chunk(((",\r\n" if i else "") + data).encode())
+            time.sleep(self.config.chunk_delay)
+        if not sse:
+            self._write_chunk(b"]")
+        self._end_stream()
+
+
+def make_server(config, host="127.0.0.1", port=0):
+    """Create a server for config; port 0 picks a free port (see server.server_port)."""
+    handler = type("ConfiguredFakeLLMHandler", (FakeLLMHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="seconds before the first byte"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="extra random latency, up to this many seconds",
+    )
+    parser.add_argument(
+        "--chunk-delay",
+        type=float,
+        default=0.02,
+        help="seconds between streamed chunks",
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.0,
+        help="fraction of requests answered with 429/5xx",
+    )
+    for provider in ("gemini", "openai"):
+        parser.add_argument(
+            f"--{provider}-latency",
+            type=float,
+            help=f"override --latency for {provider}",
+        )
+        parser.add_argument(
+            f"--{provider}-failure-rate",
+            type=float,
+            help=f"override --failure-rate for {provider}",
+        )
+    args = parser.parse_args()
+
+    def overrides(name):
+        return {
+            provider: getattr(args, f"{provider}_{name}")
+            for provider in ("gemini", "openai")
+            if getattr(args, f"{provider}_{name}") is not None
+        }
+
+    server = make_server(
+        FakeLLMConfig(
+            args.latency,
+            args.jitter,
+            args.chunk_delay,
+            failure_rate=args.failure_rate,
+            provider_latency=overrides("latency"),
+            provider_failure_rate=overrides("failure_rate"),
+        ),
+        args.host,
+        args.port,
+    )
+    print(f"Fake LLM server listening on http://{args.host}:{server.server_port}")
+    server.serve_forever()
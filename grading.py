@@ -0,0 +1,101 @@
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+# Joins the blanks of a multi-blank answer into one comparable string
+BLANK_SEPARATOR = "\x1f"
+
+
+@lru_cache(maxsize=65536)
+def normalize_answer(text):
+    """Fold an answer for comparison: NFKC, case, accents and whitespace.
+
+    Memoized because a class's submissions repeat the same handful of answers per
+    question.
+    """
+    text = str(text)
+    if text.isascii():
+        return " ".join(text.lower().split())
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = "".join(
+        c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c)
+    )
+    return " ".join(text.split())
+
+
+def blank_count(question):
+    """Number of blanks the quiz UI asks for, or 0 for a single answer."""
+    if "choices" in question or "clue" not in question:
+        return 0
+    blanks = question["question"].count("___")
+    return blanks if blanks > 1 else 0
+
+
+class AnswerKey:
+    """A quiz's answers normalized once, ready to grade any number of submissions.
+
+    Multi-blank answers are split on commas and compared blank by blank, like
+    check_answer.
+    """
+
+    def __init__(self, quiz):
+        self.blanks = []
+        keys = []
+        for question in quiz:
+            blanks = blank_count(question)
+            if blanks:
+                # check_answer zips the blanks with the answer
+                # parts, so only that many are compared
+                parts = question["answer"].split(",")[:blanks]
+                blanks = len(parts)
+                keys.append(
+                    BLANK_SEPARATOR.join(normalize_answer(part) for part in parts)
+                )
+            else:
+                keys.append(normalize_answer(question["answer"]))
+            self.blanks.append(blanks)
+        self.keys = np.array(keys, dtype=str)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def normalize_submission(self, answers):
+        """Normalize one submission, a dict or list of answers by question index."""
+        if not isinstance(answers, dict):
+            answers = dict(enumerate(answers))
+        row = []
+        for i, blanks in enumerate(self.blanks):
+            answer = answers.get(i, "")
+            if blanks:
+                parts = answer if isinstance(answer, list) else str(answer).split(",")
+                row.append(
+                    BLANK_SEPARATOR.join(
+                        normalize_answer(part) for part in parts[:blanks]
+                    )
+                )
+            else:
+                if isinstance(answer, list):
+                    # collect_answers gives one for a clue without exactly one blank
+                    answer = ",".join(answer)
+                row.append(normalize_answer(answer))
+        return row
+
+    def grade(self, answers):
+        """Return a boolean array with one entry per question for one submission."""
+        return np.array(self.normalize_submission(answers), dtype=str) == self.keys
+
+    def grade_batch(self, submissions):
+        """Grade many submissions in one vectorized comparison.
+
+        Returns a dict with the submissions x questions "correct" matrix, each
+        submission's "scores" and each question's "accuracy".
+        """
+        rows = [self.normalize_submission(answers) for answers in submissions]
+        answers = np.array(rows, dtype=str).reshape(len(rows), len(self.keys))
+        correct = answers == self.keys[np.newaxis, :]
+        return {
+            "correct": correct,
+            "scores": correct.sum(axis=1),
+            "accuracy": correct.mean(axis=0) if len(rows) else np.zeros(len(self.keys)),
+        }
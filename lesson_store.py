@@ -0,0 +1,84 @@
+import hashlib
+import os
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from cache import CACHE_DIR
+
+
+def topic_key(topic):
+    return " ".join(topic.lower().split())
+
+
+class LessonStore:
+    """Generated lessons kept as Arrow IPC files, partitioned by language pair.
+
+    Each lesson lives at target_language=<..>/native_language=<..>/<hash of
+    topic>.arrow, so looking one up is a path computation, and reading it memory-maps
+    the file. The hive-style layout lets scan() run analytics over every stored lesson
+    without loading them into RAM.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, topic, target_language, native_language):
+        digest = hashlib.sha1(topic_key(topic).encode()).hexdigest()
+        return os.path.join(
+            self.root,
+            f"target_language={target_language}",
+            f"native_language={native_language}",
+            f"{digest}.arrow",
+        )
+
+    def load(self, topic, target_language, native_language):
+        """Return the stored lesson rows for this topic and language pair, or None."""
+        path = self._path(topic, target_language, native_language)
+        try:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None
+        return table.select(
+            [name for name in table.column_names if name != "topic"]
+        ).to_pylist()
+
+    def save(self, topic, target_language, native_language, rows):
+        if not rows:
+            return
+        # Lesson rows are free-form dicts from the model; store every value as text
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        table = pa.table(
+            {
+                "topic": [topic_key(topic)] * len(rows),
+                **{
+                    column: [
+                        None if row.get(column) is None else str(row[column])
+                        for row in rows
+                    ]
+                    for column in columns
+                },
+            }
+        )
+        path = self._path(topic, target_language, native_language)
+        # Dot-prefixed so dataset scans skip files that are still being written
+        directory, filename = os.path.split(path)
+        tmp_path = os.path.join(directory, f".{filename}.{os.getpid()}.tmp")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with (
+                pa.OSFile(tmp_path, "wb") as sink,
+                pa.ipc.new_file(sink, table.schema) as writer,
+            ):
+                writer.write_table(table)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not store lesson {path}: {str(e)}")
+
+    def scan(self):
+        """Return a pyarrow dataset over every stored lesson, for offline analytics."""
+        return ds.dataset(self.root, format="ipc", partitioning="hive")
+
+
+lessons = LessonStore(os.getenv("LESSON_STORE_DIR", os.path.join(CACHE_DIR, "lessons")))
@@ -0,0 +1,193 @@
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager, suppress
+
+import google.generativeai as genai
+import httpx
+import streamlit as st
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI
+
+from llm_metrics import timed_call
+from rate_limit import ConcurrencyLimit, TokenBucket
+
+load_dotenv()
+
+# Shared HTTP settings for every model call in the process
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Per-provider cap on in-flight calls, shared by every session in the process and by
+# sync and async callers alike
+CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+}
+
+# Per-provider request rate (per second) and
+# burst size, to stay under provider rate limits
+RATE_LIMITS = {
+    "openai": (
+        float(os.getenv("OPENAI_RATE_LIMIT", "10")),
+        int(os.getenv("OPENAI_RATE_BURST", "20")),
+    ),
+    "gemini": (
+        float(os.getenv("GEMINI_RATE_LIMIT", "1")),
+        int(os.getenv("GEMINI_RATE_BURST", "5")),
+    ),
+}
+
+_lock = threading.Lock()
+_clients = {}
+_slots = {provider: ConcurrencyLimit(limit) for provider, limit in CONCURRENCY.items()}
+_buckets = {
+    provider: TokenBucket(rate, burst)
+    for provider, (rate, burst) in RATE_LIMITS.items()
+}
+
+
+def _timeout(timeout=None):
+    return httpx.Timeout(timeout or LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _openai_api_key():
+    key = os.getenv("OPENAI_API_KEY")
+    if key is None:
+        # Deployments without environment variables keep the key in Streamlit secrets
+        with suppress(Exception):
+            key = st.secrets["OPENAI_API_KEY"]
+    return key
+
+
+def _get_or_create(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def get_openai_client():
+    """Return the process-wide OpenAI client, created on first use."""
+    return _get_or_create(
+        "openai",
+        lambda: OpenAI(
+            api_key=_openai_api_key(),
+            timeout=_timeout(),
+            max_retries=LLM_MAX_RETRIES,
+            http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+        ),
+    )
+
+
+def get_async_openai_client():
+    """Return the process-wide AsyncOpenAI client.
+
+    Its connection pool is bound to an event loop, so it must only be used from
+    coroutines running on background_loop.
+    """
+    return _get_or_create(
+        "async_openai",
+        lambda: AsyncOpenAI(
+            api_key=_openai_api_key(),
+            timeout=_timeout(),
+            max_retries=LLM_MAX_RETRIES,
+            http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+        ),
+    )
+
+
+def get_gemini_model(model_name="gemini-pro"):
+    """Return a shared Gemini model; the SDK is configured once per process."""
+
+    def create():
+        if "gemini_configured" not in _clients:
+            endpoint = os.getenv("GEMINI_API_ENDPOINT")
+            if endpoint:
+                # e.g. the local stand-in server used by loadtest.py
+                genai.configure(
+                    api_key=os.getenv("GOOGLE_API_KEY"),
+                    transport="rest",
+                    client_options={"api_endpoint": endpoint},
+                )
+            else:
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _clients["gemini_configured"] = True
+        return genai.GenerativeModel(model_name)
+
+    return _get_or_create(f"gemini:{model_name}", create)
+
+
+@contextmanager
+def llm_slot(provider):
+    """Wait for the provider's rate limit, then hold one of its concurrency slots."""
+    _buckets[provider].acquire()
+    with _slots[provider]:
+        yield
+
+
+@asynccontextmanager
+async def async_llm_slot(provider):
+    """llm_slot() for coroutines, drawing on the same rate limit and slots."""
+    await _buckets[provider].async_acquire()
+    async with _slots[provider]:
+        yield
+
+
+def chat_completion(messages, model="gpt-4o-mini", timeout=None, **kwargs):
+    """Create an OpenAI chat completion through the shared client.
+
+    With stream=True the response is a stream of chunks; as with gemini_generate, the
+    slot and the recorded latency only cover opening it, and no token usage is recorded.
+    """
+    with llm_slot("openai"), timed_call(model) as call:
+        call.response = get_openai_client().chat.completions.create(
+            model=model, messages=messages, timeout=_timeout(timeout), **kwargs
+        )
+    return call.response
+
+
+async def async_chat_completion(messages, model="gpt-4o-mini", timeout=None, **kwargs):
+    async with async_llm_slot("openai"):
+        with timed_call(model) as call:
+            call.response = await get_async_openai_client().chat.completions.create(
+                model=model, messages=messages, timeout=_timeout(timeout), **kwargs
+            )
+    return call.response
+
+
+def image_generation(prompt, model="dall-e-2", timeout=None, **kwargs):
+    with llm_slot("openai"), timed_call(model) as call:
+        call.response = get_openai_client().images.generate(
+            model=model, prompt=prompt, timeout=_timeout(timeout), **kwargs
+        )
+    return call.response
+
+
+def gemini_generate(prompt, model_name="gemini-pro", timeout=None, **kwargs):
+    """Call Gemini's generate_content through the shared model with a per-call timeout.
+
+    With stream=True the slot and the recorded latency only cover opening the stream,
+    not reading it, and no token usage is recorded.
+    """
+    with llm_slot("gemini"), timed_call(model_name) as call:
+        response = get_gemini_model(model_name).generate_content(
+            prompt, request_options={"timeout": timeout or LLM_TIMEOUT}, **kwargs
+        )
+        if not kwargs.get("stream"):
+            call.response = response
+    return response
@@ -0,0 +1,289 @@
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+# Recent latencies kept per series for the percentile panel
+RECENT_SAMPLES = 1000
+
+# Name of the app function a model call is made on behalf of
+current_function = contextvars.ContextVar("current_function", default="unlabeled")
+
+
+class Series:
+    """Metrics for one (function, model) pair."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = defaultdict(int)
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+
+_lock = threading.Lock()
+_series = defaultdict(Series)
+_retries = defaultdict(int)
+
+
+def instrumented(function_name):
+    """Label every model call made inside the decorated function."""
+
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                generator = fn(*args, **kwargs)
+                while True:
+                    # Only label the generator's own steps,
+                    # not the caller's code between them
+                    token = current_function.set(function_name)
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        current_function.reset(token)
+                    yield item
+
+            return generator_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                token = current_function.set(function_name)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    current_function.reset(token)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = current_function.set(function_name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                current_function.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def observe_call(model, latency, prompt_tokens=0, completion_tokens=0, error=None):
+    """Record one model call for the current function."""
+    key = (current_function.get(), model)
+    with _lock:
+        series = _series[key]
+        series.calls += 1
+        series.bucket_counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        series.latency_sum += latency
+        series.prompt_tokens += prompt_tokens or 0
+        series.completion_tokens += completion_tokens or 0
+        series.recent.append(latency)
+        if error is not None:
+            series.errors[type(error).__name__] += 1
+
+
+def observe_retries(function_name, retries):
+    with _lock:
+        _retries[function_name] += retries
+
+
+def usage_tokens(response):
+    """Return (prompt_tokens, completion_tokens) from a response, if present."""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", 0), getattr(
+            usage, "completion_tokens", 0
+        )
+    try:
+        usage = response.usage_metadata
+        return usage.prompt_token_count, usage.candidates_token_count
+    except Exception:
+        return 0, 0
+
+
+class timed_call:
+    """Context manager that times a model call and records it with observe_call.
+
+    Set .response inside the block so token usage can be read from it.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.response = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        latency = time.perf_counter() - self.start
+        prompt_tokens, completion_tokens = (
+            usage_tokens(self.response) if self.response is not None else (0, 0)
+        )
+        observe_call(self.model, latency, prompt_tokens, completion_tokens, error=exc)
+        return False
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summary():
+    """Return one row per (function, model) with call counts, percentiles and tokens."""
+    with _lock:
+        rows = []
+        for (function_name, model), series in sorted(_series.items()):
+            rows.append(
+                {
+                    "function": function_name,
+                    "model": model,
+                    "calls": series.calls,
+                    "errors": sum(series.errors.values()),
+                    "p50_s": percentile(series.recent, 0.5),
+                    "p95_s": percentile(series.recent, 0.95),
+                    "p99_s": percentile(series.recent, 0.99),
+                    "prompt_tokens": series.prompt_tokens,
+                    "completion_tokens": series.completion_tokens,
+                    "retries": _retries.get(function_name, 0),
+                }
+            )
+        return rows
+
+
+def render_prometheus():
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP linguify_llm_call_seconds Latency of model calls.",
+        "# TYPE linguify_llm_call_seconds histogram",
+    ]
+    with _lock:
+        items = sorted(_series.items())
+        for (function_name, model), series in items:
+            labels = f'function="{function_name}",model="{model}"'
+            cumulative = 0
+            for bound, count in zip(
+                (*LATENCY_BUCKETS, "+Inf"), series.bucket_counts, strict=True
+            ):
+                cumulative += count
+                lines.append(
+                    f"linguify_llm_call_seconds_bucket"
+                    f'{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f"linguify_llm_call_seconds_sum{{{labels}}} {series.latency_sum}"
+            )
+            lines.append(f"linguify_llm_call_seconds_count{{{labels}}} {series.calls}")
+
+        lines += [
+            "# HELP linguify_llm_tokens_total Tokens used by model calls.",
+            "# TYPE linguify_llm_tokens_total counter",
+        ]
+        for (function_name, model), series in items:
+            labels = f'function="{function_name}",model="{model}"'
+            lines.append(
+                f'linguify_llm_tokens_total{{{labels},kind="prompt"}} '
+                f"{series.prompt_tokens}"
+            )
+            lines.append(
+                f'linguify_llm_tokens_total{{{labels},kind="completion"}} '
+                f"{series.completion_tokens}"
+            )
+
+        lines += [
+            "# HELP linguify_llm_errors_total Failed model calls by exception class.",
+            "# TYPE linguify_llm_errors_total counter",
+        ]
+        for (function_name, model), series in items:
+            for error_class, count in sorted(series.errors.items()):
+                lines.append(
+                    f'linguify_llm_errors_total{{function="{function_name}",model="{model}",'
+                    f'error="{error_class}"}} {count}'
+                )
+
+        lines += [
+            "# HELP linguify_llm_retries_total "
+            "Extra attempts made by retrying functions.",
+            "# TYPE linguify_llm_retries_total counter",
+        ]
+        for function_name, count in sorted(_retries.items()):
+            lines.append(
+                f'linguify_llm_retries_total{{function="{function_name}"}} {count}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_file(path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep scrapes out of the app's console output
+        pass
+
+
+_exporter_started = False
+
+
+def start_exporter():
+    """Start the exporters set by METRICS_PORT and METRICS_FILE, once."""
+    global _exporter_started
+    with _lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+    port = os.getenv("METRICS_PORT")
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+            threading.Thread(
+                target=server.serve_forever, name="metrics-http", daemon=True
+            ).start()
+        except OSError as e:
+            # Another app process already serves this port
+            print(f"Metrics endpoint not started on port {port}: {str(e)}")
+
+    path = os.getenv("METRICS_FILE")
+    if path:
+        interval = float(os.getenv("METRICS_FILE_INTERVAL", "15"))
+
+        def write_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_prometheus_file(path)
+                except OSError as e:
+                    print(f"Could not write metrics file {path}: {str(e)}")
+
+        threading.Thread(target=write_forever, name="metrics-file", daemon=True).start()
@@ -0,0 +1,419 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import google.generativeai as genai
+
+from llm_clients import async_chat_completion, chat_completion, gemini_generate
+from llm_metrics import current_function, percentile
+
+PROVIDERS = ("gemini", "openai")
+# Model used on each provider when the caller doesn't name one for it
+DEFAULT_MODELS = {
+    "gemini": os.getenv("GEMINI_FALLBACK_MODEL", "gemini-pro"),
+    "openai": os.getenv("OPENAI_FALLBACK_MODEL", "gpt-4o-mini"),
+}
+
+# Fire a backup request to the other provider when the first hasn't answered in time
+LLM_HEDGING = os.getenv("LLM_HEDGING", "1") == "1"
+# Fixed hedge delay in seconds; when unset, hedge at the first provider's recent p95
+# latency for the calling function, but never sooner than LLM_HEDGE_MIN_DELAY
+LLM_HEDGE_DELAY = os.getenv("LLM_HEDGE_DELAY")
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+# Hedge delay used until a function has MIN_SAMPLES successful calls on the provider
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "15"))
+MIN_SAMPLES = 20
+# Consecutive failures that open a provider's circuit, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+# Prefer the other provider while the preferred
+# one's median latency is this many times slower
+LLM_SLOW_FACTOR = float(os.getenv("LLM_SLOW_FACTOR", "3"))
+
+Completion = namedtuple("Completion", ["text", "provider", "response"])
+
+
+class InvalidResponse(Exception):
+    """A provider answered, but the caller's validate() rejected the text."""
+
+
+class CircuitBreaker:
+    """Stops sending requests to a failing provider for a while.
+
+    After failure_threshold consecutive failures the circuit opens and the provider is
+    skipped for reset_timeout seconds. Then it is half-open: calls are let through
+    again, the first success closes the circuit and a failure opens it for another
+    reset_timeout. clock returns the current time in seconds.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return (
+            "open"
+            if self.clock() - self.opened_at < self.reset_timeout
+            else "half-open"
+        )
+
+    def available(self):
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = self.clock()
+
+
+def gemini_prompt(messages):
+    """Flatten chat messages into one Gemini prompt, system instructions first."""
+    return "\n\n".join(message["content"].strip() for message in messages)
+
+
+class Router:
+    """Sends text completions to Gemini or OpenAI with failover and hedging.
+
+    Each call names a preferred provider. The other one is tried instead while the
+    preferred provider's circuit is open or its recent median latency for the calling
+    function is LLM_SLOW_FACTOR times worse. If the first provider fails, or validate()
+    rejects its text, the call fails over; if it is still running after the hedge delay,
+    the backup is started alongside it and the first valid answer wins. A losing request
+    runs to completion in the background so its latency still counts.
+    """
+
+    def __init__(self, max_workers=32, clock=time.monotonic):
+        self.breakers = {
+            provider: CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET, clock)
+            for provider in PROVIDERS
+        }
+        self.hedges = defaultdict(int)
+        self.failovers = defaultdict(int)
+        self.wins = defaultdict(int)
+        self._latencies = defaultdict(lambda: deque(maxlen=200))
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="llm-router"
+        )
+
+    def _recent(self, function, provider):
+        with self._lock:
+            return list(self._latencies[(function, provider)])
+
+    def order(self, preferred, function=None):
+        """Return the providers in the order a call for function should try them."""
+        function = function or current_function.get()
+        backup = next(provider for provider in PROVIDERS if provider != preferred)
+        order = [preferred, backup]
+        preferred_recent, backup_recent = (
+            self._recent(function, preferred),
+            self._recent(function, backup),
+        )
+        if (
+            len(preferred_recent) >= MIN_SAMPLES
+            and len(backup_recent) >= MIN_SAMPLES
+            and percentile(preferred_recent, 0.5)
+            > LLM_SLOW_FACTOR * percentile(backup_recent, 0.5)
+        ):
+            order.reverse()
+        # Providers with an open circuit go last;
+        # they are only tried if the other one fails
+        return sorted(
+            order, key=lambda provider: not self.breakers[provider].available()
+        )
+
+    def hedge_delay(self, function, provider):
+        if LLM_HEDGE_DELAY:
+            return float(LLM_HEDGE_DELAY)
+        recent = self._recent(function, provider)
+        if len(recent) < MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, percentile(recent, 0.95))
+
+    def observe(self, function, provider, latency, error=None):
+        """Record one call's outcome for routing and the provider's circuit breaker."""
+        if error is None:
+            self.breakers[provider].record_success()
+            with self._lock:
+                self._latencies[(function, provider)].append(latency)
+        elif not isinstance(error, InvalidResponse):
+            # Bad answers trigger failover but say
+            # nothing about the provider's availability
+            self.breakers[provider].record_failure()
+
+    @contextmanager
+    def tracked(self, provider):
+        """Record a call made outside the router, e.g. a streamed response."""
+        function = current_function.get()
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.observe(function, provider, time.perf_counter() - start, e)
+            raise
+        self.observe(function, provider, time.perf_counter() - start)
+
+    def _openai_kwargs(
+        self, provider, models, temperature, max_tokens, timeout, options
+    ):
+        kwargs = {
+            "model": models.get(provider, DEFAULT_MODELS[provider]),
+            "timeout": timeout,
+            **(options.get(provider) or {}),
+        }
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        return kwargs
+
+    def _call_gemini(self, messages, models, temperature, max_tokens, timeout, options):
+        config = dict(options.get("gemini") or {})
+        if temperature is not None:
+            config["temperature"] = temperature
+        if max_tokens is not None:
+            config["max_output_tokens"] = max_tokens
+        response = gemini_generate(
+            gemini_prompt(messages),
+            model_name=models.get("gemini", DEFAULT_MODELS["gemini"]),
+            timeout=timeout,
+            generation_config=genai.types.GenerationConfig(**config),
+        )
+        return response.text, response
+
+    def _call(
+        self, provider, messages, models, temperature, max_tokens, timeout, options
+    ):
+        if provider == "gemini":
+            return self._call_gemini(
+                messages, models, temperature, max_tokens, timeout, options
+            )
+        response = chat_completion(
+            messages,
+            **self._openai_kwargs(
+                provider, models, temperature, max_tokens, timeout, options
+            ),
+        )
+        return response.choices[0].message.content, response
+
+    def _attempt(self, function, provider, validate, call):
+        start = time.perf_counter()
+        try:
+            text, response = call()
+            if validate is not None and not validate(text):
+                raise InvalidResponse(f"{provider} returned an unusable response")
+        except Exception as e:
+            self.observe(function, provider, time.perf_counter() - start, e)
+            raise
+        self.observe(function, provider, time.perf_counter() - start)
+        return Completion(text, provider, response)
+
+    def complete(
+        self,
+        messages,
+        preferred,
+        validate=None,
+        models=None,
+        temperature=None,
+        max_tokens=None,
+        timeout=None,
+        options=None,
+    ):
+        """Return a Completion from whichever provider answers validly first.
+
+        models and options map provider names to a model and to extra provider-specific
+        arguments (OpenAI create() kwargs, Gemini GenerationConfig fields).
+        """
+        function = current_function.get()
+        models, options = models or {}, options or {}
+        order = self.order(preferred, function)
+        pending, errors = {}, []
+
+        def launch(provider):
+            def call():
+                return self._call(
+                    provider,
+                    messages,
+                    models,
+                    temperature,
+                    max_tokens,
+                    timeout,
+                    options,
+                )
+
+            # Each thread gets its own copy of the context
+            # so metrics stay labeled with function
+            future = self._executor.submit(
+                contextvars.copy_context().run,
+                self._attempt,
+                function,
+                provider,
+                validate,
+                call,
+            )
+            pending[future] = provider
+
+        launch(order.pop(0))
+        while pending:
+            delay = (
+                self.hedge_delay(function, next(iter(pending.values())))
+                if LLM_HEDGING and order
+                else None
+            )
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                self.hedges[function] += 1
+                launch(order.pop(0))
+                continue
+            for future in done:
+                pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                self.wins[(function, result.provider)] += 1
+                return result
+            if order and not pending:
+                self.failovers[function] += 1
+                launch(order.pop(0))
+        raise errors[-1]
+
+    async def _async_call(
+        self, provider, messages, models, temperature, max_tokens, timeout, options
+    ):
+        if provider == "gemini":
+            # The Gemini SDK call is blocking; asyncio.to_thread
+            # carries the metrics context along
+            return await asyncio.to_thread(
+                self._call_gemini,
+                messages,
+                models,
+                temperature,
+                max_tokens,
+                timeout,
+                options,
+            )
+        response = await async_chat_completion(
+            messages,
+            **self._openai_kwargs(
+                provider, models, temperature, max_tokens, timeout, options
+            ),
+        )
+        return response.choices[0].message.content, response
+
+    async def _async_attempt(self, function, provider, validate, call):
+        start = time.perf_counter()
+        try:
+            text, response = await call()
+            if validate is not None and not validate(text):
+                raise InvalidResponse(f"{provider} returned an unusable response")
+        except Exception as e:
+            self.observe(function, provider, time.perf_counter() - start, e)
+            raise
+        self.observe(function, provider, time.perf_counter() - start)
+        return Completion(text, provider, response)
+
+    async def async_complete(
+        self,
+        messages,
+        preferred,
+        validate=None,
+        models=None,
+        temperature=None,
+        max_tokens=None,
+        timeout=None,
+        options=None,
+    ):
+        """Coroutine version of complete(), for code running on background_loop."""
+        function = current_function.get()
+        models, options = models or {}, options or {}
+        order = self.order(preferred, function)
+        pending, errors = {}, []
+
+        def launch(provider):
+            def call():
+                return self._async_call(
+                    provider,
+                    messages,
+                    models,
+                    temperature,
+                    max_tokens,
+                    timeout,
+                    options,
+                )
+
+            task = asyncio.ensure_future(
+                self._async_attempt(function, provider, validate, call)
+            )
+            # A losing request may fail after the call
+            # has returned; its error is already observed
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            pending[task] = provider
+
+        launch(order.pop(0))
+        while pending:
+            delay = (
+                self.hedge_delay(function, next(iter(pending.values())))
+                if LLM_HEDGING and order
+                else None
+            )
+            done, _ = await asyncio.wait(
+                pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                self.hedges[function] += 1
+                launch(order.pop(0))
+                continue
+            for task in done:
+                pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                self.wins[(function, result.provider)] += 1
+                return result
+            if order and not pending:
+                self.failovers[function] += 1
+                launch(order.pop(0))
+        raise errors[-1]
+
+    def stats(self):
+        """Return one row per provider: circuit state, answers, hedges and failovers."""
+        rows = []
+        for provider, breaker in self.breakers.items():
+            rows.append(
+                {
+                    "provider": provider,
+                    "circuit": breaker.state,
+                    "consecutive_failures": breaker.failures,
+                    "answered": sum(
+                        count
+                        for (_, winner), count in self.wins.items()
+                        if winner == provider
+                    ),
+                }
+            )
+        return rows, sum(self.hedges.values()), sum(self.failovers.values())
+
+
+router = Router(max_workers=int(os.getenv("LLM_ROUTER_WORKERS", "32")))
@@ -0,0 +1,231 @@
+"""Load test: simulated learners driving the app against the fake LLM server.
+
+Each session is a Streamlit AppTest running quiz.main, teaching_assistant_tab or
+display_scoreboard through a short scripted visit; sessions run concurrently in threads
+of one process, as they would in one Streamlit server. Reports p50/p95/p99 rerun latency
+per page, throughput, (with --memory) traced memory per session and (with --phases)
+where each page's script runs spend their time.
+
+python loadtest.py --sessions 50 --concurrency 10 --latency 0.5 --failure-rate 0.02
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_llm_server import FakeLLMConfig, make_server
+
+TOPICS = ["food", "travel", "family", "weather", "shopping", "work", "sports", "music"]
+
+
+def quiz_page():
+    import quiz
+
+    quiz.main()
+
+
+def assistant_page():
+    import teaching_assistant
+
+    teaching_assistant.teaching_assistant_tab()
+
+
+def scoreboard_page():
+    import scoreboard
+
+    scoreboard.display_scoreboard()
+
+
+def click(at, label):
+    next(button for button in at.button if button.label == label).click()
+
+
+def timed_run(at, page, timings, timeout):
+    start = time.perf_counter()
+    at.run(timeout=timeout)
+    timings[page].append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+
+
+def visit_quiz(at, topic, timings, timeout):
+    timed_run(at, "quiz", timings, timeout)
+    at.text_input(key="quiz_topic").input(topic)
+    at.slider(key="num_questions").set_value(random.choice([5, 10]))
+    click(at, "Generate Quiz")
+    timed_run(at, "quiz", timings, timeout)
+    click(at, "Get Hint")
+    timed_run(at, "quiz", timings, timeout)
+    click(at, "Submit Quiz")
+    timed_run(at, "quiz", timings, timeout)
+
+
+def visit_assistant(at, topic, timings, timeout):
+    timed_run(at, "assistant", timings, timeout)
+    next(box for box in at.text_input if box.label.startswith("Enter a topic")).input(
+        topic
+    )
+    click(at, "Generate Lesson and Exercise")
+    timed_run(at, "assistant", timings, timeout)
+    next(box for box in at.text_input if box.label.startswith("Ask a question")).input(
+        f"How do I say {topic}?"
+    )
+    click(at, "Ask")
+    timed_run(at, "assistant", timings, timeout)
+
+
+def visit_scoreboard(at, _topic, timings, timeout):
+    timed_run(at, "scoreboard", timings, timeout)
+    timed_run(at, "scoreboard", timings, timeout)
+
+
+PAGES = {
+    "quiz": (quiz_page, visit_quiz),
+    "assistant": (assistant_page, visit_assistant),
+    "scoreboard": (scoreboard_page, visit_scoreboard),
+}
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return (
+        ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        if ordered
+        else float("nan")
+    )
+
+
+def run(args):
+    from streamlit.testing.v1 import AppTest
+
+    from auth import users
+
+    pages = args.pages.split(",")
+    for i in range(args.sessions):
+        users.create_user(f"learner{i}", {"password": "loadtest"})
+
+    timings = defaultdict(list)
+    errors = []
+    apps = []
+    lock = threading.Lock()
+
+    def session(i):
+        page = pages[i % len(pages)]
+        script, visit = PAGES[page]
+        topic = (
+            f"{random.choice(TOPICS)} {i}"
+            if args.unique_topics
+            else random.choice(TOPICS)
+        )
+        at = AppTest.from_function(script, default_timeout=args.timeout)
+        at.session_state["user"] = f"learner{i}"
+        try:
+            visit(at, topic, timings, args.timeout)
+        except Exception as e:
+            with lock:
+                errors.append(f"{page}: {type(e).__name__}: {e}")
+        with lock:
+            apps.append(at)
+
+    if args.memory:
+        tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0] if args.memory else 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(session, range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0] - baseline if args.memory else None
+
+    reruns = sum(len(samples) for samples in timings.values())
+    print(
+        f"{args.sessions} sessions, concurrency {args.concurrency}, "
+        f"{elapsed:.1f} s wall clock"
+    )
+    print(
+        f"throughput: {args.sessions / elapsed:.2f} sessions/s, "
+        f"{reruns / elapsed:.2f} reruns/s"
+    )
+    for page, samples in sorted(timings.items()):
+        p50, p95, p99 = (percentile(samples, q) * 1000 for q in (0.5, 0.95, 0.99))
+        print(
+            f"  {page:<10} reruns {len(samples):>5}  p50 {p50:8.1f} ms  "
+            f"p95 {p95:8.1f} ms  p99 {p99:8.1f} ms"
+        )
+    if memory is not None:
+        print(f"memory: {memory / len(apps) / 1024:.0f} KiB traced per live session")
+    print(
+        f"fake LLM: {args.config.requests} requests, "
+        f"{args.config.failures} injected failures"
+    )
+    if args.phases:
+        import rerun_profiler
+
+        print("slowest phases (rerun profiler):")
+        for row in rerun_profiler.summary():
+            if row["phase"] != "total":
+                print(
+                    f"  {row['page']:<18} {row['phase']:<28} "
+                    f"p50 {row['p50_ms']:8.1f} ms  p95 {row['p95_ms']:8.1f} ms"
+                )
+    if errors:
+        print(f"{len(errors)} session(s) failed, first: {errors[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--pages",
+        default="quiz,assistant,scoreboard",
+        help="comma-separated pages to cycle through",
+    )
+    parser.add_argument(
+        "--unique-topics",
+        action="store_true",
+        help="give every session its own topic (no cache hits)",
+    )
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--timeout", type=float, default=120.0, help="seconds allowed per rerun"
+    )
+    parser.add_argument(
+        "--memory", action="store_true", help="trace memory (slows the run down)"
+    )
+    parser.add_argument(
+        "--phases",
+        action="store_true",
+        help="report per-phase percentiles from the rerun profiler",
+    )
+    args = parser.parse_args()
+
+    args.config = FakeLLMConfig(
+        args.latency, args.jitter, args.chunk_delay, failure_rate=args.failure_rate
+    )
+    server = make_server(args.config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Point every client at the fake server and keep state out of the real stores
+    workdir = tempfile.mkdtemp(prefix="linguify-loadtest-")
+    os.environ.update(
+        {
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{server.server_port}/v1",
+            "GEMINI_API_ENDPOINT": f"http://127.0.0.1:{server.server_port}",
+            "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "loadtest"),
+            "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "loadtest"),
+            "LINGUIFY_CACHE_DIR": os.path.join(workdir, "cache"),
+            "LINGUIFY_DB_PATH": os.path.join(workdir, "linguify.db"),
+            "GEMINI_RATE_LIMIT": os.getenv("GEMINI_RATE_LIMIT", "1000"),
+            "OPENAI_RATE_LIMIT": os.getenv("OPENAI_RATE_LIMIT", "1000"),
+        }
+    )
+    run(args)
@@ -0,0 +1,206 @@
+import os
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+
+from sqlite_db import SQLiteDatabase
+
+DAY = 24 * 60 * 60
+# One event: time, user id, experience gained, quizzes
+# completed, correct answers, questions answered
+EVENT = struct.Struct("<IIiHHH")
+EVENT_DTYPE = np.dtype(
+    [
+        ("time", "<u4"),
+        ("user", "<u4"),
+        ("experience", "<i4"),
+        ("quizzes", "<u2"),
+        ("correct", "<u2"),
+        ("questions", "<u2"),
+    ]
+)
+ROLLUP_COLUMNS = ("experience", "quizzes", "correct", "questions")
+# Windows up to this many days are summed from
+# daily rollups, longer ones from weekly rollups
+MAX_DAILY_WINDOW = 31
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS progress_daily (
+    period INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    experience INTEGER NOT NULL,
+    quizzes INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    questions INTEGER NOT NULL,
+    PRIMARY KEY (period, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS progress_daily_by_user ON progress_daily (user_id, period);
+CREATE TABLE IF NOT EXISTS progress_weekly (
+    period INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    experience INTEGER NOT NULL,
+    quizzes INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    questions INTEGER NOT NULL,
+    PRIMARY KEY (period, user_id)
+) WITHOUT ROWID;
+"""
+
+
+def day_number(timestamp):
+    return int(timestamp // DAY)
+
+
+def week_number(day):
+    # Day 0 (1970-01-01) was a Thursday; shift so weeks start on Monday
+    return (day + 3) // 7
+
+
+class ProgressLog:
+    """Append-only log of XP and quiz events with daily and weekly rollups per user.
+
+    Each event is an 18-byte record appended to a binary file, which is the history of
+    record; rebuild_rollups() recomputes the rollups from it. Recording an event also
+    adds it to its day's and week's rollup rows in SQLite, so windowed queries aggregate
+    at most one row per user and day (or week) instead of scanning raw events.
+    """
+
+    def __init__(self, log_path, db_path, timeout=10.0):
+        self.log_path = log_path
+        self._db = SQLiteDatabase(db_path, timeout=timeout)
+        self._db.executescript(SCHEMA)
+
+    def record(
+        self, user_id, experience=0, quizzes=0, correct=0, questions=0, now=None
+    ):
+        now = time.time() if now is None else now
+        event = EVENT.pack(int(now), user_id, experience, quizzes, correct, questions)
+        day = day_number(now)
+        values = (experience, quizzes, correct, questions)
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            # O_APPEND makes each small write land whole
+            # at the end, even with several processes
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, event)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Could not append progress event: {str(e)}")
+        with self._db.transaction() as conn:
+            for table, period in (
+                ("progress_daily", day),
+                ("progress_weekly", week_number(day)),
+            ):
+                conn.execute(
+                    f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (period, user_id) DO UPDATE SET "
+                    "experience = experience + excluded.experience, "
+                    "quizzes = quizzes + excluded.quizzes, "
+                    "correct = correct + excluded.correct, "
+                    "questions = questions + excluded.questions",
+                    (period, user_id, *values),
+                )
+
+    def events(self):
+        """Return every logged event as a NumPy structured array."""
+        try:
+            return np.fromfile(self.log_path, dtype=EVENT_DTYPE)
+        except (OSError, ValueError):
+            return np.zeros(0, dtype=EVENT_DTYPE)
+
+    def rebuild_rollups(self):
+        """Recompute both rollup tables from the event log.
+
+        Raises OSError, leaving the rollups as they are, if the log can't be read; a
+        missing log is not taken for an empty history.
+        """
+        events = pd.DataFrame(np.fromfile(self.log_path, dtype=EVENT_DTYPE))
+        events["day"] = events["time"].astype(np.int64) // DAY
+        events["week"] = week_number(events["day"])
+        with self._db.transaction() as conn:
+            for table, period in (
+                ("progress_daily", "day"),
+                ("progress_weekly", "week"),
+            ):
+                rollup = (
+                    events.groupby([period, "user"], sort=False)[list(ROLLUP_COLUMNS)]
+                    .sum()
+                    .reset_index()
+                )
+                conn.execute(f"DELETE FROM {table}")
+                conn.executemany(
+                    f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?)",
+                    rollup.astype(np.int64).itertuples(index=False, name=None),
+                )
+
+    def _rollups(self, table, first, user_id=None):
+        """Return a table's rows from period first on as a DataFrame."""
+        query = (
+            f"SELECT period, user_id, {', '.join(ROLLUP_COLUMNS)} "
+            f"FROM {table} WHERE period >= ?"
+        )
+        params = [first]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        with self._db.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return pd.DataFrame(
+            np.array(rows, dtype=np.int64).reshape(len(rows), 2 + len(ROLLUP_COLUMNS)),
+            columns=["period", "user_id", *ROLLUP_COLUMNS],
+        )
+
+    def top(self, days, limit=10, now=None):
+        """Return the users with the most experience gained in the last days days.
+
+        Windows longer than MAX_DAILY_WINDOW are rounded out to whole weeks. Rows are
+        (user_id, experience, quizzes), best first.
+        """
+        first = day_number(time.time() if now is None else now) - days + 1
+        table = "progress_daily"
+        if days > MAX_DAILY_WINDOW:
+            table, first = "progress_weekly", week_number(first)
+        # Summed inside SQLite so only the top rows cross into
+        # Python. The unary + keeps the planner on the period range
+        # instead of walking the per-user index over all history.
+        with self._db.connection() as conn:
+            rows = conn.execute(
+                f"SELECT user_id, SUM(experience) AS total, SUM(quizzes) FROM {table} "
+                "WHERE period >= ? GROUP BY +user_id "
+                "ORDER BY total DESC, user_id LIMIT ?",
+                (first, limit),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def history(self, user_id, days=30, now=None):
+        """Return one user's daily experience, quizzes and accuracy.
+
+        Days without activity are included with zeros, so the frame can be charted
+        directly.
+        """
+        today = day_number(time.time() if now is None else now)
+        first = today - days + 1
+        daily = self._rollups("progress_daily", first, user_id=user_id).set_index(
+            "period"
+        )
+        daily = daily.reindex(range(first, today + 1), fill_value=0)
+        frame = daily[["experience", "quizzes"]].copy()
+        questions = daily["questions"].to_numpy()
+        frame["accuracy"] = np.divide(
+            daily["correct"].to_numpy(),
+            questions,
+            out=np.zeros(len(daily)),
+            where=questions > 0,
+        )
+        frame.index = pd.to_datetime(frame.index * DAY, unit="s").rename("day")
+        return frame
+
+
+_db_path = os.getenv("LINGUIFY_DB_PATH", "linguify.db")
+# The log is the history of record, so it lives beside the database rather than in the
+# cache directory, which may be cleared
+progress = ProgressLog(os.getenv("PROGRESS_LOG_PATH", f"{_db_path}.events"), _db_path)
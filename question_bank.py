@@ -0,0 +1,337 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+
+import numpy as np
+
+from grading import normalize_answer
+from sqlite_db import SQLiteDatabase
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS question_bank (
+    id INTEGER PRIMARY KEY,
+    native_language TEXT NOT NULL,
+    target_language TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    question TEXT NOT NULL,
+    signature BLOB NOT NULL
+);
+"""
+# Words too common to narrow a topic down
+STOPWORDS = {"a", "an", "and", "at", "for", "in", "of", "on", "the", "to", "with"}
+# Largest prime below 2**32, so (a * x) fits in 64 bits for the MinHash permutations
+PRIME = 4294967291
+
+
+def question_type(question):
+    if "choices" in question:
+        return "multiple_choice"
+    if "clue" in question:
+        return "fill_in_the_blank"
+    return "translation"
+
+
+def topic_terms(topic):
+    return {
+        word
+        for word in re.findall(r"\w+", normalize_answer(topic))
+        if word not in STOPWORDS
+    }
+
+
+def shingles(text, size=5):
+    """Hashed character shingles of the normalized text, the sets MinHash compares."""
+    text = normalize_answer(text)
+    if len(text) <= size:
+        return np.array([zlib.crc32(text.encode())], dtype=np.uint64)
+    return np.unique(
+        np.fromiter(
+            (
+                zlib.crc32(text[i : i + size].encode())
+                for i in range(len(text) - size + 1)
+            ),
+            dtype=np.uint64,
+        )
+    )
+
+
+class QuestionBank:
+    """Every validated quiz question, indexed for assembling quizzes.
+
+    An inverted index maps terms (target:, native:, difficulty:, type: and topic: words)
+    to sets of question ids, so the candidates for a quiz are the intersection of a few
+    posting sets. Near-duplicates are rejected on insert: each question gets a num_perm
+    MinHash signature, split into bands for locality-sensitive hashing, and a question
+    whose estimated Jaccard similarity to an earlier one in the same language pair
+    reaches threshold is not stored. Questions live in SQLite in LINGUIFY_DB_PATH; rows
+    added by other processes are picked up every refresh_interval seconds, and always
+    before inserting.
+    """
+
+    def __init__(
+        self,
+        path,
+        num_perm=64,
+        bands=16,
+        threshold=0.8,
+        refresh_interval=None,
+        timeout=10.0,
+    ):
+        self._db = SQLiteDatabase(path, timeout=timeout)
+        self._db.executescript(SCHEMA)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        permutations = np.random.default_rng(1).integers(
+            1, PRIME, size=(2, num_perm), dtype=np.uint64
+        )
+        self._a, self._b = permutations
+        self.hits = 0
+        self.misses = 0
+        self.duplicates = 0
+        self._reset()
+        self._lock = threading.Lock()
+
+    def signature(self, text):
+        """MinHash signature: the minimum of each permutation over the shingles."""
+        x = shingles(text)[:, np.newaxis] % np.uint64(PRIME)
+        hashed = (self._a * x % np.uint64(PRIME) + self._b) % np.uint64(PRIME)
+        return hashed.min(axis=0)
+
+    def _band_keys(self, pair, signature):
+        rows = self.num_perm // self.bands
+        return [
+            (pair, band, signature[band * rows : (band + 1) * rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _find_duplicate(self, pair, signature):
+        for key in self._band_keys(pair, signature):
+            for question_id in self._buckets.get(key, ()):
+                if (
+                    np.mean(self._questions[question_id][1] == signature)
+                    >= self.threshold
+                ):
+                    return question_id
+        return None
+
+    def _index(
+        self,
+        question_id,
+        question,
+        signature,
+        native_language,
+        target_language,
+        difficulty,
+        topic,
+    ):
+        self._questions[question_id] = (question, signature)
+        self._served[question_id] = 0
+        terms = {
+            f"native:{native_language}",
+            f"target:{target_language}",
+            f"difficulty:{difficulty.lower()}",
+            f"type:{question_type(question)}",
+            *(f"topic:{term}" for term in topic_terms(topic)),
+        }
+        for term in terms:
+            self._postings.setdefault(term, set()).add(question_id)
+        for key in self._band_keys((native_language, target_language), signature):
+            self._buckets.setdefault(key, []).append(question_id)
+
+    def _reset(self):
+        self._questions = {}
+        self._served = {}
+        self._postings = {}
+        self._buckets = {}
+        self._last_id = 0
+        self._synced_at = None
+
+    def _sync(self, conn=None):
+        # Index rows stored since the last sync, including other processes' inserts.
+        # Without conn this is skipped within refresh_interval of the last sync;
+        # add_many passes its transaction's connection to sync under the write lock.
+        now = time.monotonic()
+        if conn is None and (
+            self._synced_at is not None
+            and (
+                self.refresh_interval is None
+                or now - self._synced_at < self.refresh_interval
+            )
+        ):
+            return
+        self._synced_at = now
+        with self._db.connection() if conn is None else nullcontext(conn) as conn:
+            rows = conn.execute(
+                "SELECT id, question, signature, native_language, target_language, "
+                "difficulty, topic FROM question_bank WHERE id > ? ORDER BY id",
+                (self._last_id,),
+            ).fetchall()
+        for question_id, question, signature, *params in rows:
+            # Rows this process inserted are indexed already
+            if question_id not in self._questions:
+                self._index(
+                    question_id,
+                    json.loads(question),
+                    np.frombuffer(signature, dtype=np.uint64),
+                    *params,
+                )
+            self._last_id = question_id
+
+    def add(self, question, native_language, target_language, topic, difficulty):
+        """Store a validated question; returns False for a near-duplicate."""
+        return (
+            self.add_many(
+                [question], native_language, target_language, topic, difficulty
+            )
+            == 1
+        )
+
+    def add_many(self, questions, native_language, target_language, topic, difficulty):
+        """Store one quiz's questions in a transaction; returns how many were new."""
+        signatures = [self.signature(question["question"]) for question in questions]
+        with self._lock:
+            try:
+                with self._db.transaction() as conn:
+                    # Every other process's inserts are visible under the write lock,
+                    # so the duplicate check sees the whole bank
+                    self._sync(conn)
+                    added = self._insert(
+                        conn,
+                        questions,
+                        signatures,
+                        native_language,
+                        target_language,
+                        topic,
+                        difficulty,
+                    )
+            except BaseException:
+                # Questions indexed by the rolled-back transaction don't exist;
+                # index the bank afresh on the next sync
+                self._reset()
+                raise
+        return added
+
+    def _insert(
+        self,
+        conn,
+        questions,
+        signatures,
+        native_language,
+        target_language,
+        topic,
+        difficulty,
+    ):
+        added = 0
+        for question, signature in zip(questions, signatures, strict=True):
+            if (
+                self._find_duplicate((native_language, target_language), signature)
+                is not None
+            ):
+                self.duplicates += 1
+                continue
+            cursor = conn.execute(
+                "INSERT INTO question_bank (native_language, target_language, "
+                "difficulty, question_type, topic, question, signature) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    native_language,
+                    target_language,
+                    difficulty.lower(),
+                    question_type(question),
+                    topic,
+                    json.dumps(question, separators=(",", ":")),
+                    signature.tobytes(),
+                ),
+            )
+            self._index(
+                cursor.lastrowid,
+                question,
+                signature,
+                native_language,
+                target_language,
+                difficulty,
+                topic,
+            )
+            added += 1
+        return added
+
+    def _candidates(self, native_language, target_language, topic, difficulty):
+        terms = [
+            f"native:{native_language}",
+            f"target:{target_language}",
+            f"difficulty:{difficulty.lower()}",
+            *(f"topic:{term}" for term in topic_terms(topic)),
+        ]
+        postings = sorted((self._postings.get(term, set()) for term in terms), key=len)
+        return set.intersection(*postings)
+
+    def coverage(self, native_language, target_language, topic, difficulty):
+        """Number of stored questions matching these quiz parameters."""
+        with self._lock:
+            self._sync()
+            return len(
+                self._candidates(native_language, target_language, topic, difficulty)
+            )
+
+    def assemble(self, native_language, target_language, topic, difficulty, count):
+        """Return up to count matching questions, mixing question types.
+
+        The least-served questions are picked first, so consecutive quizzes don't repeat
+        questions until the bank for these parameters has been cycled through.
+        """
+        with self._lock:
+            self._sync()
+            candidates = self._candidates(
+                native_language, target_language, topic, difficulty
+            )
+            by_type = {}
+            for kind in ("multiple_choice", "fill_in_the_blank", "translation"):
+                ids = list(candidates & self._postings.get(f"type:{kind}", set()))
+                random.shuffle(ids)
+                ids.sort(key=self._served.__getitem__, reverse=True)
+                by_type[kind] = ids
+            picked = []
+            picked_per_type = dict.fromkeys(by_type, 0)
+            # Take the least-served question next,
+            # preferring the type picked least so far
+            while len(picked) < count and any(by_type.values()):
+                kind = min(
+                    (kind for kind, ids in by_type.items() if ids),
+                    key=lambda kind: (
+                        self._served[by_type[kind][-1]],
+                        picked_per_type[kind],
+                    ),
+                )
+                picked.append(by_type[kind].pop())
+                picked_per_type[kind] += 1
+            for question_id in picked:
+                self._served[question_id] += 1
+            self.hits += len(picked)
+            self.misses += count - len(picked)
+            return [dict(self._questions[question_id][0]) for question_id in picked]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._questions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+question_bank = QuestionBank(
+    os.getenv("LINGUIFY_DB_PATH", "linguify.db"),
+    threshold=float(os.getenv("QUESTION_BANK_DUPLICATE_THRESHOLD", "0.8")),
+    refresh_interval=float(os.getenv("QUESTION_BANK_REFRESH", "60")),
+)
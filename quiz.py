@@ -1,17 +1,123 @@
 import streamlit as st
 import random
-from dotenv import load_dotenv
-load_dotenv()
 import google.generativeai as genai
 import os
 import json
+import math
 import re
-from auth import get_user_data, update_user_data
-from scoreboard import update_user_progress
-
-# Initialize Gemini client
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel('gemini-pro')
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import TypedDict
+from scoreboard import award_experience, update_user_progress
+from auth import add_weak_area
+from cache import PersistentLRUCache
+from grading import AnswerKey
+from quiz_pool import QuizPool
+from llm_clients import gemini_generate
+from llm_metrics import instrumented, observe_retries, usage_tokens
+from llm_router import router
+import response_corpus
+from single_flight import flights
+from asset_cache import assets
+from session_store import restore_session, persist_fragment
+from review import reviews
+from question_bank import question_bank
+from rerun_profiler import phase, profiled_rerun
+
+# Retry budget for generate_quiz
+QUIZ_MAX_ATTEMPTS = int(os.getenv("QUIZ_MAX_ATTEMPTS", "5"))
+QUIZ_TIME_BUDGET = float(os.getenv("QUIZ_TIME_BUDGET", "60"))
+QUIZ_BACKOFF_BASE = 1.0
+QUIZ_BACKOFF_CAP = 8.0
+# Output tokens requested per missing question, capped at the old fixed limit
+TOKENS_PER_QUESTION = 400
+MAX_OUTPUT_TOKENS = 4000
+# Quizzes come entirely from the question bank only once it holds
+# QUIZ_BANK_MARGIN times the quiz length, so rotating through least-served
+# questions gives learners different quizzes. Until then QUIZ_FRESH_SHARE
+# of every quiz is newly generated and the bank keeps growing.
+QUIZ_BANK_MARGIN = float(os.getenv("QUIZ_BANK_MARGIN", "3"))
+QUIZ_FRESH_SHARE = float(os.getenv("QUIZ_FRESH_SHARE", "0.3"))
+
+QUIZ_MODEL = os.getenv("QUIZ_MODEL", "gemini-pro")
+# Ask for schema-constrained JSON instead of the text format.
+# Needs a model that supports response_schema (Gemini 1.5 or
+# later); streamed quizzes always use the text format.
+QUIZ_STRUCTURED_OUTPUT = os.getenv("QUIZ_STRUCTURED_OUTPUT", "0") == "1"
+
+class QuizQuestion(TypedDict, total=False):
+    question: str
+    choices: list[str]
+    clue: str
+    answer: str
+    explanation: str
+
+class QuizResponse(TypedDict):
+    questions: list[QuizQuestion]
+
+# The same schema for OpenAI. Strict mode requires every field, so the type-specific
+# ones are nullable and parse_structured_quiz drops them when empty.
+QUIZ_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "quiz",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "questions": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "question": {"type": "string"},
+                            "choices": {
+                                "type": ["array", "null"],
+                                "items": {"type": "string"},
+                            },
+                            "clue": {"type": ["string", "null"]},
+                            "answer": {"type": "string"},
+                            "explanation": {"type": "string"},
+                        },
+                        "required": [
+                            "question",
+                            "choices",
+                            "clue",
+                            "answer",
+                            "explanation",
+                        ],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["questions"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Cache of generated quizzes keyed on normalized quiz parameters
+quiz_cache = PersistentLRUCache(
+    "quiz",
+    max_entries=int(os.getenv("QUIZ_CACHE_SIZE", "500")),
+    ttl=int(os.getenv("QUIZ_CACHE_TTL", str(6 * 60 * 60))),
+)
+
+# Hints keyed on target language and normalized question text, shared across users
+hint_cache = PersistentLRUCache(
+    "hint",
+    max_entries=int(os.getenv("HINT_CACHE_SIZE", "5000")),
+    ttl=int(os.getenv("HINT_CACHE_TTL", str(7 * 24 * 60 * 60))),
+)
+# Background workers that fetch a quiz's hints right after it is created
+hint_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("HINT_PREFETCH_WORKERS", "2")),
+    thread_name_prefix="hint-prefetch",
+)
+# How long a Get Hint click waits for an in-flight
+# prefetch before asking for the hint alone
+HINT_PREFETCH_WAIT = float(os.getenv("HINT_PREFETCH_WAIT", "15"))
 
 # List of world languages
 WORLD_LANGUAGES = [
@@ -39,20 +145,39 @@ WORLD_LANGUAGES = [
     "Zulu"
 ]
 
-def parse_quiz_data(content):
-    try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        pass
-
-    questions = []
-    current_question = {}
-    for line in content.split('\n'):
+class QuizStreamParser:
+    """Incremental parser for the quiz text format.
+
+    Its lines start with Question:, Choices:, Clue:, Correct answer: or Explanation:.
+    A question is complete once the next "Question:" line arrives or the stream is
+    closed.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.current_question = {}
+
+    def feed(self, text):
+        """Consume a chunk of text and return the questions it completed."""
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split("\n")
+        return [q for q in map(self._parse_line, lines) if q]
+
+    def close(self):
+        """Flush the last partial line and return the remaining questions."""
+        questions = [q for q in [self._parse_line(self.buffer)] if q]
+        self.buffer = ""
+        if self.current_question:
+            questions.append(self.current_question)
+            self.current_question = {}
+        return questions
+
+    def _parse_line(self, line):
         line = line.strip()
+        current_question = self.current_question
         if line.startswith("Question:"):
-            if current_question:
-                questions.append(current_question)
-            current_question = {"question": line.split("Question:")[1].strip()}
+            self.current_question = {"question": line.split("Question:")[1].strip()}
+            return current_question or None
         elif line.startswith("Correct answer:"):
             current_question["answer"] = line.split("Correct answer:")[1].strip()
         elif line.startswith("Explanation:"):
@@ -63,14 +188,44 @@ def parse_quiz_data(content):
             current_question["choices"] = choices
         elif line.startswith("Clue:"):
             current_question["clue"] = line.split("Clue:")[1].strip()
+        return None
+
+def parse_quiz_data(content):
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
 
-    if current_question:
-        questions.append(current_question)
+    parser = QuizStreamParser()
+    return parser.feed(content) + parser.close()
 
+def parse_structured_quiz(content):
+    """Parse a JSON quiz in one pass, falling back to parse_quiz_data."""
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return parse_quiz_data(content)
+    if isinstance(data, dict):
+        data = data.get("questions", [])
+    if not isinstance(data, list):
+        return []
+    questions = []
+    for question in data:
+        if isinstance(question, dict):
+            # The UI tells question types apart by which optional fields are present
+            questions.append(
+                {
+                    key: value
+                    for key, value in question.items()
+                    if value not in ("", [], None)
+                }
+            )
     return questions
 
-def create_quiz_prompt(native_language, target_language, topic, num_questions, difficulty):
-    return f"""Generate a {difficulty} level quiz for learning {target_language} on the topic of {topic}. 
+def create_quiz_prompt(
+    native_language, target_language, topic, num_questions, difficulty, structured=False
+):
+    prompt = f"""Generate a {difficulty} level quiz for learning {target_language} on the topic of {topic}. 
     The questions should be in {native_language}, except for the specific {target_language} words or phrases being asked about.
     Include {num_questions} questions with a mix of the following types:
     1. Multiple choice
@@ -98,6 +253,15 @@ def create_quiz_prompt(native_language, target_language, topic, num_questions, d
     Clue: [clue in {native_language}] (for fill-in-the-blank only)
     Correct answer: [correct answer]
     Explanation: [detailed explanation]"""
+    if structured:
+        # The response schema replaces the text format
+        prompt = prompt[: prompt.index("Format each question as follows:")] + (
+            'Return a JSON object with one key, "questions", holding a list of the '
+            "questions. Each question is an object with the fields question, choices "
+            "(multiple choice only), clue (fill-in-the-blank only), answer and "
+            "explanation."
+        )
+    return prompt
 
 def validate_question(question):
     if not isinstance(question, dict):
@@ -112,47 +276,353 @@ def validate_question(question):
             return False
     return True
 
-def generate_quiz(native_language, target_language, topic, num_questions, difficulty):
-    prompt = create_quiz_prompt(native_language, target_language, topic, num_questions, difficulty)
+def question_key(question):
+    return " ".join(question['question'].lower().split())
+
+def backoff_delay(attempt):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(QUIZ_BACKOFF_CAP, QUIZ_BACKOFF_BASE * 2**attempt))
+
+def record_usage(response, stats):
+    try:
+        # Gemini or OpenAI, whichever answered; unavailable
+        # on e.g. a stream we stopped reading early
+        prompt_tokens, output_tokens = usage_tokens(response)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["output_tokens"] += output_tokens
+        stats["total_tokens"] += prompt_tokens + output_tokens
+    except Exception:
+        pass
 
-    while True:
+def banked_questions(coverage, num_questions):
+    """Number of a quiz's questions to take from a bank with coverage matches."""
+    if coverage >= QUIZ_BANK_MARGIN * num_questions:
+        return num_questions
+    return num_questions - max(1, math.ceil(QUIZ_FRESH_SHARE * num_questions))
+
+@instrumented("generate_quiz")
+def generate_quiz(
+    native_language,
+    target_language,
+    topic,
+    num_questions,
+    difficulty,
+    stats=None,
+    on_question=None,
+):
+    """Generate a quiz, asking only for the questions still missing.
+
+    Questions come from the question bank first, up to banked_questions(); the model is
+    asked for the rest, and its new questions are added to the bank. Stops after
+    QUIZ_MAX_ATTEMPTS attempts or QUIZ_TIME_BUDGET seconds. If a dict is passed as stats
+    it is filled with the number of attempts, tokens used and questions taken from the
+    bank. If on_question is given, the response is streamed and on_question(index,
+    question) is called as soon as each valid question has been parsed. Calls go through
+    the router, so OpenAI answers with the same prompt when Gemini is failing or slow;
+    only a Gemini response is streamed.
+    """
+    if stats is None:
+        stats = {}
+    stats.update(
+        {"attempts": 0, "prompt_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    )
+    valid_questions = {}
+
+    def accept(question):
+        # Validate the question and drop duplicates of ones we already have
+        key = question_key(question) if validate_question(question) else None
+        if (
+            key is None
+            or key in valid_questions
+            or len(valid_questions) >= num_questions
+        ):
+            return
+        valid_questions[key] = question
+        if on_question is not None:
+            on_question(len(valid_questions) - 1, question)
+
+    coverage = question_bank.coverage(
+        native_language, target_language, topic, difficulty
+    )
+    for q in question_bank.assemble(
+        native_language,
+        target_language,
+        topic,
+        difficulty,
+        banked_questions(coverage, num_questions),
+    ):
+        accept(q)
+    banked = set(valid_questions)
+    stats["bank_questions"] = len(banked)
+
+    deadline = time.monotonic() + QUIZ_TIME_BUDGET
+
+    while (
+        len(valid_questions) < num_questions
+        and stats["attempts"] < QUIZ_MAX_ATTEMPTS
+        and time.monotonic() < deadline
+    ):
+        missing = num_questions - len(valid_questions)
+        if stats["attempts"]:
+            delay = backoff_delay(stats["attempts"] - 1)
+            if time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+        stats["attempts"] += 1
+
+        structured = QUIZ_STRUCTURED_OUTPUT and on_question is None
+        prompt = create_quiz_prompt(
+            native_language,
+            target_language,
+            topic,
+            missing,
+            difficulty,
+            structured=structured,
+        )
+        max_output_tokens = min(MAX_OUTPUT_TOKENS, TOKENS_PER_QUESTION * missing)
         try:
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
+            if on_question is not None and router.order("gemini")[0] == "gemini":
+                with router.tracked("gemini"):
+                    response = gemini_generate(
+                        prompt,
+                        model_name=QUIZ_MODEL,
+                        generation_config=genai.types.GenerationConfig(
+                            temperature=1.3, max_output_tokens=max_output_tokens
+                        ),
+                        stream=True,
+                    )
+                    parser = QuizStreamParser()
+                    text = ""
+                    parsed = []
+                    for chunk in response:
+                        text += chunk.text
+                        parsed = parser.feed(chunk.text)
+                        for q in parsed:
+                            accept(q)
+                        if len(valid_questions) >= num_questions:
+                            break
+                    else:
+                        parsed = parser.close()
+                        for q in parsed:
+                            accept(q)
+                        # The model occasionally answers in
+                        # JSON, which only parses once complete
+                        if not parsed and "Question:" not in text:
+                            for q in parse_quiz_data(text):
+                                accept(q)
+                response_corpus.record("quiz", text)
+            else:
+                parse = parse_structured_quiz if structured else parse_quiz_data
+                options = {}
+                if structured:
+                    options = {
+                        "gemini": {
+                            "response_mime_type": "application/json",
+                            "response_schema": QuizResponse,
+                        },
+                        "openai": {"response_format": QUIZ_RESPONSE_FORMAT},
+                    }
+                response = router.complete(
+                    [{"role": "user", "content": prompt}],
+                    "gemini",
+                    validate=lambda text, parse=parse: any(
+                        validate_question(q) for q in parse(text)
+                    ),
+                    models={"gemini": QUIZ_MODEL},
                     temperature=1.3,
-                    max_output_tokens=4000,
+                    max_tokens=max_output_tokens,
+                    options=options,
                 )
-            )
-
-            quiz_data = parse_quiz_data(response.text)
+                response_corpus.record("quiz", response.text, structured=structured)
+                for q in parse(response.text):
+                    accept(q)
+                response = response.response
 
-            # Validate each question
-            valid_questions = [q for q in quiz_data if validate_question(q)]
+            record_usage(response, stats)
 
             if len(valid_questions) >= num_questions:
-                return valid_questions[:num_questions]
-            else:
-                print(f"Generated {len(valid_questions)} valid questions out of {num_questions} requested. Retrying...")
+                break
+            print(f"Generated {len(valid_questions)} valid questions out of {num_questions} requested. Retrying...")
         except Exception as e:
             print(f"An error occurred: {str(e)}. Retrying...")
 
+    generated = [q for key, q in valid_questions.items() if key not in banked]
+    if generated:
+        question_bank.add_many(
+            generated, native_language, target_language, topic, difficulty
+        )
+    print(
+        f"Quiz generation used {stats['bank_questions']} banked question(s), "
+        f"{stats['attempts']} attempt(s) and {stats['total_tokens']} tokens."
+    )
+    observe_retries("generate_quiz", max(0, stats["attempts"] - 1))
+    if not valid_questions:
+        raise RuntimeError(
+            f"Could not generate a valid quiz after {stats['attempts']} attempt(s)."
+        )
+    return list(valid_questions.values())[:num_questions]
+
+def quiz_cache_key(native_language, target_language, topic, num_questions, difficulty):
+    topic = " ".join(topic.lower().split())
+    return "|".join(
+        [
+            native_language,
+            target_language,
+            topic,
+            str(int(num_questions)),
+            difficulty.lower(),
+        ]
+    )
+
+# Background pool of pre-generated quizzes for popular configurations
+quiz_pool = QuizPool(
+    generate_quiz,
+    target_depth=int(os.getenv("QUIZ_POOL_DEPTH", "3")),
+    max_age=int(os.getenv("QUIZ_POOL_MAX_AGE", str(60 * 60))),
+    hot_keys=int(os.getenv("QUIZ_POOL_HOT_KEYS", "10")),
+    min_requests=int(os.getenv("QUIZ_POOL_MIN_REQUESTS", "3")),
+)
+
+def get_quiz(
+    native_language,
+    target_language,
+    topic,
+    num_questions,
+    difficulty,
+    stats=None,
+    on_question=None,
+):
+    """Return a pooled or cached quiz, generating and caching one on a miss.
+
+    on_question is passed to generate_quiz on a miss to stream questions as they are
+    parsed.
+    """
+    key = quiz_cache_key(
+        native_language, target_language, topic, num_questions, difficulty
+    )
+    quiz_data = quiz_pool.pop(key)
+    # When the bank can fill the quiz with room to vary it, a freshly assembled one
+    # beats repeating the cached quiz
+    coverage = question_bank.coverage(
+        native_language, target_language, topic, difficulty
+    )
+    if quiz_data is None and coverage < QUIZ_BANK_MARGIN * num_questions:
+        quiz_data = quiz_cache.get(key)
+    if quiz_data is None:
+        streamed = []
+
+        def generate():
+            def on_leader_question(i, question):
+                streamed.append(question)
+                if on_question is not None:
+                    on_question(i, question)
+
+            quiz_data = generate_quiz(
+                native_language,
+                target_language,
+                topic,
+                num_questions,
+                difficulty,
+                stats=stats,
+                on_question=on_leader_question if on_question else None,
+            )
+            # Only cache complete quizzes; a short one is worth regenerating next time
+            if len(quiz_data) >= num_questions:
+                quiz_cache.set(key, quiz_data)
+            return quiz_data
+
+        # Identical requests already being generated
+        # by another session share that result
+        quiz_data = flights.do(("quiz", key), generate)
+        if on_question is not None and not streamed:
+            for i, question in enumerate(quiz_data):
+                on_question(i, question)
+    return quiz_data
+
 def check_answer(user_answer, correct_answer):
     if isinstance(user_answer, list):
         return all(ua.lower().strip() == ca.lower().strip() for ua, ca in zip(user_answer, correct_answer.split(',')))
     return user_answer.lower().strip() == correct_answer.lower().strip()
 
+@instrumented("generate_hint")
 def generate_hint(question, target_language):
     prompt = f"""Provide a helpful hint for the following {target_language} language learning question:
     "{question}"
     The hint should guide the learner towards the answer without giving it away completely."""
 
-    response = model.generate_content(prompt)
+    response = router.complete(
+        [{"role": "user", "content": prompt}], "gemini", models={"gemini": QUIZ_MODEL}
+    )
     return response.text.strip()
 
+def hint_cache_key(question, target_language):
+    return f"{target_language}|{' '.join(question.lower().split())}"
+
+def parse_hints(content, count):
+    """Parse "Hint N: ..." lines into count hints, None for missing ones."""
+    hints = [None] * count
+    for line in content.split("\n"):
+        match = re.match(r"\s*\**Hint\s+(\d+)\**\s*:\s*(.+)", line)
+        if match and 1 <= int(match.group(1)) <= count:
+            hints[int(match.group(1)) - 1] = match.group(2).strip()
+    return hints
+
+@instrumented("generate_hints")
+def generate_hints(questions, target_language):
+    """Generate hints for several questions in one model call."""
+    numbered = "\n".join(
+        f'    {i + 1}. "{question}"' for i, question in enumerate(questions)
+    )
+    prompt = f"""Provide a helpful hint for each of the following {target_language} language learning questions:
+{numbered}
+    Each hint should guide the learner towards the answer without giving it away completely.
+    Answer with exactly one line per question, in the form "Hint N: [hint]"."""
+
+    response = router.complete(
+        [{"role": "user", "content": prompt}],
+        "gemini",
+        validate=lambda text: any(parse_hints(text, len(questions))),
+        models={"gemini": QUIZ_MODEL},
+    )
+    return parse_hints(response.text, len(questions))
+
+def prefetch_hints(questions, target_language):
+    """Fill the hint cache for a quiz's uncached questions in one call."""
+    missing = [
+        q
+        for q in dict.fromkeys(questions)
+        if hint_cache.get(hint_cache_key(q, target_language)) is None
+    ]
+    if not missing:
+        return
+    try:
+        hints = generate_hints(missing, target_language)
+    except Exception as e:
+        print(f"Could not prefetch hints: {str(e)}")
+        return
+    hint_cache.set_many(
+        (hint_cache_key(question, target_language), hint)
+        for question, hint in zip(missing, hints, strict=True)
+        if hint
+    )
+
+def get_hint(question, target_language, prefetch=None):
+    """Return a cached or prefetched hint, or generate it on its own."""
+    key = hint_cache_key(question, target_language)
+    hint = hint_cache.get(key)
+    if hint is None and prefetch is not None:
+        with suppress(Exception):
+            prefetch.result(timeout=HINT_PREFETCH_WAIT)
+        hint = hint_cache.get(key)
+    if hint is None:
+        hint = generate_hint(question, target_language)
+        hint_cache.set(key, hint)
+    return hint
+
 def load_css():
-    with open("styles.css") as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    # Served from memory; the file is only re-read when it changes on disk
+    css = assets.read_static("styles.css").decode()
+    st.markdown(f'<style>{css}</style>', unsafe_allow_html=True)
 
 def adjust_difficulty(current_difficulty, accuracy):
     if accuracy > 0.8:
@@ -168,11 +638,173 @@ def initialize_session_state():
         st.session_state.user_answers = {}
     if 'quiz_submitted' not in st.session_state:
         st.session_state.quiz_submitted = False
+    if "quiz_results" not in st.session_state:
+        st.session_state.quiz_results = None
+    if "quiz_review" not in st.session_state:
+        st.session_state.quiz_review = False
     if 'current_hint' not in st.session_state:
         st.session_state.current_hint = None
+    if "hint_prefetch" not in st.session_state:
+        st.session_state.hint_prefetch = None
+    if "quiz_target_language" not in st.session_state:
+        st.session_state.quiz_target_language = None
+    if "quiz_generated_topic" not in st.session_state:
+        st.session_state.quiz_generated_topic = ""
+
+def collect_answers(quiz):
+    """Read the current answer for every question from its widget state."""
+    answers = {}
+    for i, question in enumerate(quiz):
+        blanks = question["question"].count("___")
+        if "choices" not in question and "clue" in question and blanks != 1:
+            answers[i] = [st.session_state.get(f"q{i}_{j}", "") for j in range(blanks)]
+        else:
+            answers[i] = st.session_state.get(f"q{i}", "")
+    return answers
+
+def submit_quiz():
+    """Grade the quiz and apply the progress update, once per submission."""
+    if st.session_state.quiz_submitted:
+        return
+    quiz = st.session_state.quiz
+    st.session_state.user_answers = collect_answers(quiz)
+    # Graded like check_answer, but also folding Unicode forms and accents
+    st.session_state.quiz_results = (
+        AnswerKey(quiz).grade(st.session_state.user_answers).tolist()
+    )
+    st.session_state.quiz_submitted = True
+    update_user_progress(
+        st.session_state.user, sum(st.session_state.quiz_results), len(quiz)
+    )
+    schedule_reviews(
+        st.session_state.user,
+        quiz,
+        st.session_state.quiz_results,
+        st.session_state.quiz_generated_topic,
+    )
+
+def schedule_reviews(username, quiz, results, topic):
+    """Queue missed questions for review and record the topic as weak."""
+    for question, correct in zip(quiz, results, strict=True):
+        # SM-2 quality: 4 for a correct answer, 1 for a miss
+        reviews.grade(username, question, 4 if correct else 1, topic=topic)
+    if topic and not all(results):
+        add_weak_area(username, topic)
+
+def start_quiz(quiz_data, target_language, topic="", review=False):
+    # topic is the one the quiz was generated for, not whatever the topic box holds
+    # by the time it is submitted; review quizzes have none
+    st.session_state.quiz = quiz_data
+    st.session_state.user_answers = {}
+    st.session_state.quiz_submitted = False
+    st.session_state.quiz_results = None
+    st.session_state.quiz_review = review
+    st.session_state.current_hint = None
+    st.session_state.quiz_target_language = target_language
+    st.session_state.quiz_generated_topic = topic
+    # Fetch every hint for the quiz in one call while the learner reads it
+    st.session_state.hint_prefetch = hint_executor.submit(
+        prefetch_hints, [q["question"] for q in quiz_data], target_language
+    )
+
+def reset_quiz():
+    st.session_state.quiz = None
+    st.session_state.user_answers = {}
+    st.session_state.quiz_submitted = False
+    st.session_state.quiz_results = None
+    st.session_state.quiz_review = False
+    st.session_state.quiz_generated_topic = ""
+
+@st.fragment
+def question_input(i, question):
+    # A fragment per question, so answering one only reruns that question
+    st.write(f"Question {i + 1}")
+    st.write(question["question"])
+
+    if "choices" in question:
+        st.radio(
+            f"Choose the correct answer for Question {i + 1}:",
+            question["choices"],
+            key=f"q{i}",
+        )
+    elif "clue" in question:  # This is a fill-in-the-blank question
+        st.write(f"Clue: {question['clue']}")
+        blanks = question["question"].count("___")
+        if blanks == 1:
+            st.text_input(f"Fill in the blank for Question {i + 1}:", key=f"q{i}")
+        else:
+            for j in range(blanks):
+                st.text_input(f"Blank {j + 1} for Question {i + 1}:", key=f"q{i}_{j}")
+    else:
+        st.text_input(f"Your answer for Question {i + 1}:", key=f"q{i}")
+    # The answer widgets are persisted keys
+    persist_fragment()
+
+@st.fragment
+def hint_assistant(target_language):
+    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
+    st.markdown('<div class="chat-box">', unsafe_allow_html=True)
+    st.subheader("Hint Assistant")
+    if st.session_state.quiz is not None:
+        hint_question = st.selectbox(
+            "Select a question for a hint:",
+            [f"Question {i + 1}" for i in range(len(st.session_state.quiz))],
+        )
+        if st.button("Get Hint"):
+            question_index = int(hint_question.split()[-1]) - 1
+            question = st.session_state.quiz[question_index]["question"]
+            st.session_state.current_hint = get_hint(
+                question,
+                st.session_state.quiz_target_language or target_language,
+                st.session_state.hint_prefetch,
+            )
 
+        if st.session_state.current_hint:
+            st.write(st.session_state.current_hint)
+    st.markdown("</div></div>", unsafe_allow_html=True)
+    persist_fragment()
+
+@st.fragment
+def quiz_results():
+    # Renders the grades stored by submit_quiz;
+    # nothing is re-scored or re-awarded on reruns
+    st.subheader("Quiz Results")
+    quiz = st.session_state.quiz
+    results = st.session_state.quiz_results
+    for i, question in enumerate(quiz):
+        st.write(f"Question {i + 1}")
+        st.write(question["question"])
+        user_answer = st.session_state.user_answers.get(i, "")
+
+        if results[i]:
+            st.success("Correct!")
+        else:
+            st.error("Incorrect")
+
+        st.write(f"Your answer: {user_answer}")
+        st.write(f"Correct answer: {question['answer']}")
+        st.write("Explanation:")
+        st.write(question["explanation"])
+        st.write("---")
+
+    correct_answers = sum(results)
+    score = correct_answers / len(quiz)
+    st.write(f"Your score: {correct_answers}/{len(quiz)}")
+
+    new_difficulty = adjust_difficulty(
+        st.session_state.get("difficulty", "Medium"), score
+    )
+
+    if st.button("Return"):
+        reset_quiz()
+        st.rerun()
+
+@profiled_rerun("Quiz")
 def main():
-    load_css()
+    with phase("load_css"):
+        load_css()
+    with phase("restore_session"):
+        restore_session()
     initialize_session_state()
 
     st.header("Language Learning Quiz")
@@ -185,105 +817,82 @@ def main():
     difficulty = st.selectbox("Choose difficulty", ["Easy", "Medium", "Hard"], key="difficulty")
 
     if st.button("Generate Quiz"):
-        with st.spinner("Generating quiz... This may take a moment."):
+        quiz_pool.record_request(
+            quiz_cache_key(
+                native_language, target_language, topic, num_questions, difficulty
+            ),
+            {
+                "native_language": native_language,
+                "target_language": target_language,
+                "topic": topic,
+                "num_questions": num_questions,
+                "difficulty": difficulty,
+            },
+        )
+        # Show questions as they stream in; cleared once the full quiz is rendered below
+        preview = st.empty()
+        preview_container = preview.container()
+
+        def show_question(i, question):
+            preview_container.write(f"Question {i + 1}")
+            preview_container.write(question["question"])
+
+        with (
+            st.spinner("Generating quiz... This may take a moment."),
+            phase("generate_quiz"),
+        ):
             try:
-                quiz_data = generate_quiz(native_language, target_language, topic, num_questions, difficulty)
+                quiz_data = get_quiz(
+                    native_language,
+                    target_language,
+                    topic,
+                    num_questions,
+                    difficulty,
+                    on_question=show_question,
+                )
+                preview.empty()
                 if quiz_data:
-                    st.session_state.quiz = quiz_data
-                    st.session_state.user_answers = {}
-                    st.session_state.quiz_submitted = False
+                    start_quiz(quiz_data, target_language, topic=topic)
 
                     # Update user progress for successfully generating a quiz
-                    user_data = get_user_data(st.session_state.user)
-                    user_data["experience"] += 5  # Award 5 XP for generating a quiz
-                    user_data["completed_quizzes"] += 1
-                    update_user_data(st.session_state.user, user_data)
+                    # Award 5 XP for generating a quiz
+                    award_experience(
+                        st.session_state.user, experience=5, completed_quizzes=1
+                    )
                     st.success("Quiz generated successfully!")
             except Exception as e:
                 st.error(f"An unexpected error occurred while generating the quiz: {str(e)}")
 
                 # Update user progress even if an error occurs
-                user_data = get_user_data(st.session_state.user)
-                user_data["experience"] += 1  # Award 1 XP for the attempt
-                update_user_data(st.session_state.user, user_data)
+                award_experience(
+                    st.session_state.user, experience=1
+                )  # Award 1 XP for the attempt
+
+    # Review quizzes are assembled from the
+    # learner's due questions, without a model call
+    with phase("due_reviews"):
+        due_questions = reviews.due(st.session_state.user, limit=num_questions)
+    if due_questions and st.button(f"Review {len(due_questions)} due question(s)"):
+        start_quiz(due_questions, target_language, review=True)
 
     # Quiz display and interaction
     if st.session_state.quiz is not None:
         st.subheader("Quiz")
-        for i, question in enumerate(st.session_state.quiz):
-            st.write(f"Question {i + 1}")
-            st.write(question['question'])
-
-            if "choices" in question:
-                user_answer = st.radio(f"Choose the correct answer for Question {i + 1}:",
-                                       question['choices'],
-                                       key=f"q{i}")
-            elif "clue" in question:  # This is a fill-in-the-blank question
-                st.write(f"Clue: {question['clue']}")
-                blanks = question['question'].count('___')
-                if blanks == 1:
-                    user_answer = st.text_input(f"Fill in the blank for Question {i + 1}:", key=f"q{i}")
-                else:
-                    user_answer = [st.text_input(f"Blank {j+1} for Question {i + 1}:", key=f"q{i}_{j}") for j in range(blanks)]
-            else:
-                user_answer = st.text_input(f"Your answer for Question {i + 1}:", key=f"q{i}")
+        with phase("render_questions"):
+            for i, question in enumerate(st.session_state.quiz):
+                question_input(i, question)
 
-            st.session_state.user_answers[i] = user_answer
-
-        if st.button("Submit Quiz"):
-            st.session_state.quiz_submitted = True
+        if not st.session_state.quiz_submitted:
+            st.button("Submit Quiz", on_click=submit_quiz)
 
     # Add the hint chatbox
     with st.container():
-        st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-        st.markdown('<div class="chat-box">', unsafe_allow_html=True)
-        st.subheader("Hint Assistant")
-        if st.session_state.quiz is not None:
-            hint_question = st.selectbox("Select a question for a hint:",
-                                         [f"Question {i+1}" for i in range(len(st.session_state.quiz))])
-            if st.button("Get Hint"):
-                question_index = int(hint_question.split()[-1]) - 1
-                question = st.session_state.quiz[question_index]['question']
-                st.session_state.current_hint = generate_hint(question, target_language)
-
-            if st.session_state.current_hint:
-                st.write(st.session_state.current_hint)
-        st.markdown('</div></div>', unsafe_allow_html=True)
+        hint_assistant(target_language)
 
     # Quiz results
     if st.session_state.quiz_submitted:
-        st.subheader("Quiz Results")
-        correct_answers = 0
-        for i, question in enumerate(st.session_state.quiz):
-            st.write(f"Question {i + 1}")
-            st.write(question['question'])
-            user_answer = st.session_state.user_answers.get(i, "")
-            correct_answer = question['answer']
-
-            if check_answer(user_answer, correct_answer):
-                st.success("Correct!")
-                correct_answers += 1
-            else:
-                st.error("Incorrect")
-
-            st.write(f"Your answer: {user_answer}")
-            st.write(f"Correct answer: {correct_answer}")
-            st.write("Explanation:")
-            st.write(question['explanation'])
-            st.write("---")
-
-        score = correct_answers / len(st.session_state.quiz)
-        st.write(f"Your score: {correct_answers}/{len(st.session_state.quiz)}")
-
-        # Update user progress
-        update_user_progress(st.session_state.user, correct_answers, len(st.session_state.quiz))
-
-        new_difficulty = adjust_difficulty(difficulty, score)
-
-        if st.button("Return"):
-            st.session_state.quiz = None
-            st.session_state.user_answers = {}
-            st.session_state.quiz_submitted = False
+        with phase("quiz_results"):
+            quiz_results()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
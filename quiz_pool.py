@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import Counter, deque
+
+
+class QuizPool:
+    """Per-key pools of ready-made quizzes, kept topped up by a background thread.
+
+    Request counts collected with record_request decide which keys are hot. For each hot
+    key the worker calls generate(**params) until the pool holds target_depth quizzes;
+    quizzes older than max_age seconds are discarded instead of served.
+    """
+
+    def __init__(
+        self,
+        generate,
+        target_depth=3,
+        max_age=3600,
+        hot_keys=10,
+        min_requests=3,
+        interval=5.0,
+        decay=0.9,
+        decay_interval=60.0,
+    ):
+        self.generate = generate
+        self.target_depth = target_depth
+        self.max_age = max_age
+        self.hot_keys = hot_keys
+        self.min_requests = min_requests
+        self.interval = interval
+        self.decay = decay
+        self.decay_interval = decay_interval
+        self.hits = 0
+        self.misses = 0
+        self._counts = Counter()
+        self._params = {}
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record_request(self, key, params):
+        """Count one request for key; params are the generate() arguments."""
+        with self._lock:
+            self._counts[key] += 1
+            self._params[key] = params
+        self._ensure_worker()
+
+    def pop(self, key):
+        """Return a fresh pooled quiz for key, or None if none is ready."""
+        with self._lock:
+            pool = self._pools.get(key)
+            quiz_data = None
+            while pool:
+                created_at, candidate = pool.popleft()
+                if time.time() - created_at <= self.max_age:
+                    quiz_data = candidate
+                    break
+            if quiz_data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        # Let the worker refill straight away
+        self._wake.set()
+        return quiz_data
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "depths": {key: len(pool) for key, pool in self._pools.items()},
+            }
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="quiz-pool", daemon=True
+                )
+                self._thread.start()
+
+    def _hot(self):
+        with self._lock:
+            return [
+                (key, self._params[key])
+                for key, count in self._counts.most_common(self.hot_keys)
+                if count >= self.min_requests
+            ]
+
+    def _next_refill(self):
+        """Pick the hot key whose pool is furthest below target_depth."""
+        best_key, best_params, best_depth = None, None, self.target_depth
+        now = time.time()
+        for key, params in self._hot():
+            with self._lock:
+                pool = self._pools.setdefault(key, deque())
+                while pool and now - pool[0][0] > self.max_age:
+                    pool.popleft()
+                depth = len(pool)
+            if depth < best_depth:
+                best_key, best_params, best_depth = key, params, depth
+        return best_key, best_params
+
+    def _refill(self):
+        """Generate one quiz for the hot key furthest below target_depth.
+
+        Returns False if no pool needs one or generation failed, so the worker waits
+        before trying again.
+        """
+        key, params = self._next_refill()
+        if key is None:
+            return False
+        try:
+            quiz_data = self.generate(**params)
+        except Exception as e:
+            print(f"Quiz pool could not pre-generate {key}: {str(e)}")
+            return False
+        if len(quiz_data) >= params["num_questions"]:
+            with self._lock:
+                self._pools.setdefault(key, deque()).append((time.time(), quiz_data))
+        return True
+
+    def _decay_counts(self):
+        # Decay counts so yesterday's hot topics cool off and their pools are dropped
+        with self._lock:
+            for key in list(self._counts):
+                self._counts[key] *= self.decay
+                if self._counts[key] < 0.5:
+                    del self._counts[key]
+                    self._params.pop(key, None)
+                    self._pools.pop(key, None)
+
+    def _run(self):
+        last_decay = time.monotonic()
+        while True:
+            if time.monotonic() - last_decay >= self.decay_interval:
+                self._decay_counts()
+                last_decay = time.monotonic()
+
+            if not self._refill():
+                self._wake.wait(self.interval)
+                self._wake.clear()
@@ -0,0 +1,130 @@
+import asyncio
+import collections
+import threading
+import time
+
+
+class TokenBucket:
+    """Process-wide rate limiter: rate tokens per second up to capacity.
+
+    acquire() blocks a thread and async_acquire() suspends a coroutine until a token is
+    free, so bursts are smoothed out before they reach the provider instead of coming
+    back as 429s. clock, sleep and async_sleep stand in for time.monotonic, time.sleep
+    and asyncio.sleep.
+    """
+
+    def __init__(
+        self,
+        rate,
+        capacity,
+        clock=time.monotonic,
+        sleep=time.sleep,
+        async_sleep=asyncio.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token, returning how long the caller must wait before using it."""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is a queue of reservations, each paid back at rate
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay:
+            self.sleep(delay)
+
+    async def async_acquire(self):
+        delay = self._reserve()
+        if delay:
+            await self.async_sleep(delay)
+
+
+class ConcurrencyLimit:
+    """Process-wide cap on calls in flight, shared by threads and coroutines.
+
+    Threads wait in acquire() and coroutines in async_acquire() on one count of free
+    slots, so sync and async callers together never exceed limit. A released slot goes
+    straight to the longest waiter, whichever kind it is.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._free = limit
+        # threading.Event for a waiting thread, (loop, future) for a waiting coroutine
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def async_acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            # A slot handed over before the cancellation is ours to pass on; if the
+            # future was cancelled first, _grant() passes it on instead
+            if not queued and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        await self.async_acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,293 @@
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from llm_metrics import percentile
+
+# Recent durations kept per (page, phase) for the percentiles
+RERUN_PROFILE_SAMPLES = int(os.getenv("RERUN_PROFILE_SAMPLES", "500"))
+# Script runs slower than this are kept, phase
+# by phase, for the overlay and the dump file
+RERUN_SLOW_MS = float(os.getenv("RERUN_SLOW_MS", "1000"))
+# Fraction of script runs profiled with cProfile
+RERUN_PROFILE_RATE = float(os.getenv("RERUN_PROFILE_RATE", "0"))
+# Profile a session's next script run after a slow
+# one, to see where a slow page spends its time
+RERUN_PROFILE_AFTER_SLOW = os.getenv("RERUN_PROFILE_AFTER_SLOW", "0") == "1"
+# Also snapshot allocations in profiled runs. tracemalloc is process-wide, so
+# allocations made by other sessions at the same time are included.
+RERUN_TRACEMALLOC = os.getenv("RERUN_TRACEMALLOC", "0") == "1"
+# Show the overlay toggle to every user, not
+# only LINGUIFY_ADMINS (for local development)
+RERUN_PROFILE_OVERLAY = os.getenv("RERUN_PROFILE_OVERLAY", "0") == "1"
+# JSON dump of the percentiles and slow runs, rewritten
+# at most every RERUN_PROFILE_FILE_INTERVAL seconds
+RERUN_PROFILE_FILE = os.getenv("RERUN_PROFILE_FILE")
+RERUN_PROFILE_FILE_INTERVAL = float(os.getenv("RERUN_PROFILE_FILE_INTERVAL", "60"))
+SLOW_RERUNS_KEPT = 20
+PROFILE_LINES = 30
+MEMORY_LINES = 10
+
+# The script run being profiled in this thread; Streamlit runs each session's script in
+# its own thread
+current_rerun = contextvars.ContextVar("current_rerun", default=None)
+
+
+class Rerun:
+    __slots__ = ("page", "start", "phases", "tracing")
+
+    def __init__(self, page):
+        self.page = page
+        self.start = time.perf_counter()
+        self.phases = []
+        self.tracing = False
+
+
+_lock = threading.Lock()
+_durations = defaultdict(lambda: deque(maxlen=RERUN_PROFILE_SAMPLES))
+_counts = defaultdict(int)
+_slow_reruns = deque(maxlen=SLOW_RERUNS_KEPT)
+# cProfile and tracemalloc captures run one at a time
+_capture_lock = threading.Lock()
+_dumped_at = 0.0
+# When this module was first imported. app.py imports it ahead of its page modules, so
+# the time from here to that script's import_seconds() call is the cost of importing
+# them; only a process's first script run pays it.
+_imported_at = time.perf_counter()
+
+
+def import_seconds():
+    """Seconds since this module was imported on the first call, and 0.0 after that."""
+    global _imported_at
+    with _lock:
+        started, _imported_at = _imported_at, None
+    return 0.0 if started is None else time.perf_counter() - started
+
+
+@contextmanager
+def phase(name):
+    """Time a named phase of the current script run, if any."""
+    rerun = current_rerun.get()
+    if rerun is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        rerun.phases.append((name, time.perf_counter() - start))
+
+
+def record_phase(name, seconds):
+    """Add a phase timed elsewhere, e.g. the imports, to the current run."""
+    rerun = current_rerun.get()
+    if rerun is not None:
+        rerun.phases.append((name, seconds))
+
+
+def profiled_rerun(page):
+    """Profile every call of a page's entry point as one script run.
+
+    Called from inside another profiled entry point (quiz.main from app.main), it only
+    names the page and is timed as a phase of the outer run.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rerun = current_rerun.get()
+            if rerun is not None:
+                rerun.page = page
+                with phase(f"{fn.__module__}.{fn.__name__}"):
+                    return fn(*args, **kwargs)
+            rerun = Rerun(page)
+            token = current_rerun.set(rerun)
+            profiler = _start_capture(rerun)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                # Also reached through st.rerun() and st.stop(), which raise
+                current_rerun.reset(token)
+                _finish(rerun, profiler)
+
+        return wrapper
+
+    return decorator
+
+
+def _start_capture(rerun):
+    armed = RERUN_PROFILE_AFTER_SLOW and st.session_state.pop(
+        "_profile_next_rerun", False
+    )
+    if not (armed or random.random() < RERUN_PROFILE_RATE) or not _capture_lock.acquire(
+        blocking=False
+    ):
+        return None
+    if RERUN_TRACEMALLOC:
+        rerun.tracing = not tracemalloc.is_tracing()
+        if rerun.tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler is already active in this thread
+        print(f"Could not profile script run: {str(e)}")
+        _stop_tracing(rerun)
+        _capture_lock.release()
+        return None
+    return profiler
+
+
+def _stop_tracing(rerun):
+    if rerun.tracing:
+        tracemalloc.stop()
+
+
+def _capture_report(rerun, profiler):
+    """Stop a capture; return its top functions and allocation sites."""
+    profiler.disable()
+    try:
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(
+            PROFILE_LINES
+        )
+        report = {"profile": stream.getvalue()}
+        if RERUN_TRACEMALLOC and tracemalloc.is_tracing():
+            report["peak_memory_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+            statistics = tracemalloc.take_snapshot().statistics("lineno")[:MEMORY_LINES]
+            report["memory"] = [str(statistic) for statistic in statistics]
+        return report
+    finally:
+        _stop_tracing(rerun)
+        _capture_lock.release()
+
+
+def _finish(rerun, profiler):
+    global _dumped_at
+    total = time.perf_counter() - rerun.start
+    report = _capture_report(rerun, profiler) if profiler is not None else None
+    slow = total * 1000 >= RERUN_SLOW_MS
+    # A phase entered more than once in a run (e.g. restore_session in app and quiz)
+    # counts once, summed
+    per_phase = {"total": total}
+    for name, seconds in rerun.phases:
+        per_phase[name] = per_phase.get(name, 0.0) + seconds
+    with _lock:
+        for name, seconds in per_phase.items():
+            _durations[(rerun.page, name)].append(seconds)
+            _counts[(rerun.page, name)] += 1
+        if slow or report is not None:
+            _slow_reruns.append(
+                {
+                    "time": time.time(),
+                    "page": rerun.page,
+                    "total_ms": total * 1000,
+                    "phases": [
+                        {"phase": name, "ms": seconds * 1000}
+                        for name, seconds in rerun.phases
+                    ],
+                    **(report or {}),
+                }
+            )
+        dump_due = (
+            RERUN_PROFILE_FILE
+            and time.monotonic() - _dumped_at >= RERUN_PROFILE_FILE_INTERVAL
+        )
+        if dump_due:
+            _dumped_at = time.monotonic()
+    if slow and RERUN_PROFILE_AFTER_SLOW:
+        st.session_state["_profile_next_rerun"] = True
+    if dump_due:
+        try:
+            write_dump_file(RERUN_PROFILE_FILE)
+        except OSError as e:
+            print(f"Could not write rerun profile: {str(e)}")
+
+
+def summary():
+    """Return run counts and percentiles in ms per (page, phase)."""
+    with _lock:
+        rows = []
+        for (page, name), recent in _durations.items():
+            rows.append(
+                {
+                    "page": page,
+                    "phase": name,
+                    "runs": _counts[(page, name)],
+                    "p50_ms": percentile(recent, 0.5) * 1000,
+                    "p95_ms": percentile(recent, 0.95) * 1000,
+                    "p99_ms": percentile(recent, 0.99) * 1000,
+                }
+            )
+    # Pages together, their slowest phases (and the total) first
+    return sorted(rows, key=lambda row: (row["page"], -row["p95_ms"]))
+
+
+def render_dump():
+    """Render percentiles and kept runs as JSON, for offline analysis."""
+    with _lock:
+        slow_reruns = list(_slow_reruns)
+    return json.dumps(
+        {"generated_at": time.time(), "phases": summary(), "slow_reruns": slow_reruns},
+        indent=2,
+    )
+
+
+def write_dump_file(path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_dump())
+    os.replace(tmp_path, path)
+
+
+def profile_overlay():
+    """Sidebar toggle for this run's phases, percentiles and slow runs."""
+    if not st.sidebar.toggle("Show rerun profile", key="rerun_profile_overlay"):
+        return
+    rerun = current_rerun.get()
+    with st.sidebar.expander("Rerun profile", expanded=True):
+        if rerun is not None:
+            elapsed = (time.perf_counter() - rerun.start) * 1000
+            st.caption(f"This run: {elapsed:.0f} ms so far on {rerun.page}")
+            st.dataframe(
+                pd.DataFrame(
+                    [
+                        {"phase": name, "ms": seconds * 1000}
+                        for name, seconds in rerun.phases
+                    ]
+                ),
+                hide_index=True,
+                use_container_width=True,
+            )
+        rows = summary()
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        with _lock:
+            latest = _slow_reruns[-1] if _slow_reruns else None
+        if latest is not None:
+            st.caption(
+                f"Latest slow run: {latest['page']}, {latest['total_ms']:.0f} ms"
+            )
+            if "profile" in latest:
+                st.code(latest["profile"], language=None)
+        st.download_button(
+            "Download rerun profile",
+            render_dump(),
+            file_name="linguify_rerun_profile.json",
+            mime="application/json",
+        )
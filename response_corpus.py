@@ -0,0 +1,35 @@
+import json
+import os
+import threading
+import time
+
+# Raw model responses are appended here when set, to build the parser benchmark corpus
+CORPUS_DIR = os.getenv("RECORD_RESPONSES_DIR")
+
+_lock = threading.Lock()
+
+
+def record(kind, content, structured=False):
+    """Append one raw response of the given kind to the corpus, if enabled."""
+    if not CORPUS_DIR or not content:
+        return
+    line = json.dumps(
+        {"time": time.time(), "structured": structured, "content": content}
+    )
+    try:
+        with _lock:
+            os.makedirs(CORPUS_DIR, exist_ok=True)
+            with open(os.path.join(CORPUS_DIR, f"{kind}.jsonl"), "a") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        print(f"Could not record {kind} response: {str(e)}")
+
+
+def load(kind, directory=None):
+    """Return a kind's responses as dicts with "structured" and "content"."""
+    path = os.path.join(directory or CORPUS_DIR or "", f"{kind}.jsonl")
+    try:
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
@@ -0,0 +1,226 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlite_db import SQLiteDatabase
+
+DAY = 24 * 60 * 60
+# Easiness factor bounds and starting value from SM-2
+MIN_EASINESS = 1.3
+INITIAL_EASINESS = 2.5
+# Answers graded below this quality (0-5) count as lapses and restart the schedule
+PASSING_QUALITY = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_items (
+    username TEXT NOT NULL,
+    question_key TEXT NOT NULL,
+    question TEXT NOT NULL,
+    topic TEXT NOT NULL DEFAULT '',
+    due REAL NOT NULL,
+    interval REAL NOT NULL,
+    repetitions INTEGER NOT NULL,
+    easiness REAL NOT NULL,
+    PRIMARY KEY (username, question_key)
+);
+"""
+
+
+def review_key(question):
+    return " ".join(question["question"].lower().split())
+
+
+class ReviewItem:
+    """One question a learner is reviewing, with its SM-2 state.
+
+    The question is kept as its JSON text, which is only parsed when a review quiz is
+    built.
+    """
+
+    __slots__ = (
+        "key",
+        "question",
+        "topic",
+        "due",
+        "interval",
+        "repetitions",
+        "easiness",
+    )
+
+    def __init__(
+        self,
+        key,
+        question,
+        topic,
+        due,
+        interval=0.0,
+        repetitions=0,
+        easiness=INITIAL_EASINESS,
+    ):
+        self.key = key
+        self.question = question
+        self.topic = topic
+        self.due = due
+        self.interval = interval
+        self.repetitions = repetitions
+        self.easiness = easiness
+
+    def grade(self, quality, now):
+        """Apply one SM-2 review with quality 0-5 and schedule the next one."""
+        if quality < PASSING_QUALITY:
+            self.repetitions = 0
+            self.interval = 1.0
+        else:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = 1.0
+            elif self.repetitions == 2:
+                self.interval = 6.0
+            else:
+                self.interval = round(self.interval * self.easiness)
+        self.easiness = max(
+            MIN_EASINESS,
+            self.easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02),
+        )
+        self.due = now + self.interval * DAY
+
+
+class UserReviews:
+    """A learner's review items plus a heap of (due, sequence, key) ordered by due time.
+
+    Rescheduling pushes a new heap entry and leaves the old one behind; stale entries
+    are skipped when they reach the top and the heap is rebuilt once they outnumber live
+    items.
+    """
+
+    __slots__ = ("items", "heap", "loaded_at")
+
+    def __init__(self, items, loaded_at):
+        self.items = {item.key: item for item in items}
+        self.loaded_at = loaded_at
+        self.heap = []
+        self.rebuild()
+
+    def rebuild(self):
+        self.heap = [
+            (item.due, i, item.key) for i, item in enumerate(self.items.values())
+        ]
+        heapq.heapify(self.heap)
+
+    def push(self, item, sequence):
+        heapq.heappush(self.heap, (item.due, sequence, item.key))
+        if len(self.heap) > 2 * len(self.items) + 16:
+            self.rebuild()
+
+    def _live(self, entry):
+        item = self.items.get(entry[2])
+        return item is not None and item.due == entry[0]
+
+    def due(self, now, limit):
+        """Return up to limit items due by now, earliest first, in O(limit log n)."""
+        popped, result = [], []
+        while self.heap and len(result) < limit and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            if self._live(entry):
+                popped.append(entry)
+                result.append(self.items[entry[2]])
+        for entry in popped:
+            heapq.heappush(self.heap, entry)
+        return result
+
+
+class ReviewScheduler:
+    """Spaced-repetition reviews of missed quiz questions, scheduled with SM-2.
+
+    Items are stored in SQLite, shared by every app process, and mirrored per user in
+    memory once that user is first seen; a user's items are reloaded after
+    refresh_interval seconds to pick up reviews graded by other processes. Only the
+    max_users most recently seen users are kept in memory.
+    """
+
+    def __init__(self, path, refresh_interval=None, max_users=10_000, timeout=10.0):
+        self._db = SQLiteDatabase(path, timeout=timeout)
+        self._db.executescript(SCHEMA)
+        self.refresh_interval = refresh_interval
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _user(self, username):
+        reviews = self._users.get(username)
+        now = time.monotonic()
+        if reviews is None or (
+            self.refresh_interval is not None
+            and now - reviews.loaded_at > self.refresh_interval
+        ):
+            with self._db.connection() as conn:
+                rows = conn.execute(
+                    "SELECT question_key, question, topic, due, interval, repetitions, "
+                    "easiness FROM review_items WHERE username = ?",
+                    (username,),
+                ).fetchall()
+            reviews = self._users[username] = UserReviews(
+                [ReviewItem(*row) for row in rows], now
+            )
+        self._users.move_to_end(username)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return reviews
+
+    def _store(self, username, item):
+        with self._db.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO review_items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    username,
+                    item.key,
+                    item.question,
+                    item.topic,
+                    item.due,
+                    item.interval,
+                    item.repetitions,
+                    item.easiness,
+                ),
+            )
+
+    def grade(self, username, question, quality, topic="", now=None):
+        """Record one answer to question with quality 0-5.
+
+        A failed answer adds the question to the learner's reviews if it is not there
+        yet; a passed answer only reschedules a question that is already being reviewed.
+        """
+        now = time.time() if now is None else now
+        key = review_key(question)
+        with self._lock:
+            reviews = self._user(username)
+            item = reviews.items.get(key)
+            if item is None:
+                if quality >= PASSING_QUALITY:
+                    return
+                item = reviews.items[key] = ReviewItem(
+                    key, json.dumps(question, separators=(",", ":")), topic, now
+                )
+            item.grade(quality, now)
+            reviews.push(item, next(self._sequence))
+            self._store(username, item)
+
+    def due(self, username, limit=10, now=None):
+        """Return up to limit of the learner's due questions, earliest first."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [
+                json.loads(item.question)
+                for item in self._user(username).due(now, limit)
+            ]
+
+
+reviews = ReviewScheduler(
+    os.getenv("LINGUIFY_DB_PATH", "linguify.db"),
+    refresh_interval=float(os.getenv("REVIEW_REFRESH", "300")),
+    max_users=int(os.getenv("REVIEW_MAX_USERS", "10000")),
+)
@@ -1,12 +1,21 @@
-import streamlit as st
-from openai import OpenAI
 import os
+import streamlit as st
+from llm_clients import chat_completion
+from llm_router import router
+from llm_metrics import instrumented
+from single_flight import coalesced
+from cache import PersistentLRUCache
+from roadmap_store import career_key, roadmaps
 
-my_secret = os.environ['OPENAI_API_KEY']
-client = OpenAI(api_key=my_secret)
+# Finished roadmaps keyed on the normalized career,
+# so "Data Scientist " reuses "data scientist"
+roadmap_cache = PersistentLRUCache(
+    "roadmap",
+    max_entries=int(os.getenv("ROADMAP_CACHE_SIZE", "200")),
+    ttl=int(os.getenv("ROADMAP_CACHE_TTL", str(7 * 24 * 60 * 60))),
+)
 
-def generate_roadmap(career):
-    system_prompt = """
+SYSTEM_PROMPT = """
     You are an expert career counselor and education planner. Generate a comprehensive study roadmap for the given career path.
     The roadmap should include:
     1. Key subjects or areas of study
@@ -17,16 +26,66 @@ def generate_roadmap(career):
 
     Format the response as a numbered list with main categories and sub-points.
     """
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Generate a study roadmap for becoming a {career}"}
-        ],
-        temperature=0.7,
-        max_tokens=1000
-    )
-    return response.choices[0].message.content
+
+def roadmap_messages(career):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"Generate a study roadmap for becoming a {career}",
+        },
+    ]
+
+@instrumented("generate_roadmap")
+@coalesced(lambda career: ("roadmap", career_key(career)))
+def generate_roadmap(career):
+    roadmap = roadmap_cache.get(career_key(career))
+    if roadmap is None:
+        response = router.complete(
+            roadmap_messages(career),
+            "openai",
+            models={"openai": "gpt-3.5-turbo"},
+            temperature=0.7,
+            max_tokens=1000,
+        )
+        roadmap = response.text
+        if roadmap.strip():
+            roadmap_cache.set(career_key(career), roadmap)
+    return roadmap
+
+@instrumented("stream_roadmap")
+def stream_roadmap(career):
+    """Yield the roadmap as it is generated, or all at once from the cache.
+
+    The finished roadmap is cached, unless the reader stopped before the end or the
+    stream came back empty. Only OpenAI streams; while the router prefers Gemini the
+    roadmap arrives in one piece.
+    """
+    roadmap = roadmap_cache.get(career_key(career))
+    if roadmap is not None:
+        yield roadmap
+        return
+    if router.order("openai")[0] != "openai":
+        roadmap = generate_roadmap(career)
+        yield roadmap
+        return
+    parts = []
+    with router.tracked("openai"):
+        stream = chat_completion(
+            model="gpt-3.5-turbo",
+            messages=roadmap_messages(career),
+            temperature=0.7,
+            max_tokens=1000,
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1]
+    roadmap = "".join(parts)
+    # An empty stream would otherwise be served from the cache until it expires
+    if roadmap.strip():
+        roadmap_cache.set(career_key(career), roadmap)
 
 st.title("Career Study Roadmap Generator")
 st.divider()
@@ -37,20 +96,23 @@ if 'roadmap_generated' not in st.session_state:
     st.session_state.roadmap_generated = False
 
 if st.button("Generate Roadmap"):
-    with st.spinner("Generating your career study roadmap..."):
-        roadmap = generate_roadmap(career)
-        st.session_state.roadmap = roadmap
-        st.session_state.roadmap_generated = True
-
-if st.session_state.roadmap_generated:
     st.subheader(f"Study Roadmap for {career}")
+    # Render tokens as they arrive; st.write_stream returns the full text at the end
+    st.session_state.roadmap = st.write_stream(stream_roadmap(career))
+    st.session_state.roadmap_career = career
+    st.session_state.roadmap_generated = True
+elif st.session_state.roadmap_generated:
+    st.subheader(f"Study Roadmap for {st.session_state.roadmap_career}")
     st.markdown(st.session_state.roadmap)
 
-    if st.button("Save Roadmap"):
-        roadmap_filename = f"{career.replace(' ', '_').lower()}_roadmap.txt"
-        with open(roadmap_filename, "w") as f:
-            f.write(st.session_state.roadmap)
-        st.success(f"Roadmap saved as {roadmap_filename}")
+if st.session_state.roadmap_generated and st.button("Save Roadmap"):
+    # Queued for the background writer; the page doesn't wait for the disk
+    roadmaps.save(
+        st.session_state.get("user"),
+        st.session_state.roadmap_career,
+        st.session_state.roadmap,
+    )
+    st.success(f"Roadmap for {st.session_state.roadmap_career} saved")
 
 st.divider()
 st.write(" ")
\ No newline at end of file
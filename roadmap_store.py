@@ -0,0 +1,102 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from sqlite_db import SQLiteDatabase
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roadmaps (
+    username TEXT NOT NULL,
+    career_key TEXT NOT NULL,
+    career TEXT NOT NULL,
+    roadmap TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    PRIMARY KEY (username, career_key)
+);
+"""
+
+
+def career_key(career):
+    return " ".join(career.lower().split())
+
+
+class RoadmapStore:
+    """Saved career roadmaps in SQLite, written by a background thread in batches.
+
+    save() only queues the roadmap, so the Save button never waits on the disk. The
+    writer takes whatever has queued up, up to batch_size roadmaps, and commits them in
+    one transaction; a learner saving the same career again replaces their earlier copy.
+    """
+
+    def __init__(self, path, batch_size=100, timeout=10.0):
+        self.path = path
+        self.batch_size = batch_size
+        # One connection for load(), one for the writer
+        self._db = SQLiteDatabase(path, pool_size=2, timeout=timeout)
+        self._db.executescript(SCHEMA)
+        self.saved = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def save(self, username, career, roadmap):
+        self._queue.put(
+            (username or "", career_key(career), career.strip(), roadmap, time.time())
+        )
+        self._ensure_worker()
+
+    def load(self, username, career):
+        """Return a learner's saved roadmap for career, or None."""
+        with self._db.connection() as conn:
+            row = conn.execute(
+                "SELECT roadmap FROM roadmaps WHERE username = ? AND career_key = ?",
+                (username or "", career_key(career)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def flush(self, timeout=None):
+        """Wait until every queued roadmap has been written."""
+        if timeout is None:
+            self._queue.join()
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="roadmap-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._db.transaction() as conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO roadmaps VALUES (?, ?, ?, ?, ?)", batch
+                    )
+                self.saved += len(batch)
+                self.batches += 1
+            except sqlite3.Error as e:
+                print(f"Could not save {len(batch)} roadmap(s): {str(e)}")
+            for _ in batch:
+                self._queue.task_done()
+
+
+roadmaps = RoadmapStore(
+    os.getenv("ROADMAP_DB_PATH", os.getenv("LINGUIFY_DB_PATH", "linguify.db"))
+)
@@ -1,38 +1,78 @@
 import streamlit as st
 import pandas as pd
-from auth import users, get_user_data, update_user_data
+from auth import users, increment_user_data
+from progress_log import progress
+from rerun_profiler import phase, profiled_rerun
 
+# Scoreboard periods and how many days each covers (None for the all-time ranking)
+WINDOWS = {"All time": None, "This week": 7, "This month": 30}
+
+@profiled_rerun("Scoreboard")
 def display_scoreboard():
     st.subheader("Scoreboard")
 
-    # Prepare data for the table
-    data = []
-    for username, user_data in users.items():
-        data.append({
-            "Username": username,
-            "Experience": user_data['experience'],
-            "Quizzes Completed": user_data['completed_quizzes']
-        })
-
-    # Create DataFrame and sort by Experience
-    df = pd.DataFrame(data)
-    df = df.sort_values(by="Experience", ascending=False).reset_index(drop=True)
+    window = st.radio("Period", list(WINDOWS), horizontal=True, key="scoreboard_window")
+    days = WINDOWS[window]
+    with phase("scoreboard_data"):
+        if days is None:
+            # Read straight off the experience index,
+            # so every process sees current scores
+            data = users.leaderboard(10)
+        else:
+            # Experience gained in the window, summed from the daily rollups
+            rows = progress.top(days, 10)
+            names = users.usernames(user_id for user_id, _, _ in rows)
+            data = [
+                (names.get(user_id, "?"), experience, quizzes)
+                for user_id, experience, quizzes in rows
+            ]
+        df = pd.DataFrame(data, columns=["Username", "Experience", "Quizzes Completed"])
 
-    # Add ranking
-    df.insert(0, "Rank", df.index + 1)
+        # Add ranking; users with the same experience share a rank, as in users.rank()
+        df.insert(0, "Rank", df["Experience"].rank(method="min", ascending=False))
+        df["Rank"] = df["Rank"].astype(int)
 
     # Display the table without the index and with full width
-    st.dataframe(df.head(10), hide_index=True, use_container_width=True)
+    with phase("scoreboard_table"):
+        st.dataframe(df, hide_index=True, use_container_width=True)
 
-# The update_user_progress function remains unchanged
-def update_user_progress(username, correct_answers, total_questions):
-    user_data = get_user_data(username)
+        rank = users.rank(st.session_state.get("user")) if days is None else None
+        if rank is not None:
+            st.write(f"Your rank: {rank} of {users.count()}")
+
+    with phase("progress_charts"):
+        user_id = users.user_id(st.session_state.get("user"))
+        if user_id is not None:
+            st.subheader("Your progress (last 30 days)")
+            history = progress.history(user_id, 30)
+            st.bar_chart(history["experience"])
+            st.line_chart(history["accuracy"])
+
+def award_experience(
+    username, level_threshold=None, correct_answers=0, questions=0, **deltas
+):
+    """Apply counter deltas to a user and log the progress event."""
+    user_data = increment_user_data(username, level_threshold=level_threshold, **deltas)
     if user_data:
-        accuracy = correct_answers / total_questions
-        user_data["experience"] += correct_answers * 10
-        user_data["streak"] += 1 if accuracy >= 0.7 else 0
-        user_data["completed_quizzes"] += 1
-        if user_data["experience"] >= 100:
-            user_data["level"] += 1
-            user_data["experience"] -= 100
-        update_user_data(username, user_data)
\ No newline at end of file
+        user_id = users.user_id(username)
+        if user_id is not None:
+            progress.record(
+                user_id,
+                experience=deltas.get("experience", 0),
+                quizzes=deltas.get("completed_quizzes", 0),
+                correct=correct_answers,
+                questions=questions,
+            )
+    return user_data
+
+def update_user_progress(username, correct_answers, total_questions):
+    accuracy = correct_answers / total_questions
+    award_experience(
+        username,
+        level_threshold=100,
+        experience=correct_answers * 10,
+        streak=1 if accuracy >= 0.7 else 0,
+        completed_quizzes=1,
+        correct_answers=correct_answers,
+        questions=total_questions,
+    )
\ No newline at end of file
@@ -0,0 +1,185 @@
+import re
+import threading
+import time
+import zlib
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from grading import normalize_answer
+
+# Words that don't change what a prompt asks for; every other word has to match
+FUNCTION_WORDS = {
+    "a",
+    "an",
+    "the",
+    "i",
+    "me",
+    "my",
+    "you",
+    "your",
+    "we",
+    "our",
+    "it",
+    "this",
+    "that",
+    "is",
+    "are",
+    "am",
+    "be",
+    "do",
+    "does",
+    "did",
+    "can",
+    "could",
+    "would",
+    "should",
+    "will",
+    "to",
+    "in",
+    "on",
+    "at",
+    "of",
+    "for",
+    "with",
+    "from",
+    "by",
+    "and",
+    "or",
+    "please",
+    # Left over from contractions ("what's", "you're"); "t" from "don't" is kept
+    "s",
+    "re",
+    "ll",
+    "ve",
+    "m",
+    "d",
+}
+# Spelling variants ("colour"/"color", "cat"/"cats") still match; different words don't
+WORD_SIMILARITY = 0.8
+
+
+def hashed_features(text, dim):
+    """Hash text's words and trigrams into a dim-sized frequency vector."""
+    vector = np.zeros(dim, dtype=np.float32)
+    words = re.findall(r"\w+", normalize_answer(text))
+    features = list(words)
+    for word in words:
+        padded = f" {word} "
+        features += [padded[i : i + 3] for i in range(len(padded) - 2)]
+    for feature in features:
+        vector[zlib.crc32(feature.encode()) % dim] += 1
+    # Sublinear tf so repeated words don't dominate
+    np.log1p(vector, out=vector)
+    return vector
+
+
+def content_words(text):
+    return frozenset(re.findall(r"\w+", normalize_answer(text))) - FUNCTION_WORDS
+
+
+def _has_counterpart(word, words):
+    return word in words or any(
+        SequenceMatcher(None, word, other).ratio() >= WORD_SIMILARITY for other in words
+    )
+
+
+def words_match(a, b):
+    """True if every content word of each prompt has a counterpart in the other."""
+    return all(_has_counterpart(word, b) for word in a - b) and all(
+        _has_counterpart(word, a) for word in b - a
+    )
+
+
+class SemanticCache:
+    """Answer cache that matches prompts by meaning, fully offline.
+
+    Prompts are embedded as hashed TF-IDF vectors and compared by cosine similarity
+    against a fixed-capacity NumPy matrix. Entries are separated by namespace (only
+    prompts with the same namespace can match), and the least recently used entry is
+    overwritten when full. Similar vectors alone aren't enough: "say cat in French" and
+    "say dog in French" are close, so a hit also needs the same content words, up to
+    spelling variants.
+    """
+
+    def __init__(self, capacity=1000, dim=2048, threshold=0.85):
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._namespaces = [None] * capacity
+        self._answers = [None] * capacity
+        self._words = [None] * capacity
+        self._last_used = np.zeros(capacity)
+        self._doc_freq = np.zeros(dim, dtype=np.float32)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _idf(self):
+        return np.log((1 + self._size) / (1 + self._doc_freq)) + 1
+
+    def _best_match(self, namespace, vector, words):
+        """Return the most similar prompt's row above the threshold."""
+        if self._size == 0:
+            return None
+        idf = self._idf()
+        query = vector * idf
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return None
+        stored = self._vectors[: self._size] * idf
+        norms = np.linalg.norm(stored, axis=1)
+        norms[norms == 0] = 1
+        similarities = stored @ query / (norms * query_norm)
+        mask = np.fromiter(
+            (ns == namespace for ns in self._namespaces[: self._size]),
+            dtype=bool,
+            count=self._size,
+        )
+        similarities[~mask] = -1
+        candidates = np.flatnonzero(similarities >= self.threshold)
+        for row in candidates[np.argsort(-similarities[candidates])]:
+            if words_match(words, self._words[row]):
+                return int(row)
+        return None
+
+    def get(self, namespace, prompt):
+        """Return the cached answer for the most similar matching prompt, or None."""
+        vector = hashed_features(prompt, self.dim)
+        words = content_words(prompt)
+        with self._lock:
+            best = self._best_match(namespace, vector, words)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[best] = time.monotonic()
+            return self._answers[best]
+
+    def set(self, namespace, prompt, answer):
+        vector = hashed_features(prompt, self.dim)
+        with self._lock:
+            if self._size < self.capacity:
+                row = self._size
+                self._size += 1
+            else:
+                row = int(np.argmin(self._last_used))
+                self._doc_freq -= self._vectors[row] > 0
+            self._vectors[row] = vector
+            self._doc_freq += vector > 0
+            self._namespaces[row] = namespace
+            self._answers[row] = answer
+            self._words[row] = content_words(prompt)
+            self._last_used[row] = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
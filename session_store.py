@@ -0,0 +1,253 @@
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import suppress
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from cache import CACHE_DIR
+from sqlite_db import SQLiteDatabase
+
+# "sqlite" or "file" keeps learner state outside the Streamlit process so any replica
+# can serve any session; empty keeps it in process memory only
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "")
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(7 * 24 * 60 * 60)))
+# Largest compressed state stored for one session
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024)))
+
+# Session state the quiz flow needs to resume on another replica, plus
+# the quiz's answer widgets. Anything else (e.g. the hint prefetch
+# future) is rebuilt or left out. The signed-in user is stored alongside,
+# but only to check who the state belongs to; it is never restored.
+PERSISTED_KEYS = (
+    "quiz",
+    "user_answers",
+    "quiz_submitted",
+    "quiz_results",
+    "quiz_review",
+    "current_hint",
+    "quiz_target_language",
+    "quiz_generated_topic",
+)
+WIDGET_KEY = re.compile(r"q\d+(_\d+)?$")
+# Dropped, in this order, when a session's state is over SESSION_MAX_BYTES, and reset
+# to the value the quiz starts them with. quiz_results is never dropped: the results
+# view can't render a submitted quiz without it.
+DROPPABLE_KEYS = {"current_hint": None, "user_answers": {}}
+
+
+def dump_state(state):
+    """Serialize state to compact, compressed JSON."""
+    return zlib.compress(
+        json.dumps(state, separators=(",", ":"), ensure_ascii=False).encode(), 6
+    )
+
+
+def load_state(payload):
+    state = json.loads(zlib.decompress(payload))
+    # JSON object keys are strings; answers are indexed by question number
+    if isinstance(state.get("user_answers"), dict):
+        state["user_answers"] = {
+            int(i): answer for i, answer in state["user_answers"].items()
+        }
+    return state
+
+
+class SQLiteSessionStore:
+    """Session state in a SQLite table, shared by every replica on the host."""
+
+    def __init__(self, path, timeout=10.0):
+        self._db = SQLiteDatabase(path, timeout=timeout)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(id TEXT PRIMARY KEY, state BLOB NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def load(self, session_id):
+        with self._db.connection() as conn:
+            row = conn.execute(
+                "SELECT state FROM sessions WHERE id = ? AND updated > ?",
+                (session_id, time.time() - SESSION_TTL),
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, session_id, payload):
+        with self._db.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, state, updated) VALUES (?, ?, ?)",
+                (session_id, payload, time.time()),
+            )
+
+    def delete(self, session_id):
+        with self._db.connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge(self):
+        with self._db.connection() as conn:
+            conn.execute(
+                "DELETE FROM sessions WHERE updated <= ?", (time.time() - SESSION_TTL,)
+            )
+
+
+class FileSessionStore:
+    """Session state as one file per session, e.g. on a shared volume."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.state")
+
+    def load(self, session_id):
+        path = self._path(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) > SESSION_TTL:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def save(self, session_id, payload):
+        path = self._path(session_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def delete(self, session_id):
+        with suppress(OSError):
+            os.remove(self._path(session_id))
+
+    def purge(self):
+        cutoff = time.time() - SESSION_TTL
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def make_store(backend):
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            os.getenv("SESSION_DB_PATH", os.getenv("LINGUIFY_DB_PATH", "linguify.db"))
+        )
+    if backend == "file":
+        return FileSessionStore(
+            os.getenv("SESSION_DIR", os.path.join(CACHE_DIR, "sessions"))
+        )
+    return None
+
+
+sessions = make_store(SESSION_BACKEND)
+# Expired sessions are purged at most this often, from whichever replica saves first
+PURGE_INTERVAL = 60 * 60
+_last_purge = 0.0
+
+
+def session_id():
+    """Return this browser session's id, kept in the URL.
+
+    The id only locates stored quiz state. It doesn't sign anyone in: anyone can see a
+    URL in a shared link or a log, so state is only restored into a session that has
+    signed in as the learner it belongs to.
+    """
+    sid = st.query_params.get("sid")
+    if not sid or not re.fullmatch(r"[A-Za-z0-9_-]{32}", sid):
+        sid = secrets.token_urlsafe(24)
+        st.query_params["sid"] = sid
+    return sid
+
+
+def snapshot():
+    state = st.session_state
+    data = {key: state[key] for key in PERSISTED_KEYS if key in state}
+    data["user"] = state["user"]
+    data.update({key: state[key] for key in state if WIDGET_KEY.match(str(key))})
+    return data
+
+
+def restore_session():
+    """Load this session's state from the shared store once signed in."""
+    user = st.session_state.get("user")
+    if (
+        sessions is None
+        or not user
+        or st.session_state.get("_session_restored") == user
+    ):
+        return
+    st.session_state["_session_restored"] = user
+    payload = sessions.load(session_id())
+    if payload is None:
+        return
+    try:
+        state = load_state(payload)
+    except (ValueError, zlib.error) as e:
+        print(f"Could not restore session state: {str(e)}")
+        return
+    if state.pop("user", None) != user:
+        # Saved by someone else who used this URL; it is overwritten on the next save
+        return
+    for key, value in state.items():
+        if key not in st.session_state:
+            st.session_state[key] = value
+    st.session_state["_session_digest"] = hash(payload)
+
+
+def persist_session():
+    """Write this session's state to the shared store if it changed."""
+    global _last_purge
+    if sessions is None or not st.session_state.get("user"):
+        return
+    data = snapshot()
+    payload = dump_state(data)
+    for key, empty in DROPPABLE_KEYS.items():
+        if len(payload) <= SESSION_MAX_BYTES:
+            break
+        if key in data:
+            # Trimmed from memory too, capping what a replica holds for the session
+            # at what any replica would restore
+            del data[key]
+            st.session_state[key] = empty
+            payload = dump_state(data)
+    if len(payload) > SESSION_MAX_BYTES:
+        print(
+            f"Session state is {len(payload)} bytes, over SESSION_MAX_BYTES; "
+            "not persisted"
+        )
+        return
+    if st.session_state.get("_session_digest") == hash(payload):
+        return
+    try:
+        sessions.save(session_id(), payload)
+        if time.time() - _last_purge > PURGE_INTERVAL:
+            _last_purge = time.time()
+            sessions.purge()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Could not persist session state: {str(e)}")
+        return
+    st.session_state["_session_digest"] = hash(payload)
+
+
+def persist_fragment():
+    """persist_session() for fragment reruns; full runs persist at the end."""
+    ctx = get_script_run_ctx()
+    if ctx is not None and ctx.fragment_ids_this_run:
+        persist_session()
+
+
+def end_session():
+    """Forget this session's stored state, e.g. on sign out."""
+    if sessions is not None:
+        sessions.delete(session_id())
+        st.session_state.pop("_session_digest", None)
@@ -0,0 +1,127 @@
+import asyncio
+import functools
+import inspect
+import os
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class LeaderAbandoned(Exception):
+    """The leader stopped without a result, e.g. interrupted by a rerun."""
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls so only the leader does the work.
+
+    Callers that arrive with the same key while the leader is running wait for its
+    result, or its exception, instead of repeating the call. Sync callers and coroutines
+    on the background loop share one table, so they coalesce with each other too. If the
+    leader is interrupted by a BaseException (Streamlit's rerun and stop, task
+    cancellation), waiting callers retry and one of them becomes the new leader; a
+    follower that has waited follower_timeout seconds runs the call itself.
+    """
+
+    def __init__(self, follower_timeout=None):
+        self.follower_timeout = follower_timeout
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.followers += 1
+                return future, False
+            future = self._inflight[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # Don't hand a rerun or cancellation to the followers; they retry instead
+            future.set_exception(
+                LeaderAbandoned(f"in-flight call {key!r} was abandoned")
+            )
+
+    def do(self, key, fn):
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result(timeout=self.follower_timeout)
+            except LeaderAbandoned:
+                continue
+            except FutureTimeoutError:
+                return fn()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def async_do(self, key, coro_fn):
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # Shielded, so a follower giving up doesn't cancel the leader's future
+                return await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(future)), self.follower_timeout
+                )
+            except LeaderAbandoned:
+                continue
+            except asyncio.TimeoutError:
+                return await coro_fn()
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+
+# Longest a caller waits on another session's identical generation before running it
+# itself
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "120"))
+# Process-wide table shared by every coalesced function
+flights = SingleFlight(follower_timeout=SINGLE_FLIGHT_TIMEOUT)
+
+
+def coalesced(key_fn):
+    """Decorate a function so identical concurrent calls share one execution.
+
+    key_fn receives the function's arguments and returns the key identifying a call.
+    """
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return await flights.async_do(
+                    key_fn(*args, **kwargs), lambda: fn(*args, **kwargs)
+                )
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return flights.do(key_fn(*args, **kwargs), lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
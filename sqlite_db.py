@@ -0,0 +1,52 @@
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+
+class SQLiteDatabase:
+    """A small pool of connections to one SQLite database in WAL mode.
+
+    Every store that keeps its data in SQLite goes through one of these, so concurrent
+    Streamlit sessions don't serialize on one handle. Connections are in autocommit
+    mode; transaction() groups statements that must be atomic.
+    """
+
+    def __init__(self, path, pool_size=4, timeout=10.0, row_factory=None):
+        self.path = path
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            conn = sqlite3.connect(
+                path, timeout=timeout, check_same_thread=False, isolation_level=None
+            )
+            if row_factory is not None:
+                conn.row_factory = row_factory
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front
+        # so read-then-write sequences are atomic
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                # Some errors have already rolled the transaction back
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def executescript(self, script):
+        with self.connection() as conn:
+            conn.executescript(script)
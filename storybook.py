@@ -1,36 +1,41 @@
-import os
 import streamlit as st
-from openai import OpenAI
+from cache import PersistentLRUCache
+from asset_cache import assets
+from llm_clients import image_generation
+from llm_router import router
+from llm_metrics import instrumented
 
 
-my_secret = st.secrets['OPENAI_API_KEY']
-#Initialize the OpenAI API client
-#my_secret = os.environ['OPENAI_API_KEY']
-client = OpenAI(api_key = my_secret)
+#Finished storybooks keyed on normalized concept; images are stored by content hash
+storybook_cache = PersistentLRUCache("storybook", max_entries = 500,
+                                     ttl = 7 * 24 * 60 * 60)
 
+@instrumented("story_gen")
 def story_gen(prompt):
   system_prompt ="""
   You are a world renowned writer with 50 years of experience for children storyteller. 
   You will be given a concept to generate a story suitable for ages 5-7 years old.
   """
 
-  response = client.chat.completions.create(
-      model = 'gpt-4o-mini',
-      messages = [
+  response = router.complete(
+      [
           {"role": "system",
           "content": system_prompt},
           {"role": "user",
           "content": prompt}
           ],
+      "openai",
+      models = {"openai": 'gpt-4o-mini'},
       temperature = 1.3,
       max_tokens = 200
   )
 
-  return response.choices[0].message.content
+  return response.text
 
 
 #Cover prompt generator
 
+@instrumented("cover_gen")
 def cover_gen(prompt):
   system_prompt ="""
   You will be given a children's story book. 
@@ -38,23 +43,25 @@ def cover_gen(prompt):
   The prompt will be sent to dall-e-2
   """
 
-  response = client.chat.completions.create(
-      model = 'gpt-4o-mini',
-      messages = [
+  response = router.complete(
+      [
           {"role": "system",
           "content": system_prompt},
           {"role": "user",
           "content": prompt}
           ],
+      "openai",
+      models = {"openai": 'gpt-4o-mini'},
       temperature = 1.3,
       max_tokens = 100
   )
 
-  return response.choices[0].message.content
+  return response.text
 
 #Image generator
+@instrumented("image_gen")
 def image_gen(prompt):
-  response = client.images.generate(
+  response = image_generation(
       model = 'dall-e-2',
       prompt = prompt,
       size = '256x256',
@@ -63,16 +70,29 @@ def image_gen(prompt):
 
   return response.data[0].url
 
-#storybook method
-def storybook(prompt):
+#Storybook pipeline, memoized by normalized concept
+def storybook_key(prompt):
+  return " ".join(prompt.lower().split())
+
+def generate_storybook(prompt):
+  key = storybook_key(prompt)
+  book = storybook_cache.get(key)
+  if book is not None and assets.get(book["image"]) is not None:
+    return book
+
   story = story_gen(prompt)
   cover = cover_gen(story)
-  image = image_gen(cover)
-
+  image = assets.fetch(image_gen(cover))
+  book = {"story": story, "cover": cover, "image": image}
+  storybook_cache.set(key, book)
+  return book
 
+#storybook method
+def storybook(prompt):
+  book = generate_storybook(prompt)
 
-  st.write(image)
-  st.write(story)
+  st.image(assets.get(book["image"]))
+  st.write(book["story"])
 
 st.title("Storybook Generator for Kids for fun")
 st.divider()
@@ -81,8 +101,4 @@ prompt = st.text_area("Enter your stroy concept:")
 
 if st.button("Generate Storybook"):
     with st.spinner("Please wait..."):
-        story = story_gen(prompt)
-        cover = cover_gen(story)
-        image = image_gen(cover)
-        st.image(image)
-        st.write(story)
\ No newline at end of file
+        storybook(prompt)
\ No newline at end of file
@@ -1,12 +1,61 @@
 import streamlit as st
-from openai import OpenAI
-import os
 import pandas as pd
+import asyncio
 import json
+import os
 import re
+from concurrent.futures import as_completed
+from background_loop import submit
+from llm_router import router
+from llm_metrics import instrumented
+import response_corpus
+from semantic_cache import SemanticCache
+from lesson_store import lessons, topic_key
+from single_flight import coalesced
+from rerun_profiler import phase, profiled_rerun
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Answers to chat questions and exercises, matched
+# by similar wording rather than exact text
+semantic_cache = SemanticCache(
+    capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "2000")),
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85")),
+)
+
+LESSON_COLUMNS = [
+    "Vocabulary",
+    "Vocabulary_Translation",
+    "Grammar_Points",
+    "Grammar_Translation",
+    "Cultural_Insights",
+    "Cultural_Translation",
+]
+# Ask for schema-constrained JSON lessons; parse_lesson_data remains the fallback
+LESSON_STRUCTURED_OUTPUT = os.getenv("LESSON_STRUCTURED_OUTPUT", "1") == "1"
+LESSON_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "lesson",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "rows": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            column: {"type": "string"} for column in LESSON_COLUMNS
+                        },
+                        "required": LESSON_COLUMNS,
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["rows"],
+            "additionalProperties": False,
+        },
+    },
+}
 
 def parse_lesson_data(content):
     """Parse the lesson data from the API response."""
@@ -35,8 +84,37 @@ def parse_lesson_data(content):
         rows.append(current_row)
     return rows
 
-def generate_lesson(topic, target_language, native_language):
-    """Generate a lesson on a given topic in a format suitable for table display."""
+def parse_structured_lesson(content):
+    """Parse a JSON lesson in one pass, falling back to parse_lesson_data."""
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return parse_lesson_data(content)
+    if isinstance(data, dict):
+        data = data.get("rows", [])
+    return (
+        [row for row in data if isinstance(row, dict)] if isinstance(data, list) else []
+    )
+
+def lesson_options():
+    # The JSON schema is OpenAI-only; Gemini gets the
+    # plain prompt, which parse_lesson_data reads
+    return (
+        {"openai": {"response_format": LESSON_RESPONSE_FORMAT}}
+        if LESSON_STRUCTURED_OUTPUT
+        else {}
+    )
+
+def lesson_rows(content):
+    if LESSON_STRUCTURED_OUTPUT:
+        return parse_structured_lesson(content)
+    return parse_lesson_data(content)
+
+def parse_lesson_response(content):
+    response_corpus.record("lesson", content, structured=LESSON_STRUCTURED_OUTPUT)
+    return lesson_rows(content)
+
+def lesson_messages(topic, target_language, native_language):
     prompt = f"""Create a short lesson about {topic} in {target_language} with translations to {native_language}. 
     Format the output as a list of dictionaries, where each dictionary represents a row with the following keys:
     - Vocabulary: the term in {target_language}
@@ -47,31 +125,101 @@ def generate_lesson(topic, target_language, native_language):
     - Cultural_Translation: cultural information in {native_language}
 
     Provide at least 10 rows  and maximum of 20 of content."""
+    return [
+        {
+            "role": "system",
+            "content": "You are a knowledgeable language teacher. Respond with a list "
+            "of dictionaries containing the lesson information.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+def exercise_messages(topic, target_language, exercise_type):
+    prompt = f"Create a {exercise_type} exercise about {topic} in {target_language}. Include instructions and the correct answer."
+    return [
+        {"role": "system", "content": "You are a creative language exercise creator."},
+        {"role": "user", "content": prompt},
+    ]
+
+def question_messages(user_question):
+    return [
+        {"role": "system", "content": "You are a helpful language learning assistant."},
+        {"role": "user", "content": user_question},
+    ]
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a knowledgeable language teacher. Respond with a list of dictionaries containing the lesson information."},
-            {"role": "user", "content": prompt}
-        ]
+def lesson_flight_key(topic, target_language, native_language):
+    return ("lesson", topic_key(topic), target_language, native_language)
+
+def exercise_namespace(target_language, exercise_type):
+    return f"exercise|{target_language}|{exercise_type}"
+
+def exercise_flight_key(topic, target_language, exercise_type):
+    return ("exercise", topic_key(topic), target_language, exercise_type)
+
+async def async_completion(messages, validate=None, options=None):
+    """Run a chat completion on the router's provider and return its text."""
+    response = await router.async_complete(
+        messages,
+        "openai",
+        validate=validate,
+        models={"openai": "gpt-4o-mini"},
+        options=options,
     )
+    return response.text
 
-    content = response.choices[0].message.content
-    lesson_data = parse_lesson_data(content)
-    return lesson_data
+@instrumented("generate_lesson")
+@coalesced(lesson_flight_key)
+async def async_generate_lesson(topic, target_language, native_language):
+    # The store reads and writes files; keep that off the shared event loop
+    lesson_data = await asyncio.to_thread(
+        lessons.load, topic, target_language, native_language
+    )
+    if lesson_data is not None:
+        return lesson_data
 
-def generate_exercise(topic, target_language, exercise_type):
-    """Generate an exercise based on the topic and exercise type."""
-    prompt = f"Create a {exercise_type} exercise about {topic} in {target_language}. Include instructions and the correct answer."
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a creative language exercise creator."},
-            {"role": "user", "content": prompt}
-        ]
+    content = await async_completion(
+        lesson_messages(topic, target_language, native_language),
+        validate=lambda text: bool(lesson_rows(text)),
+        options=lesson_options(),
+    )
+    lesson_data = parse_lesson_response(content)
+    await asyncio.to_thread(
+        lessons.save, topic, target_language, native_language, lesson_data
     )
-    return response.choices[0].message.content
+    return lesson_data
+
+@instrumented("generate_exercise")
+@coalesced(exercise_flight_key)
+async def async_generate_exercise(topic, target_language, exercise_type):
+    namespace = exercise_namespace(target_language, exercise_type)
+    exercise = semantic_cache.get(namespace, topic)
+    if exercise is None:
+        exercise = await async_completion(
+            exercise_messages(topic, target_language, exercise_type)
+        )
+        semantic_cache.set(namespace, topic, exercise)
+    return exercise
+
+@instrumented("ask_assistant")
+async def async_ask(user_question):
+    answer = semantic_cache.get("chat", user_question)
+    if answer is None:
+        answer = await async_completion(question_messages(user_question))
+        semantic_cache.set("chat", user_question, answer)
+    return answer
+
+def display_lesson(lesson_data, topic, target_language):
+    if lesson_data:
+        # Create a DataFrame from the lesson data
+        df = pd.DataFrame(lesson_data)
 
+        # Display the table
+        st.subheader(f"Lesson on {topic} in {target_language}")
+        st.table(df)
+    else:
+        st.error("Failed to generate lesson. Please try again.")
+
+@profiled_rerun("Teaching Assistant")
 def teaching_assistant_tab():
     # List of world languages
     languages = [
@@ -87,39 +235,54 @@ def teaching_assistant_tab():
     target_language = st.selectbox("Select the language you're learning:", languages)
     topic = st.text_input("Enter a topic you want to learn about:")
 
-    if st.button("Generate Lesson"):
-        with st.spinner("Generating lesson..."):
-            lesson_data = generate_lesson(topic, target_language, native_language)
+    exercise_type = st.selectbox("Choose an exercise type:", ["Vocabulary", "Grammar", "Reading Comprehension"])
 
-            if lesson_data:
-                # Create a DataFrame from the lesson data
-                df = pd.DataFrame(lesson_data)
+    col1, col2, col3 = st.columns(3)
+    generate_lesson_clicked = col1.button("Generate Lesson")
+    generate_exercise_clicked = col2.button("Generate Exercise")
+    generate_both_clicked = col3.button("Generate Lesson and Exercise")
 
-                # Display the table
-                st.subheader(f"Lesson on {topic} in {target_language}")
-                st.table(df)
-            else:
-                st.error("Failed to generate lesson. Please try again.")
+    # Start the requested generations together on the
+    # background loop and show each as it finishes
+    futures = {}
+    if generate_lesson_clicked or generate_both_clicked:
+        futures[
+            submit(async_generate_lesson(topic, target_language, native_language))
+        ] = "lesson"
+    if generate_exercise_clicked or generate_both_clicked:
+        futures[
+            submit(async_generate_exercise(topic, target_language, exercise_type))
+        ] = "exercise"
 
-    exercise_type = st.selectbox("Choose an exercise type:", ["Vocabulary", "Grammar", "Reading Comprehension"])
-    if st.button("Generate Exercise"):
-        with st.spinner("Generating exercise..."):
-            exercise = generate_exercise(topic, target_language, exercise_type)
-            st.markdown(exercise)
+    if futures:
+        lesson_area = st.container()
+        exercise_area = st.container()
+        # Mostly time spent waiting on the model;
+        # the rendering is timed as display_lesson
+        with st.spinner("Generating..."), phase("generate_lesson_exercise"):
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    st.error(
+                        "An unexpected error occurred while generating the "
+                        f"{futures[future]}: {str(e)}"
+                    )
+                    continue
+                if futures[future] == "lesson":
+                    with lesson_area, phase("display_lesson"):
+                        display_lesson(result, topic, target_language)
+                else:
+                    with exercise_area:
+                        st.markdown(result)
 
     st.markdown("---")
     st.subheader("Chat with Teaching Assistant")
     user_question = st.text_input("Ask a question about language learning:")
     if st.button("Ask"):
-        with st.spinner("Thinking..."):
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a helpful language learning assistant."},
-                    {"role": "user", "content": user_question}
-                ]
-            )
-            st.markdown(response.choices[0].message.content)
+        with st.spinner("Thinking..."), phase("ask_assistant"):
+            answer = submit(async_ask(user_question)).result()
+            st.markdown(answer)
 
 # Main app
 def main():
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Keep the module-level stores (SQLite databases, cache files) out of the working tree
+_workdir = tempfile.mkdtemp(prefix="linguify-tests-")
+os.environ.setdefault("LINGUIFY_DB_PATH", os.path.join(_workdir, "linguify.db"))
+os.environ.setdefault("LINGUIFY_CACHE_DIR", os.path.join(_workdir, "cache"))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """A clock for code that takes clock/sleep callables instead of using time.
+
+    Calling it returns now. sleep() and async_sleep() record the delay and move the
+    clock forward instead of waiting; async_sleep() still yields to the event loop, as a
+    real sleep would.
+    """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+        self.async_sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.async_sleeps.append(seconds)
+        await asyncio.sleep(0)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,66 @@
+import pytest
+
+import cache
+from cache import PersistentLRUCache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+
+
+def test_entries_survive_restart():
+    PersistentLRUCache("quiz").set("key", [{"question": "q", "answer": "a"}])
+    assert PersistentLRUCache("quiz").get("key") == [{"question": "q", "answer": "a"}]
+
+
+def test_processes_share_entries():
+    first, second = PersistentLRUCache("quiz"), PersistentLRUCache("quiz")
+    first.set("a", 1)
+    second.set("b", 2)
+    # Neither set overwrites the other instance's entries
+    assert first.get("b") == 2
+    assert second.get("a") == 1
+    assert first.stats()["entries"] == 2
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    lru = PersistentLRUCache("quiz", max_entries=2)
+    for key in ("a", "b"):
+        lru.set(key, key)
+        now[0] += 1
+    assert lru.get("a") == "a"
+    now[0] += 1
+    lru.set("c", "c")
+    assert lru.get("b") is None
+    assert lru.get("a") == "a"
+    assert lru.get("c") == "c"
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    lru = PersistentLRUCache("quiz", ttl=60)
+    lru.set("key", "value")
+    now[0] += 30
+    assert lru.get("key") == "value"
+    now[0] += 31
+    assert lru.get("key") is None
+    assert lru.stats() == {"entries": 0, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_clear():
+    lru = PersistentLRUCache("quiz")
+    lru.set("key", "value")
+    lru.clear()
+    assert lru.get("key") is None
+
+
+def test_set_many():
+    lru = PersistentLRUCache("hints", max_entries=3)
+    lru.set_many((f"q{i}", f"hint {i}") for i in range(4))
+    lru.set_many([])
+    assert lru.stats()["entries"] == 3
+    assert [lru.get(f"q{i}") for i in range(1, 4)] == ["hint 1", "hint 2", "hint 3"]
@@ -0,0 +1,101 @@
+import pytest
+
+from grading import AnswerKey, normalize_answer
+from quiz import check_answer
+
+QUIZ = [
+    {"question": "Hello in Spanish?", "answer": "Hola"},
+    {
+        "question": "Pick one",
+        "choices": ["café", "té"],
+        "answer": "café",
+    },
+    {"question": "Yo ___ y tú ___.", "clue": "verbs", "answer": "como, hablas"},
+    {"question": "Ella ___ mucho.", "clue": "verb", "answer": "come"},
+]
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("  Hello   World ", "hello world"),
+        ("Café", "cafe"),
+        # Decomposed e + combining acute accent
+        ("Cafe\u0301", "cafe"),
+        # Fullwidth letters and a ligature fold to plain ASCII
+        ("ｃａｆｅ", "cafe"),
+        ("ﬁn", "fin"),
+        ("Straße", "strasse"),
+        ("Niño pequeño", "nino pequeno"),
+        (42, "42"),
+    ],
+)
+def test_normalize_answer(text, expected):
+    assert normalize_answer(text) == expected
+
+
+def test_grade_folds_case_whitespace_and_accents():
+    key = AnswerKey(QUIZ)
+    assert len(key) == 4
+    answers = {0: " HOLA ", 1: "CAFE", 2: ["Como", " hablas "], 3: "come"}
+    assert key.grade(answers).tolist() == [True, True, True, True]
+
+
+def test_multi_blank_answers_are_compared_blank_by_blank():
+    key = AnswerKey(QUIZ)
+
+    def third(answer):
+        return key.grade({2: answer}).tolist()[2]
+
+    assert third(["como", "hablas"])
+    # Typed into one box, the answer is split on commas like the key
+    assert third("como,hablas")
+    assert third("como ,  hablas")
+    assert not third(["hablas", "como"])
+    assert not third(["como", "hablo"])
+    assert not third(["como"])
+    # An answer list for a single-answer question is joined back up
+    assert key.grade({3: ["come"]}).tolist()[3]
+    assert not key.grade({3: []}).tolist()[3]
+
+
+def test_missing_answers_are_wrong():
+    key = AnswerKey(QUIZ)
+    assert key.grade({}).tolist() == [False] * 4
+    assert key.grade(["hola"]).tolist() == [True, False, False, False]
+    assert not AnswerKey([{"question": "Blank?", "answer": ""}]).grade({0: "x"})[0]
+
+
+@pytest.mark.parametrize(
+    "answers",
+    [
+        {0: "hola", 1: "café", 2: ["como", "hablas"], 3: "come"},
+        {0: "Hola ", 1: "te", 2: ["Como", "hablo"], 3: " COME"},
+        {0: "adios", 1: "CAFÉ", 2: ["como", "hablas", "extra"], 3: ""},
+        {},
+    ],
+)
+def test_grade_agrees_with_check_answer(answers):
+    key = AnswerKey(QUIZ)
+    expected = [
+        check_answer(answers.get(i, ""), question["answer"])
+        for i, question in enumerate(QUIZ)
+    ]
+    assert key.grade(answers).tolist() == expected
+
+
+def test_grade_batch_scores_and_accuracy():
+    key = AnswerKey(QUIZ)
+    result = key.grade_batch(
+        [
+            {0: "hola", 1: "café", 2: ["como", "hablas"], 3: "come"},
+            {0: "hola", 1: "té"},
+        ]
+    )
+    assert result["correct"].tolist() == [
+        [True, True, True, True],
+        [True, False, False, False],
+    ]
+    assert result["scores"].tolist() == [4, 1]
+    assert result["accuracy"].tolist() == [1.0, 0.5, 0.5, 0.5]
+    assert key.grade_batch([])["accuracy"].tolist() == [0.0] * 4
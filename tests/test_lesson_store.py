@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from lesson_store import LessonStore
+
+ROWS = [
+    {"Vocabulary": "perro", "Vocabulary_Translation": "dog"},
+    {"Vocabulary": "gato", "Vocabulary_Translation": "cat", "Grammar_Points": 3},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LessonStore(str(tmp_path / "lessons"))
+
+
+def test_saved_lessons_load_back_as_text(store):
+    store.save("Pets", "Spanish", "English", ROWS)
+    assert store.load("Pets", "Spanish", "English") == [
+        {
+            "Vocabulary": "perro",
+            "Vocabulary_Translation": "dog",
+            "Grammar_Points": None,
+        },
+        {"Vocabulary": "gato", "Vocabulary_Translation": "cat", "Grammar_Points": "3"},
+    ]
+
+
+def test_lessons_are_keyed_by_normalized_topic_and_language_pair(store):
+    store.save("Pets", "Spanish", "English", ROWS)
+    assert store.load("  PETS ", "Spanish", "English") is not None
+    assert store.load("Pets", "Spanish", "French") is None
+    assert store.load("Pets", "Italian", "English") is None
+    assert store.load("Food", "Spanish", "English") is None
+
+
+def test_empty_lessons_are_not_stored(store):
+    store.save("Pets", "Spanish", "English", [])
+    assert store.load("Pets", "Spanish", "English") is None
+    assert not os.path.exists(store.root)
+
+
+def test_resaving_replaces_the_lesson_and_leaves_no_temporary_files(store):
+    store.save("Pets", "Spanish", "English", ROWS)
+    store.save("Pets", "Spanish", "English", ROWS[:1])
+    assert len(store.load("Pets", "Spanish", "English")) == 1
+    directory = os.path.dirname(store._path("Pets", "Spanish", "English"))
+    assert [name for name in os.listdir(directory) if name.endswith(".tmp")] == []
+
+
+def test_unreadable_lesson_loads_as_none(store):
+    path = store._path("Pets", "Spanish", "English")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(b"not arrow")
+    assert store.load("Pets", "Spanish", "English") is None
+
+
+def test_scan_reads_every_lesson_with_its_partition(store):
+    store.save("Pets", "Spanish", "English", ROWS)
+    store.save("Food", "French", "English", [{"Vocabulary": "pain"}])
+    table = store.scan().to_table(columns=["topic", "target_language", "Vocabulary"])
+    assert sorted(
+        zip(
+            table["topic"].to_pylist(),
+            table["target_language"].to_pylist(),
+            table["Vocabulary"].to_pylist(),
+            strict=True,
+        )
+    ) == [
+        ("food", "French", "pain"),
+        ("pets", "Spanish", "gato"),
+        ("pets", "Spanish", "perro"),
+    ]
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+
+import pytest
+
+import llm_router
+from llm_router import MIN_SAMPLES, CircuitBreaker, InvalidResponse, Router
+
+MESSAGES = [{"role": "user", "content": "Hola"}]
+
+
+@pytest.fixture
+def router(monkeypatch, clock):
+    monkeypatch.setattr(llm_router, "LLM_HEDGING", True)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_DELAY", None)
+    router = Router(max_workers=4, clock=clock)
+    yield router
+    router._executor.shutdown(wait=True)
+
+
+def fake_provider(router, answers):
+    """Answer calls from answers[provider]: text, an exception or a callable."""
+    calls = []
+
+    def answer(provider):
+        calls.append(provider)
+        result = answers[provider]
+        if callable(result):
+            result = result()
+        if isinstance(result, Exception):
+            raise result
+        return result, None
+
+    def call(provider, *_args):
+        return answer(provider)
+
+    async def async_call(provider, *_args):
+        return answer(provider)
+
+    router._call = call
+    router._async_call = async_call
+    return calls
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.available()
+
+
+def test_breaker_half_opens_after_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 29
+    assert breaker.state == "open"
+    clock.now += 1
+    assert breaker.state == "half-open"
+    assert breaker.available()
+    # A failed trial call reopens it for another reset_timeout
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 30
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_open_circuit_moves_provider_last(router, clock):
+    assert router.order("gemini", "quiz") == ["gemini", "openai"]
+    for _ in range(llm_router.LLM_BREAKER_FAILURES):
+        router.observe("quiz", "gemini", 1.0, RuntimeError("down"))
+    assert router.order("gemini", "quiz") == ["openai", "gemini"]
+    clock.now += llm_router.LLM_BREAKER_RESET
+    assert router.order("gemini", "quiz") == ["gemini", "openai"]
+
+
+def test_invalid_answers_do_not_trip_the_breaker(router):
+    for _ in range(llm_router.LLM_BREAKER_FAILURES):
+        router.observe("quiz", "gemini", 1.0, InvalidResponse("bad"))
+    assert router.breakers["gemini"].state == "closed"
+
+
+def test_slow_provider_is_tried_second(router):
+    for _ in range(MIN_SAMPLES):
+        router.observe("quiz", "gemini", 10.0)
+        router.observe("quiz", "openai", 1.0)
+    assert router.order("gemini", "quiz") == ["openai", "gemini"]
+    # Other functions keep their own latencies
+    assert router.order("gemini", "hint") == ["gemini", "openai"]
+
+
+def test_hedge_delay_follows_recent_p95(router, monkeypatch):
+    assert router.hedge_delay("quiz", "gemini") == llm_router.LLM_HEDGE_DEFAULT_DELAY
+    for i in range(100):
+        router.observe("quiz", "gemini", 5.0 if i < 90 else 9.0)
+    assert router.hedge_delay("quiz", "gemini") == pytest.approx(9.0)
+    for _ in range(200):
+        router.observe("hint", "gemini", 0.1)
+    assert router.hedge_delay("hint", "gemini") == llm_router.LLM_HEDGE_MIN_DELAY
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_DELAY", "4")
+    assert router.hedge_delay("quiz", "gemini") == 4.0
+
+
+def test_failover_on_error(router):
+    calls = fake_provider(
+        router, {"gemini": RuntimeError("down"), "openai": "respuesta"}
+    )
+    result = router.complete(MESSAGES, "gemini")
+    assert (result.text, result.provider) == ("respuesta", "openai")
+    assert calls == ["gemini", "openai"]
+    assert router.breakers["gemini"].failures == 1
+    assert sum(router.failovers.values()) == 1
+
+
+def test_failover_on_invalid_answer(router):
+    fake_provider(router, {"gemini": "garbage", "openai": "respuesta"})
+    result = router.complete(
+        MESSAGES, "gemini", validate=lambda text: text != "garbage"
+    )
+    assert result.provider == "openai"
+    assert router.breakers["gemini"].failures == 0
+
+
+def test_last_error_is_raised_when_every_provider_fails(router):
+    fake_provider(
+        router,
+        {"gemini": RuntimeError("gemini down"), "openai": RuntimeError("openai down")},
+    )
+    with pytest.raises(RuntimeError, match="openai down"):
+        router.complete(MESSAGES, "gemini")
+
+
+def test_slow_request_is_hedged(router, monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_DELAY", "0.01")
+    release = threading.Event()
+
+    def stuck():
+        # Stays in flight until the backup has answered
+        release.wait(10)
+        return "late"
+
+    calls = fake_provider(router, {"gemini": stuck, "openai": "respuesta"})
+    try:
+        result = router.complete(MESSAGES, "gemini")
+    finally:
+        release.set()
+    assert result.provider == "openai"
+    assert calls == ["gemini", "openai"]
+    assert sum(router.hedges.values()) == 1
+    assert sum(router.failovers.values()) == 0
+
+
+def test_hedging_can_be_disabled(router, monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_HEDGING", False)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_DELAY", "0")
+    calls = fake_provider(router, {"gemini": "respuesta", "openai": "other"})
+    assert router.complete(MESSAGES, "gemini").provider == "gemini"
+    assert calls == ["gemini"]
+
+
+def test_async_complete_fails_over_and_hedges(router, monkeypatch):
+    fake_provider(router, {"gemini": RuntimeError("down"), "openai": "respuesta"})
+    assert asyncio.run(router.async_complete(MESSAGES, "gemini")).provider == "openai"
+
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_DELAY", "0.01")
+
+    async def stuck(provider, *_args):
+        if provider == "gemini":
+            await asyncio.sleep(10)
+        return "respuesta", None
+
+    router._async_call = stuck
+    assert asyncio.run(router.async_complete(MESSAGES, "gemini")).provider == "openai"
+    assert sum(router.hedges.values()) == 1
+
+
+def test_stats(router):
+    fake_provider(router, {"gemini": "respuesta", "openai": "other"})
+    router.complete(MESSAGES, "gemini")
+    rows, hedges, failovers = router.stats()
+    assert {row["provider"]: row["answered"] for row in rows} == {
+        "gemini": 1,
+        "openai": 0,
+    }
+    assert (hedges, failovers) == (0, 0)
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from progress_log import DAY, EVENT, ProgressLog, day_number, week_number
+
+# A Wednesday, at noon UTC
+NOW = datetime(2024, 5, 15, 12, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def log(tmp_path):
+    return ProgressLog(str(tmp_path / "events.bin"), str(tmp_path / "progress.db"))
+
+
+def rollups(log):
+    with sqlite3.connect(log._db.path) as conn:
+        return {
+            table: sorted(conn.execute(f"SELECT * FROM {table}"))
+            for table in ("progress_daily", "progress_weekly")
+        }
+
+
+def test_events_are_appended_as_fixed_size_records(log):
+    log.record(7, experience=30, quizzes=1, correct=3, questions=5, now=NOW)
+    log.record(8, experience=-10, now=NOW + 1)
+    assert os.path.getsize(log.log_path) == 2 * EVENT.size == 36
+    events = log.events()
+    assert events.tolist() == [
+        (int(NOW), 7, 30, 1, 3, 5),
+        (int(NOW) + 1, 8, -10, 0, 0, 0),
+    ]
+
+
+def test_missing_log_reads_as_no_events(log):
+    assert len(log.events()) == 0
+
+
+def test_weeks_start_on_monday():
+    def week(day):
+        return week_number(day_number(day.timestamp()))
+
+    # 1970-01-01 was a Thursday
+    assert [week_number(day) for day in range(12)] == [0] * 4 + [1] * 7 + [2]
+    monday = datetime(2024, 5, 13, 12, tzinfo=timezone.utc)
+    weeks = [week(monday + timedelta(days=offset)) for offset in range(-1, 8)]
+    assert weeks[0] + 1 == weeks[1] == weeks[7] == weeks[8] - 1
+
+
+def test_top_sums_the_window(log):
+    for days_ago, user_id, experience in [
+        (0, 1, 10),
+        (6, 1, 10),
+        (7, 1, 100),
+        (2, 2, 15),
+        (40, 3, 500),
+    ]:
+        log.record(user_id, experience=experience, quizzes=1, now=NOW - days_ago * DAY)
+    assert log.top(1, now=NOW) == [(1, 10, 1)]
+    assert log.top(7, now=NOW) == [(1, 20, 2), (2, 15, 1)]
+    assert log.top(7, limit=1, now=NOW) == [(1, 20, 2)]
+    # Windows longer than MAX_DAILY_WINDOW come from the weekly rollups
+    assert log.top(60, now=NOW) == [(3, 500, 1), (1, 120, 3), (2, 15, 1)]
+
+
+def test_history_fills_idle_days_with_zeros(log):
+    log.record(1, experience=20, quizzes=1, correct=3, questions=4, now=NOW)
+    log.record(1, experience=10, quizzes=1, correct=1, questions=4, now=NOW)
+    log.record(1, experience=5, quizzes=1, now=NOW - 2 * DAY)
+    log.record(2, experience=99, quizzes=1, correct=1, questions=1, now=NOW)
+    history = log.history(1, days=3, now=NOW)
+    assert history.index.strftime("%Y-%m-%d").tolist() == [
+        "2024-05-13",
+        "2024-05-14",
+        "2024-05-15",
+    ]
+    assert history["experience"].tolist() == [5, 0, 30]
+    assert history["quizzes"].tolist() == [1, 0, 2]
+    assert history["accuracy"].tolist() == [0.0, 0.0, 0.5]
+
+
+def test_rebuild_reproduces_the_rollups(log):
+    for i in range(50):
+        log.record(
+            i % 4 + 1,
+            experience=i,
+            quizzes=1,
+            correct=i % 3,
+            questions=3,
+            now=NOW - i * DAY / 3,
+        )
+    recorded = rollups(log)
+    with sqlite3.connect(log._db.path) as conn:
+        conn.execute("UPDATE progress_daily SET experience = 0")
+    log.rebuild_rollups()
+    assert rollups(log) == recorded
+
+
+def test_rebuild_keeps_the_rollups_without_a_log(log):
+    log.record(1, experience=10, now=NOW)
+    recorded = rollups(log)
+    os.remove(log.log_path)
+    with pytest.raises(OSError):
+        log.rebuild_rollups()
+    assert rollups(log) == recorded
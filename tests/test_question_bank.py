@@ -0,0 +1,197 @@
+import itertools
+import json
+
+import pytest
+
+import quiz
+from llm_router import Completion
+from question_bank import QuestionBank, question_type
+
+PARAMS = ("English", "Spanish", "Food", "Easy")
+
+
+def make_question(i, kind="translation"):
+    question = {
+        "question": (
+            f"Translate sentence number {i}: the {i} apples are on table {i * 7}"
+        ),
+        "answer": f"respuesta {i}",
+        "explanation": "...",
+    }
+    if kind == "multiple_choice":
+        question["choices"] = ["A) uno", "B) dos", "C) tres", "D) cuatro"]
+    elif kind == "fill_in_the_blank":
+        question["clue"] = "a word"
+    return question
+
+
+@pytest.fixture
+def bank(tmp_path):
+    return QuestionBank(str(tmp_path / "bank.db"))
+
+
+def add(bank, questions, params=PARAMS):
+    native_language, target_language, topic, difficulty = params
+    return bank.add_many(questions, native_language, target_language, topic, difficulty)
+
+
+def test_near_duplicates_are_rejected(bank):
+    original = {
+        "question": (
+            "How do you say 'the red apple is on the kitchen table' in Spanish?"
+        ),
+        "answer": "x",
+    }
+    reworded = {
+        "question": (
+            "How do you say 'the red apple is on the kitchen table' in Spanish ?"
+        ),
+        "answer": "y",
+    }
+    different = {
+        "question": "Which verb means 'to run' in Spanish?",
+        "answer": "correr",
+    }
+    assert add(bank, [original]) == 1
+    assert add(bank, [reworded, different]) == 1
+    assert bank.duplicates == 1
+    assert bank.coverage(*PARAMS) == 2
+
+
+def test_duplicates_are_per_language_pair(bank):
+    question = {"question": "How do you say 'good morning' politely?", "answer": "x"}
+    assert add(bank, [question]) == 1
+    assert add(bank, [question], ("English", "French", "Food", "Easy")) == 1
+
+
+def test_signature_estimates_similarity(bank):
+    text = "Translate: the cat sleeps on the warm windowsill every afternoon"
+    assert (bank.signature(text) == bank.signature(text)).all()
+    unrelated = bank.signature(
+        "Which of these is a fruit? A) mesa B) manzana C) silla D) puerta"
+    )
+    assert (bank.signature(text) == unrelated).mean() < 0.2
+
+
+def test_coverage_matches_quiz_parameters(bank):
+    add(bank, [make_question(i) for i in range(3)])
+    assert bank.coverage(*PARAMS) == 3
+    assert bank.coverage("English", "Spanish", "Food", "Hard") == 0
+    assert bank.coverage("English", "Spanish", "Travel", "Easy") == 0
+    # Topics match on their words, ignoring case and stopwords
+    assert bank.coverage("English", "Spanish", "the food", "easy") == 3
+
+
+def test_instances_share_one_database(tmp_path):
+    path = str(tmp_path / "bank.db")
+    # Long refresh intervals: only add_many's sync picks up the other's rows
+    first = QuestionBank(path, refresh_interval=3600)
+    second = QuestionBank(path, refresh_interval=3600)
+    assert first.coverage(*PARAMS) == second.coverage(*PARAMS) == 0
+    assert add(second, [make_question(1)]) == 1
+    assert add(first, [make_question(2)]) == 1
+    assert add(second, [make_question(3)]) == 1
+    assert add(first, [make_question(4)]) == 1
+    # Each instance indexed the other's earlier, lower-numbered rows before inserting
+    assert first.coverage(*PARAMS) == 4
+    assert second.coverage(*PARAMS) == 3
+    reworded = {**make_question(4), "question": make_question(4)["question"] + " ?"}
+    assert add(second, [reworded]) == 0
+    assert second.duplicates == 1
+    assert second.coverage(*PARAMS) == 4
+    served = {q["question"] for q in first.assemble(*PARAMS, 4)}
+    assert served == {make_question(i)["question"] for i in range(1, 5)}
+
+
+def test_failed_insert_leaves_no_phantom_questions(bank, monkeypatch):
+    add(bank, [make_question(1)])
+    index = bank._index
+    calls = []
+
+    def index_then_fail(*args):
+        # The second question of the batch fails after the first was indexed
+        calls.append(args[0])
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        index(*args)
+
+    monkeypatch.setattr(bank, "_index", index_then_fail)
+    with pytest.raises(RuntimeError):
+        add(bank, [make_question(2), make_question(3)])
+    monkeypatch.undo()
+    assert bank.coverage(*PARAMS) == 1
+    assert add(bank, [make_question(2)]) == 1
+    assert bank.coverage(*PARAMS) == 2
+
+
+def test_assemble_mixes_question_types(bank):
+    kinds = ("multiple_choice", "fill_in_the_blank", "translation")
+    add(bank, [make_question(i, kinds[i % 3]) for i in range(9)])
+    picked = bank.assemble(*PARAMS, 3)
+    assert sorted(question_type(q) for q in picked) == sorted(kinds)
+
+
+def test_assemble_rotates_through_least_served(bank):
+    add(bank, [make_question(i) for i in range(9)])
+    quizzes = [{q["question"] for q in bank.assemble(*PARAMS, 3)} for _ in range(3)]
+    assert len(set.union(*quizzes)) == 9
+    assert bank.stats()["hits"] == 9
+
+
+class FakeRouter:
+    """Answers every quiz prompt with new questions, counting the calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.numbers = itertools.count(1000)
+
+    def order(self, preferred, _function=None):
+        return [preferred]
+
+    def complete(self, messages, preferred, **_kwargs):
+        self.calls += 1
+        count = int(messages[0]["content"].split("Include ")[1].split()[0])
+        text = json.dumps([make_question(next(self.numbers)) for _ in range(count)])
+        return Completion(text, preferred, None)
+
+
+@pytest.fixture
+def fake_quiz(bank, monkeypatch):
+    fake_router = FakeRouter()
+    monkeypatch.setattr(quiz, "question_bank", bank)
+    monkeypatch.setattr(quiz, "router", fake_router)
+    monkeypatch.setattr(quiz.response_corpus, "record", lambda *_args, **_kwargs: None)
+    return fake_router
+
+
+def generate(num_questions, stats):
+    native_language, target_language, topic, difficulty = PARAMS
+    return quiz.generate_quiz(
+        native_language, target_language, topic, num_questions, difficulty, stats=stats
+    )
+
+
+def test_banked_questions_leaves_room_for_new_ones(monkeypatch):
+    monkeypatch.setattr(quiz, "QUIZ_BANK_MARGIN", 3)
+    monkeypatch.setattr(quiz, "QUIZ_FRESH_SHARE", 0.3)
+    assert quiz.banked_questions(0, 10) == 7
+    assert quiz.banked_questions(29, 10) == 7
+    assert quiz.banked_questions(30, 10) == 10
+    assert quiz.banked_questions(0, 1) == 0
+
+
+def test_bank_keeps_growing_until_it_can_vary_quizzes(bank, fake_quiz, monkeypatch):
+    monkeypatch.setattr(quiz, "QUIZ_BANK_MARGIN", 3)
+    monkeypatch.setattr(quiz, "QUIZ_FRESH_SHARE", 0.3)
+    quizzes = []
+    while bank.coverage(*PARAMS) < 30:
+        stats = {}
+        quizzes.append(frozenset(q["question"] for q in generate(10, stats)))
+        assert stats["bank_questions"] <= 7
+    calls = fake_quiz.calls
+    stats = {}
+    quizzes.append(frozenset(q["question"] for q in generate(10, stats)))
+    # A full bank serves the quiz without the model
+    assert stats["bank_questions"] == 10
+    assert fake_quiz.calls == calls
+    assert len(set(quizzes)) == len(quizzes)
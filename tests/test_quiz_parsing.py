@@ -0,0 +1,48 @@
+import json
+
+import quiz
+
+
+def test_structured_prompt_names_the_questions_key():
+    prompt = quiz.create_quiz_prompt(
+        "English", "Spanish", "food", 5, "Easy", structured=True
+    )
+    assert '"questions"' in prompt
+    assert "Format each question as follows" not in prompt
+
+
+def test_strict_schema_output_parses():
+    # OpenAI strict mode returns every field, with
+    # null for the ones a question type doesn't use
+    content = json.dumps(
+        {
+            "questions": [
+                {
+                    "question": "Translate 'bread'.",
+                    "choices": None,
+                    "clue": None,
+                    "answer": "pan",
+                    "explanation": "...",
+                },
+                {
+                    "question": "Yo ___ agua.",
+                    "choices": None,
+                    "clue": "to drink",
+                    "answer": "bebo",
+                    "explanation": "...",
+                },
+            ]
+        }
+    )
+    questions = quiz.parse_structured_quiz(content)
+    assert questions[0] == {
+        "question": "Translate 'bread'.",
+        "answer": "pan",
+        "explanation": "...",
+    }
+    assert questions[1]["clue"] == "to drink"
+    assert "choices" not in questions[1]
+    schema = quiz.QUIZ_RESPONSE_FORMAT["json_schema"]["schema"]["properties"][
+        "questions"
+    ]["items"]
+    assert set(schema["required"]) == set(quiz.QuizQuestion.__annotations__)
@@ -0,0 +1,102 @@
+import pytest
+
+from quiz_pool import QuizPool
+
+PARAMS = {"topic": "food", "num_questions": 2}
+
+
+def fake_generator(fail=False):
+    """Return a generate() that makes numbered quizzes, and the list of its calls."""
+    calls = []
+
+    def generate(**params):
+        calls.append(params)
+        if fail:
+            raise RuntimeError("model unavailable")
+        return [
+            {"question": f"Q{len(calls)}.{i}"} for i in range(params["num_questions"])
+        ]
+
+    return generate, calls
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    """A pool without its worker thread; tests drive _refill() themselves."""
+
+    def make(generate, **kwargs):
+        pool = QuizPool(generate, **kwargs)
+        monkeypatch.setattr(pool, "_ensure_worker", lambda: None)
+        return pool
+
+    return make
+
+
+def refill_until_full(pool):
+    refills = 0
+    while pool._refill():
+        refills += 1
+        assert refills < 100
+    return refills
+
+
+def test_keys_are_pooled_once_hot(make_pool):
+    generate, calls = fake_generator()
+    pool = make_pool(generate, target_depth=2, min_requests=3)
+    for _ in range(2):
+        pool.record_request("food", PARAMS)
+    assert not pool._refill()
+    pool.record_request("food", PARAMS)
+    assert refill_until_full(pool) == 2
+    assert calls == [PARAMS, PARAMS]
+
+
+def test_each_pooled_quiz_is_served_once(make_pool):
+    generate, _ = fake_generator()
+    pool = make_pool(generate, target_depth=3, min_requests=1)
+    pool.record_request("food", PARAMS)
+    refill_until_full(pool)
+    served = [pool.pop("food") for _ in range(4)]
+    assert served[3] is None
+    assert len({quiz[0]["question"] for quiz in served[:3]}) == 3
+    assert pool.stats()["hits"] == 3
+    assert pool.stats()["misses"] == 1
+    # Taking from a pool lets the worker top it back up
+    assert refill_until_full(pool) == 3
+    assert pool.pop("food")[0]["question"] not in {
+        quiz[0]["question"] for quiz in served[:3]
+    }
+
+
+def test_pools_stop_at_target_depth(make_pool):
+    generate, calls = fake_generator()
+    pool = make_pool(generate, target_depth=2, min_requests=1, hot_keys=2)
+    for key in ("food", "travel", "music"):
+        for _ in range(3 if key != "music" else 1):
+            pool.record_request(key, {**PARAMS, "topic": key})
+    refill_until_full(pool)
+    # Only the two hottest keys are pooled, each up to target_depth
+    assert pool.stats()["depths"] == {"food": 2, "travel": 2}
+    assert len(calls) == 4
+    assert not pool._refill()
+
+
+def test_short_and_failed_generations_are_not_pooled(make_pool):
+    generate, calls = fake_generator(fail=True)
+    pool = make_pool(generate, min_requests=1)
+    pool.record_request("food", PARAMS)
+    assert not pool._refill()
+    assert len(calls) == 1
+
+    pool = make_pool(lambda **_params: [{"question": "only one"}], min_requests=1)
+    pool.record_request("food", PARAMS)
+    assert pool._refill()
+    assert pool.pop("food") is None
+
+
+def test_stale_quizzes_are_discarded(make_pool):
+    generate, _ = fake_generator()
+    pool = make_pool(generate, target_depth=1, min_requests=1, max_age=-1)
+    pool.record_request("food", PARAMS)
+    pool._refill()
+    assert pool.pop("food") is None
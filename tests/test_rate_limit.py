@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rate_limit import ConcurrencyLimit, TokenBucket
+
+
+def bucket(clock, rate, capacity):
+    return TokenBucket(
+        rate, capacity, clock=clock, sleep=clock.sleep, async_sleep=clock.async_sleep
+    )
+
+
+def test_burst_up_to_capacity_is_free(clock):
+    limiter = bucket(clock, rate=2, capacity=3)
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+
+def test_requests_beyond_capacity_wait_their_turn(clock):
+    limiter = bucket(clock, rate=2, capacity=3)
+    delays = [limiter._reserve() for _ in range(6)]
+    # Queued reservations are paid back one every 1/rate seconds
+    assert delays == [0.0, 0.0, 0.0, 0.5, 1.0, 1.5]
+
+
+def test_acquire_sleeps_until_its_token_is_free(clock):
+    limiter = bucket(clock, rate=4, capacity=1)
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.sleeps == [0.25]
+
+
+def test_tokens_refill_at_rate_up_to_capacity(clock):
+    limiter = bucket(clock, rate=2, capacity=3)
+    for _ in range(3):
+        limiter.acquire()
+    clock.now += 1.0
+    assert [limiter._reserve() for _ in range(3)] == [0.0, 0.0, 0.5]
+    # A long idle period refills no more than capacity
+    clock.now += 60.0
+    assert [limiter._reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 0.5]
+
+
+def test_async_acquire_waits_without_blocking(clock):
+    limiter = bucket(clock, rate=10, capacity=1)
+
+    async def burst():
+        await asyncio.gather(*(limiter.async_acquire() for _ in range(3)))
+
+    asyncio.run(burst())
+    assert clock.async_sleeps == pytest.approx([0.1, 0.2])
+    assert clock.sleeps == []
+
+
+def test_threads_and_coroutines_share_one_concurrency_limit():
+    limit = ConcurrencyLimit(2)
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+
+    def enter():
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+
+    def leave():
+        with lock:
+            in_flight[0] -= 1
+
+    def sync_call():
+        with limit:
+            enter()
+            time.sleep(0.01)
+            leave()
+
+    async def async_call():
+        async with limit:
+            enter()
+            await asyncio.sleep(0.01)
+            leave()
+
+    async def mixed():
+        await asyncio.gather(
+            *(async_call() for _ in range(6)),
+            *(asyncio.to_thread(sync_call) for _ in range(6)),
+        )
+
+    asyncio.run(mixed())
+    assert peak[0] == 2
+    assert in_flight[0] == 0
+
+
+def test_slot_goes_from_a_thread_to_a_waiting_coroutine():
+    limit = ConcurrencyLimit(1)
+    limit.acquire()
+
+    async def wait_for_slot():
+        waiter = asyncio.create_task(limit.async_acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await asyncio.to_thread(limit.release)
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(wait_for_slot())
+    # The slot was handed over, not freed
+    assert limit._free == 0
+
+
+def test_cancelled_coroutine_gives_up_its_place():
+    limit = ConcurrencyLimit(1)
+    limit.acquire()
+
+    async def cancel_then_acquire():
+        waiter = asyncio.create_task(limit.async_acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limit.release()
+        await asyncio.wait_for(limit.async_acquire(), 1)
+
+    asyncio.run(cancel_then_acquire())
+    assert limit._free == 0
@@ -0,0 +1,117 @@
+import pytest
+
+import review
+from review import (
+    DAY,
+    MIN_EASINESS,
+    ReviewItem,
+    ReviewScheduler,
+    UserReviews,
+)
+
+NOW = 1_700_000_000.0
+
+
+def question(i):
+    return {"question": f"Translate sentence {i}", "answer": f"answer {i}"}
+
+
+def test_passing_grades_follow_sm2_intervals():
+    item = ReviewItem("q", "{}", "", NOW)
+    intervals = []
+    for _ in range(4):
+        item.grade(5, NOW)
+        intervals.append(item.interval)
+    # The interval grows by the easiness from before
+    # the answer, which rises 0.1 per perfect answer
+    assert intervals == [1.0, 6.0, round(6.0 * 2.7), round(round(6.0 * 2.7) * 2.8)]
+    assert item.easiness == pytest.approx(2.9)
+    assert item.due == NOW + intervals[-1] * DAY
+
+
+def test_lapse_restarts_schedule_and_lowers_easiness():
+    item = ReviewItem("q", "{}", "", NOW)
+    for _ in range(3):
+        item.grade(4, NOW)
+    item.grade(1, NOW)
+    assert item.repetitions == 0
+    assert item.interval == 1.0
+    assert item.easiness == pytest.approx(2.5 - 0.54)
+
+
+def test_easiness_has_a_floor():
+    item = ReviewItem("q", "{}", "", NOW)
+    for _ in range(10):
+        item.grade(0, NOW)
+    assert item.easiness == MIN_EASINESS
+
+
+def test_user_reviews_returns_due_items_earliest_first():
+    items = [
+        ReviewItem(f"q{i}", "{}", "", NOW + offset)
+        for i, offset in enumerate([50, -10, -30, 0, -20])
+    ]
+    reviews = UserReviews(items, 0)
+    assert [item.key for item in reviews.due(NOW, 10)] == ["q2", "q4", "q1", "q3"]
+    assert [item.key for item in reviews.due(NOW, 2)] == ["q2", "q4"]
+    # Looking does not consume anything
+    assert len(reviews.due(NOW, 10)) == 4
+
+
+def test_rescheduled_items_leave_no_stale_entries_behind():
+    items = [ReviewItem(f"q{i}", "{}", "", NOW - i) for i in range(3)]
+    reviews = UserReviews(items, 0)
+    for sequence in range(100):
+        item = reviews.items["q1"]
+        item.due = NOW + DAY if sequence % 2 == 0 else NOW - 100
+        reviews.push(item, sequence)
+    assert [item.key for item in reviews.due(NOW, 10)] == ["q1", "q2", "q0"]
+    assert len(reviews.heap) <= 2 * len(reviews.items) + 16
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return ReviewScheduler(str(tmp_path / "reviews.db"))
+
+
+def test_only_missed_questions_are_scheduled(scheduler):
+    scheduler.grade("alice", question(1), 5, now=NOW)
+    scheduler.grade("alice", question(2), 1, now=NOW)
+    assert scheduler.due("alice", now=NOW) == []
+    assert scheduler.due("alice", now=NOW + DAY) == [question(2)]
+    assert scheduler.due("bob", now=NOW + DAY) == []
+
+
+def test_reviews_move_questions_out_and_back_in(scheduler):
+    scheduler.grade("alice", question(1), 2, now=NOW)
+    scheduler.grade("alice", question(1), 5, now=NOW + DAY)
+    assert scheduler.due("alice", now=NOW + DAY) == []
+    assert scheduler.due("alice", now=NOW + 2 * DAY) == [question(1)]
+
+
+def test_reviews_are_shared_through_the_database(tmp_path, monkeypatch):
+    path = str(tmp_path / "reviews.db")
+    clock = [0.0]
+    monkeypatch.setattr(review.time, "monotonic", lambda: clock[0])
+    first, second = (
+        ReviewScheduler(path, refresh_interval=60),
+        ReviewScheduler(path, refresh_interval=60),
+    )
+    assert second.due("alice", now=NOW + DAY) == []
+    first.grade("alice", question(1), 0, now=NOW)
+    # The other process reloads the user once its copy is refresh_interval old
+    assert second.due("alice", now=NOW + DAY) == []
+    clock[0] += 61
+    assert second.due("alice", now=NOW + DAY) == [question(1)]
+
+
+def test_only_recent_users_stay_in_memory(tmp_path):
+    scheduler = ReviewScheduler(str(tmp_path / "reviews.db"), max_users=2)
+    for user in ("alice", "bob"):
+        scheduler.grade(user, question(1), 1, now=NOW)
+    scheduler.due("alice", now=NOW)
+    scheduler.grade("carol", question(1), 1, now=NOW)
+    assert list(scheduler._users) == ["alice", "carol"]
+    # An evicted user is reloaded from the database
+    assert scheduler.due("bob", now=NOW + DAY) == [question(1)]
+    assert list(scheduler._users) == ["carol", "bob"]
@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from roadmap_store import SCHEMA, RoadmapStore, career_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RoadmapStore(str(tmp_path / "roadmaps.db"))
+
+
+def test_career_key_ignores_case_and_spacing():
+    assert career_key("  Data   Scientist ") == career_key("data scientist")
+
+
+def test_saved_roadmaps_load_back_after_flush(store):
+    store.save("alice", "Data Scientist ", "1. Statistics")
+    store.flush(timeout=5)
+    assert store.load("alice", "data scientist") == "1. Statistics"
+    assert store.load("bob", "data scientist") is None
+    assert store.load("alice", "Nurse") is None
+    with sqlite3.connect(store.path) as conn:
+        assert conn.execute("SELECT career FROM roadmaps").fetchall() == [
+            ("Data Scientist",)
+        ]
+
+
+def test_saving_a_career_again_replaces_it(store):
+    store.save("alice", "Nurse", "first")
+    store.save("alice", "  nurse", "second")
+    store.save(None, "Nurse", "anonymous")
+    store.flush()
+    assert store.load("alice", "Nurse") == "second"
+    assert store.load(None, "nurse") == "anonymous"
+    assert store.load("", "nurse") == "anonymous"
+
+
+def test_queued_roadmaps_are_written_in_batches(tmp_path):
+    store = RoadmapStore(str(tmp_path / "roadmaps.db"), batch_size=10)
+    # Queue everything before the writer starts, so it finds full batches
+    store._ensure_worker = lambda: None
+    for i in range(25):
+        store.save("alice", f"career {i}", f"roadmap {i}")
+    del store._ensure_worker
+    store._ensure_worker()
+    store.flush(timeout=5)
+    assert store.saved == 25
+    assert store.batches == 3
+    assert store.load("alice", "career 24") == "roadmap 24"
+
+
+def test_failed_batch_is_reported_and_the_writer_keeps_going(store, capsys):
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("DROP TABLE roadmaps")
+    store.save("alice", "Nurse", "lost")
+    store.flush(timeout=5)
+    assert "Could not save 1 roadmap(s)" in capsys.readouterr().out
+    with sqlite3.connect(store.path) as conn:
+        conn.executescript(SCHEMA)
+    store.save("alice", "Nurse", "kept")
+    store.flush(timeout=5)
+    assert store.load("alice", "Nurse") == "kept"
+    assert store.saved == 1
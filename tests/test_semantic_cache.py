@@ -0,0 +1,66 @@
+import pytest
+
+from semantic_cache import SemanticCache, content_words, words_match
+
+CACHED = {
+    "How do I say cat in French?": "chat",
+    "How do I conjugate tener in the present tense?": "tengo, tienes, tiene...",
+    "What is the difference between ser and estar?": "ser is permanent...",
+}
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache(capacity=50, dim=2048)
+    for prompt, answer in CACHED.items():
+        cache.set("chat", prompt, answer)
+    return cache
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    [
+        "How do I say dog in French?",
+        "How do I say cat in Spanish?",
+        "How do I say black cat in French?",
+        "How do I conjugate poder in the present tense?",
+        "How do I conjugate tener in the past tense?",
+        "What is the difference between por and para?",
+    ],
+)
+def test_near_misses_do_not_hit(cache, prompt):
+    assert cache.get("chat", prompt) is None
+
+
+@pytest.mark.parametrize(
+    "prompt, answer",
+    [
+        ("how do I say cat in French", "chat"),
+        ("How do I say cats in French?", "chat"),
+        ("How can I conjugate tener in the present tense?", "tengo, tienes, tiene..."),
+        ("what's the difference between ser and estar", "ser is permanent..."),
+    ],
+)
+def test_rewordings_hit(cache, prompt, answer):
+    assert cache.get("chat", prompt) == answer
+
+
+def test_namespaces_are_separate(cache):
+    assert (
+        cache.get("exercise|French|Vocabulary", "How do I say cat in French?") is None
+    )
+
+
+def test_least_recently_used_entry_is_replaced():
+    cache = SemanticCache(capacity=2, dim=512)
+    cache.set("chat", "colors in German", "rot, blau")
+    cache.set("chat", "numbers in German", "eins, zwei")
+    cache.get("chat", "colors in German")
+    cache.set("chat", "animals in German", "Hund, Katze")
+    assert cache.get("chat", "numbers in German") is None
+    assert cache.get("chat", "colors in German") == "rot, blau"
+
+
+def test_spelling_variants_count_as_the_same_word():
+    assert words_match(content_words("colour words"), content_words("color words"))
+    assert not words_match(content_words("cat"), content_words("car"))
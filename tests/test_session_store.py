@@ -0,0 +1,102 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import session_store
+from session_store import FileSessionStore, SQLiteSessionStore
+
+
+def test_fragments_persist_only_on_their_own_reruns(monkeypatch):
+    calls = []
+    monkeypatch.setattr(session_store, "persist_session", lambda: calls.append(1))
+    for fragment_ids, expected in ((None, 0), ([], 0), (["fragment"], 1)):
+        calls.clear()
+        ctx = SimpleNamespace(fragment_ids_this_run=fragment_ids)
+        monkeypatch.setattr(session_store, "get_script_run_ctx", lambda ctx=ctx: ctx)
+        session_store.persist_fragment()
+        assert len(calls) == expected
+    monkeypatch.setattr(session_store, "get_script_run_ctx", lambda: None)
+    session_store.persist_fragment()
+    assert not calls[1:]
+
+
+@pytest.fixture
+def browser(monkeypatch, tmp_path):
+    """One browser tab: fresh session state, and a URL that keeps the session id."""
+    monkeypatch.setattr(
+        session_store, "sessions", SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    )
+    url = {}
+
+    def open_tab(user):
+        state = {"user": user}
+        monkeypatch.setattr(
+            session_store, "st", SimpleNamespace(session_state=state, query_params=url)
+        )
+        return state
+
+    return open_tab
+
+
+def test_state_is_restored_only_for_its_owner(browser):
+    state = browser("alice")
+    state["quiz"] = [{"question": "Hola?", "answer": "Hello"}]
+    state["q0"] = "Hello"
+    session_store.persist_session()
+
+    # Someone else signed in on the same URL gets nothing of alice's
+    state = browser("mallory")
+    session_store.restore_session()
+    assert state == {"user": "mallory", "_session_restored": "mallory"}
+
+    state = browser("alice")
+    session_store.restore_session()
+    assert state["quiz"] == [{"question": "Hola?", "answer": "Hello"}]
+    assert state["q0"] == "Hello"
+    assert state["user"] == "alice"
+
+
+def test_oversized_state_is_trimmed_in_store_and_memory(browser, monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_MAX_BYTES", 1024)
+    state = browser("alice")
+    state["quiz"] = [{"question": "Hola?", "answer": "Hello"}]
+    state["quiz_results"] = [True]
+    state["user_answers"] = {0: "Hello"}
+    # Incompressible, so it alone is over the limit
+    state["current_hint"] = os.urandom(1024).hex()
+    session_store.persist_session()
+    assert state["current_hint"] is None
+    assert state["user_answers"] == {0: "Hello"}
+
+    restored = browser("alice")
+    session_store.restore_session()
+    assert "current_hint" not in restored
+    assert restored["quiz_results"] == [True]
+    assert restored["user_answers"] == {0: "Hello"}
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "file"])
+def test_sessions_expire_after_ttl(backend, tmp_path, monkeypatch):
+    if backend == "sqlite":
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    else:
+        store = FileSessionStore(str(tmp_path / "sessions"))
+    store.save("fresh", b"state")
+    store.save("stale", b"state")
+    assert store.load("stale") == b"state"
+
+    now = time.time()
+    later = now + session_store.SESSION_TTL + 1
+    if backend == "sqlite":
+        monkeypatch.setattr(session_store.time, "time", lambda: later)
+        store.save("fresh", b"state")
+    else:
+        os.utime(store._path("stale"), (now - session_store.SESSION_TTL - 1,) * 2)
+    assert store.load("stale") is None
+    assert store.load("fresh") == b"state"
+    store.purge()
+    monkeypatch.undo()
+    assert store.load("stale") is None
+    assert store.load("fresh") == b"state"
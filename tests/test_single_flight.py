@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class Interrupted(BaseException):
+    """Stands in for Streamlit's RerunException/StopException."""
+
+
+def start_follower(flight, key, results):
+    def follow():
+        try:
+            results.append(flight.do(key, lambda: "follower"))
+        except Exception as e:
+            results.append(e)
+
+    thread = threading.Thread(target=follow, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def leader():
+        calls.append(1)
+        release.wait(5)
+        return "leader"
+
+    results = []
+    leader_thread = threading.Thread(
+        target=lambda: results.append(flight.do("k", leader))
+    )
+    leader_thread.start()
+    while flight.leaders == 0:
+        time.sleep(0.001)
+    follower = start_follower(flight, "k", results)
+    while flight.followers == 0:
+        time.sleep(0.001)
+    release.set()
+    leader_thread.join(5)
+    follower.join(5)
+    assert results == ["leader", "leader"]
+    assert len(calls) == 1
+
+
+def test_leader_exception_reaches_followers_and_clears_the_key():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def leader():
+        release.wait(5)
+        raise ValueError("boom")
+
+    leader_thread = threading.Thread(
+        target=lambda: pytest.raises(ValueError, flight.do, "k", leader)
+    )
+    leader_thread.start()
+    while flight.leaders == 0:
+        time.sleep(0.001)
+    results = []
+    follower = start_follower(flight, "k", results)
+    while flight.followers == 0:
+        time.sleep(0.001)
+    release.set()
+    follower.join(5)
+    assert isinstance(results[0], ValueError)
+    assert flight.do("k", lambda: "fresh") == "fresh"
+
+
+def test_interrupted_leader_does_not_strand_followers():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def leader():
+        release.wait(5)
+        raise Interrupted()
+
+    def lead():
+        with pytest.raises(Interrupted):
+            flight.do("k", leader)
+
+    leader_thread = threading.Thread(target=lead)
+    leader_thread.start()
+    while flight.leaders == 0:
+        time.sleep(0.001)
+    results = []
+    follower = start_follower(flight, "k", results)
+    while flight.followers == 0:
+        time.sleep(0.001)
+    release.set()
+    follower.join(5)
+    assert not follower.is_alive()
+    # The follower retried as the new leader rather than inheriting the interruption
+    assert results == ["follower"]
+    assert flight.do("k", lambda: "fresh") == "fresh"
+
+
+def test_follower_runs_the_call_itself_after_the_timeout():
+    flight = SingleFlight(follower_timeout=0.05)
+    release = threading.Event()
+    leader_thread = threading.Thread(
+        target=lambda: flight.do("k", lambda: release.wait(5))
+    )
+    leader_thread.start()
+    while flight.leaders == 0:
+        time.sleep(0.001)
+    assert flight.do("k", lambda: "follower") == "follower"
+    release.set()
+    leader_thread.join(5)
+
+
+def test_cancelled_async_leader_does_not_strand_followers():
+    flight = SingleFlight()
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        leader = asyncio.ensure_future(flight.async_do("k", slow))
+        await started.wait()
+
+        async def quick():
+            return "follower"
+
+        follower = asyncio.ensure_future(flight.async_do("k", quick))
+        await asyncio.sleep(0)
+        leader.cancel()
+        result = await asyncio.wait_for(follower, 2)
+        assert leader.cancelled()
+        return result
+
+    assert asyncio.run(scenario()) == "follower"
+    assert flight.do("k", lambda: "fresh") == "fresh"
@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+
+import pytest
+
+from sqlite_db import SQLiteDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "test.db"), pool_size=2)
+    db.executescript("CREATE TABLE items (name TEXT PRIMARY KEY)")
+    return db
+
+
+def names(db):
+    with db.connection() as conn:
+        return [row[0] for row in conn.execute("SELECT name FROM items ORDER BY name")]
+
+
+def test_connections_are_in_wal_mode(db):
+    with db.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_transaction_commits(db):
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO items VALUES ('a')")
+        conn.execute("INSERT INTO items VALUES ('b')")
+    assert names(db) == ["a", "b"]
+
+
+def test_transaction_rolls_back_on_error(db):
+    with pytest.raises(sqlite3.IntegrityError), db.transaction() as conn:
+        conn.execute("INSERT INTO items VALUES ('a')")
+        conn.execute("INSERT INTO items VALUES ('a')")
+    assert names(db) == []
+    # The connection went back to the pool usable
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO items VALUES ('c')")
+    assert names(db) == ["c"]
+
+
+def test_pool_is_shared_by_threads(db):
+    def insert(i):
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES (?)", (f"item {i:02}",))
+
+    threads = [threading.Thread(target=insert, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(names(db)) == 20
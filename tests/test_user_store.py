@@ -0,0 +1,181 @@
+import sqlite3
+import threading
+
+from user_store import MAX_WEAK_AREAS, SQLiteUserStore, add_weak_area
+
+OLD_SCHEMA = """
+CREATE TABLE users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    level INTEGER NOT NULL DEFAULT 1,
+    experience INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 0,
+    completed_quizzes INTEGER NOT NULL DEFAULT 0,
+    weak_areas TEXT NOT NULL DEFAULT '[]'
+);
+"""
+
+
+def test_user_ids_survive_vacuum(tmp_path):
+    store = SQLiteUserStore(str(tmp_path / "users.db"))
+    for name in ("alice", "bob", "carol"):
+        assert store.create_user(name, {"password": "pw"})
+    ids = {name: store.user_id(name) for name in ("alice", "bob", "carol")}
+    store.update_user("alice", {"experience": 10})
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("DELETE FROM users WHERE username = 'alice'")
+    with sqlite3.connect(store.path, isolation_level=None) as conn:
+        conn.execute("VACUUM")
+    assert store.user_id("bob") == ids["bob"]
+    assert store.user_id("carol") == ids["carol"]
+    assert store.usernames(ids.values()) == {ids["bob"]: "bob", ids["carol"]: "carol"}
+    # A new account never takes a deleted user's id
+    store.create_user("dave", {"password": "pw"})
+    assert store.user_id("dave") not in ids.values()
+
+
+def test_migration_keeps_rowids_as_ids(tmp_path):
+    path = str(tmp_path / "users.db")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(OLD_SCHEMA)
+        conn.executemany(
+            "INSERT INTO users (rowid, username, password, experience) "
+            "VALUES (?, ?, 'pw', ?)",
+            [(3, "alice", 30), (7, "bob", 70)],
+        )
+    store = SQLiteUserStore(path)
+    assert store.user_id("alice") == 3
+    assert store.user_id("bob") == 7
+    assert store.get_user("bob")["experience"] == 70
+    assert "id" not in store.get_user("bob")
+    assert store.leaderboard() == [("bob", 70, 0), ("alice", 30, 0)]
+    assert not store.create_user("alice", {"password": "other"})
+    assert store.create_user("carol", {"password": "pw"})
+    assert store.user_id("carol") > 7
+    # Opening the migrated database again leaves it alone
+    assert SQLiteUserStore(path).user_id("bob") == 7
+
+
+def test_passwords_are_hashed(tmp_path):
+    store = SQLiteUserStore(str(tmp_path / "users.db"))
+    store.create_user("alice", {"password": "secret"})
+    with sqlite3.connect(store.path) as conn:
+        stored = conn.execute("SELECT password FROM users").fetchone()[0]
+    assert "secret" not in stored
+    assert "password" not in store.get_user("alice")
+    assert store.verify_password("alice", "secret")
+    assert not store.verify_password("alice", "Secret")
+    assert not store.verify_password("bob", "secret")
+    store.update_user("alice", {"password": "new secret"})
+    assert store.verify_password("alice", "new secret")
+    assert not store.verify_password("alice", "secret")
+
+
+def test_same_password_gets_different_salts(tmp_path):
+    store = SQLiteUserStore(str(tmp_path / "users.db"))
+    store.create_user("alice", {"password": "secret"})
+    store.create_user("bob", {"password": "secret"})
+    with sqlite3.connect(store.path) as conn:
+        first, second = (row[0] for row in conn.execute("SELECT password FROM users"))
+    assert first != second
+
+
+def test_migration_hashes_plaintext_passwords(tmp_path):
+    path = str(tmp_path / "users.db")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(OLD_SCHEMA)
+        conn.execute(
+            "INSERT INTO users (username, password) VALUES ('alice', 'secret')"
+        )
+    store = SQLiteUserStore(path)
+    with sqlite3.connect(path) as conn:
+        assert (
+            conn.execute("SELECT password FROM users")
+            .fetchone()[0]
+            .startswith("scrypt$")
+        )
+    assert store.verify_password("alice", "secret")
+    assert not store.verify_password("alice", "scrypt")
+
+
+def test_leaderboard_and_rank(tmp_path):
+    store = SQLiteUserStore(str(tmp_path / "users.db"))
+    for name, experience in [("alice", 50), ("bob", 80), ("carol", 50), ("dave", 10)]:
+        store.create_user(name, {"password": "pw"})
+        store.increment(name, {"experience": experience})
+    assert [row[0] for row in store.leaderboard(3)] == ["bob", "alice", "carol"]
+    # Users with the same experience share a rank
+    assert [store.rank(name) for name in ("bob", "alice", "carol", "dave")] == [
+        1,
+        2,
+        2,
+        4,
+    ]
+    assert store.rank("erin") is None
+    assert store.count() == 4
+    # Another process's update shows up on the next read
+    SQLiteUserStore(store.path).increment("dave", {"experience": 100})
+    assert store.rank("dave") == 1
+    assert store.leaderboard(1) == [("dave", 110, 0)]
+
+
+def test_experience_counts_follow_every_write(tmp_path):
+    store = SQLiteUserStore(str(tmp_path / "users.db"))
+    store.create_user("alice", {"password": "pw", "experience": 30})
+    store.create_user("bob", {"password": "pw"})
+    store.create_user("alice", {"password": "pw"})
+    store.update_user("bob", {"experience": 30})
+    store.increment("alice", {"experience": 80}, level_threshold=100)
+    store.increment("bob", {"streak": 1})
+
+    def counts():
+        with sqlite3.connect(store.path) as conn:
+            return dict(conn.execute("SELECT * FROM experience_counts"))
+
+    def recounted():
+        with sqlite3.connect(store.path) as conn:
+            return dict(
+                conn.execute(
+                    "SELECT experience, COUNT(*) FROM users GROUP BY experience"
+                )
+            )
+
+    assert counts() == recounted() == {10: 1, 30: 1}
+    assert [store.rank("bob"), store.rank("alice")] == [1, 2]
+    assert store.count() == 2
+
+    # A database from before experience_counts gets it filled on open
+    with sqlite3.connect(store.path) as conn:
+        conn.executescript(
+            "DROP TABLE experience_counts; DROP TRIGGER users_counted; "
+            "DROP TRIGGER users_uncounted; DROP TRIGGER users_recounted;"
+        )
+    SQLiteUserStore(store.path)
+    assert counts() == {10: 1, 30: 1}
+
+
+def test_add_weak_area():
+    areas = add_weak_area(["food", "travel"], "  Travel ")
+    assert areas == ["Travel", "food"]
+    assert add_weak_area(areas, " ") == areas
+    assert len(add_weak_area([f"topic {i}" for i in range(20)], "new")) == (
+        MAX_WEAK_AREAS
+    )
+
+
+def test_concurrent_weak_areas_are_all_kept(tmp_path):
+    path = str(tmp_path / "users.db")
+    SQLiteUserStore(path).create_user("alice", {"password": "pw"})
+    stores = [SQLiteUserStore(path, pool_size=1) for _ in range(2)]
+    topics = [f"topic {i}" for i in range(MAX_WEAK_AREAS)]
+    threads = [
+        threading.Thread(target=stores[i % 2].add_weak_area, args=("alice", topic))
+        for i, topic in enumerate(topics)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(stores[0].get_user("alice")["weak_areas"]) == sorted(topics)
+    stores[0].add_weak_area("bob", "food")
+    assert stores[0].get_user("bob") is None
@@ -0,0 +1,327 @@
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+
+from sqlite_db import SQLiteDatabase
+
+# Columns a user record carries besides its username, with their defaults for new
+# accounts. The password is hashed on the way in and never returned by get_user().
+USER_DEFAULTS = {
+    "password": "",
+    "level": 1,
+    "experience": 0,
+    "streak": 0,
+    "completed_quizzes": 0,
+    "weak_areas": [],
+}
+# scrypt cost parameters for new password hashes;
+# stored hashes record the ones they used
+SCRYPT_N = 2**14
+SCRYPT_R = 8
+SCRYPT_P = 1
+# Weak areas kept per user, most recent first
+MAX_WEAK_AREAS = 10
+COUNTER_COLUMNS = ("level", "experience", "streak", "completed_quizzes")
+JSON_COLUMNS = ("weak_areas",)
+
+# id is the user's stable numeric id, which progress events refer to. AUTOINCREMENT
+# keeps a deleted user's id from being handed to a new account.
+USERS_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    level INTEGER NOT NULL DEFAULT 1,
+    experience INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 0,
+    completed_quizzes INTEGER NOT NULL DEFAULT 0,
+    weak_areas TEXT NOT NULL DEFAULT '[]'
+);
+"""
+# experience_counts holds how many users have each experience value. Its triggers
+# keep it current in the same transaction as every write to users, so rank() and
+# count() sum one row per distinct experience value instead of counting users.
+SCHEMA = (
+    USERS_TABLE.format(table="users")
+    + """
+CREATE INDEX IF NOT EXISTS users_by_experience ON users (experience DESC, username);
+CREATE TABLE IF NOT EXISTS experience_counts (
+    experience INTEGER PRIMARY KEY,
+    users INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS users_counted AFTER INSERT ON users BEGIN
+    INSERT INTO experience_counts VALUES (NEW.experience, 1)
+    ON CONFLICT (experience) DO UPDATE SET users = users + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS users_uncounted AFTER DELETE ON users BEGIN
+    UPDATE experience_counts SET users = users - 1 WHERE experience = OLD.experience;
+    DELETE FROM experience_counts WHERE experience = OLD.experience AND users = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS users_recounted AFTER UPDATE OF experience ON users
+WHEN OLD.experience != NEW.experience BEGIN
+    UPDATE experience_counts SET users = users - 1 WHERE experience = OLD.experience;
+    DELETE FROM experience_counts WHERE experience = OLD.experience AND users = 0;
+    INSERT INTO experience_counts VALUES (NEW.experience, 1)
+    ON CONFLICT (experience) DO UPDATE SET users = users + 1;
+END;
+"""
+)
+
+
+def hash_password(password):
+    """Return a salted scrypt hash of password as "scrypt$n$r$p$salt$hash"."""
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(
+        password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P
+    )
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+def add_weak_area(weak_areas, topic):
+    """Return weak_areas with topic moved to the front, capped at MAX_WEAK_AREAS."""
+    topic = " ".join(topic.split())
+    if not topic:
+        return weak_areas
+    return [topic] + [area for area in weak_areas if area.lower() != topic.lower()][
+        : MAX_WEAK_AREAS - 1
+    ]
+
+
+def check_password(password, stored):
+    """Compare password with a hash_password() hash in constant time."""
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = bytes.fromhex(digest)
+        actual = hashlib.scrypt(
+            password.encode(),
+            salt=bytes.fromhex(salt),
+            n=int(n),
+            r=int(r),
+            p=int(p),
+            dklen=len(expected),
+        )
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+class SQLiteUserStore:
+    """User accounts in a SQLite database in WAL mode, shared by every app process.
+
+    Connections come from a small pool so concurrent Streamlit sessions don't serialize
+    on one handle, and counters are changed with UPDATE ... SET x = x + ? so concurrent
+    updates from several processes are never lost. Passwords are stored as salted scrypt
+    hashes.
+    """
+
+    def __init__(self, path, pool_size=4, timeout=10.0):
+        self.path = path
+        self._db = SQLiteDatabase(path, pool_size, timeout, row_factory=sqlite3.Row)
+        self._migrate()
+        self._db.executescript(SCHEMA)
+        self._count_experience()
+
+    def _migrate(self):
+        """Bring a users table from an older version up to date.
+
+        A table created before the id column gets one, holding the old rowids: progress
+        events recorded before the migration refer to users by rowid, which VACUUM may
+        renumber in a table without an INTEGER PRIMARY KEY. Plaintext passwords are
+        replaced by their hashes.
+        """
+        with self._db.transaction() as conn:
+            columns = [row["name"] for row in conn.execute("PRAGMA table_info(users)")]
+            if not columns:
+                return
+            if "id" not in columns:
+                conn.execute(USERS_TABLE.format(table="users_migrated"))
+                conn.execute(
+                    f"INSERT INTO users_migrated (id, {', '.join(columns)}) "
+                    f"SELECT rowid, {', '.join(columns)} FROM users"
+                )
+                conn.execute("DROP TABLE users")
+                conn.execute("ALTER TABLE users_migrated RENAME TO users")
+            # Accounts created before passwords were hashed;
+            # a one-time cost of one hash per account
+            rows = conn.execute(
+                "SELECT id, password FROM users WHERE password NOT LIKE 'scrypt$%' "
+                "AND password != ''"
+            ).fetchall()
+            conn.executemany(
+                "UPDATE users SET password = ? WHERE id = ?",
+                [(hash_password(row["password"]), row["id"]) for row in rows],
+            )
+
+    def _count_experience(self):
+        """Fill experience_counts for users that predate it."""
+        with self._db.transaction() as conn:
+            if conn.execute("SELECT 1 FROM experience_counts LIMIT 1").fetchone():
+                return
+            conn.execute(
+                "INSERT INTO experience_counts "
+                "SELECT experience, COUNT(*) FROM users GROUP BY experience"
+            )
+
+    @staticmethod
+    def _row_to_user(row):
+        if row is None:
+            return None
+        user = dict(row)
+        del user["id"], user["username"], user["password"]
+        for column in JSON_COLUMNS:
+            user[column] = json.loads(user[column])
+        return user
+
+    @staticmethod
+    def _encode(data):
+        values = {
+            column: json.dumps(value) if column in JSON_COLUMNS else value
+            for column, value in data.items()
+            if column in USER_DEFAULTS
+        }
+        if values.get("password"):
+            values["password"] = hash_password(values["password"])
+        return values
+
+    def create_user(self, username, data):
+        """Insert a new user; returns False if the username is taken."""
+        values = self._encode({**USER_DEFAULTS, **data})
+        columns = ", ".join(["username", *values])
+        placeholders = ", ".join("?" * (len(values) + 1))
+        with self._db.connection() as conn:
+            cursor = conn.execute(
+                f"INSERT OR IGNORE INTO users ({columns}) VALUES ({placeholders})",
+                [username, *values.values()],
+            )
+            return cursor.rowcount == 1
+
+    def get_user(self, username):
+        with self._db.connection() as conn:
+            row = conn.execute(
+                "SELECT * FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return self._row_to_user(row)
+
+    def verify_password(self, username, password):
+        """Return True if username exists and password is theirs."""
+        with self._db.connection() as conn:
+            row = conn.execute(
+                "SELECT password FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return row is not None and check_password(password, row["password"])
+
+    def update_user(self, username, data):
+        """Overwrite the given fields of an existing user."""
+        values = self._encode(data)
+        if not values:
+            return
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with self._db.connection() as conn:
+            conn.execute(
+                f"UPDATE users SET {assignments} WHERE username = ?",
+                [*values.values(), username],
+            )
+
+    def increment(self, username, deltas, level_threshold=None):
+        """Atomically add deltas to counter columns and return the updated user.
+
+        With level_threshold, a user whose experience reaches it afterwards gains a
+        level and has the threshold subtracted from their experience, in the same
+        transaction.
+        """
+        deltas = {
+            column: delta
+            for column, delta in deltas.items()
+            if column in COUNTER_COLUMNS
+        }
+        with self._db.transaction() as conn:
+            if deltas:
+                assignments = ", ".join(f"{column} = {column} + ?" for column in deltas)
+                conn.execute(
+                    f"UPDATE users SET {assignments} WHERE username = ?",
+                    [*deltas.values(), username],
+                )
+            if level_threshold is not None:
+                conn.execute(
+                    "UPDATE users SET level = level + 1, experience = experience - ? "
+                    "WHERE username = ? AND experience >= ?",
+                    (level_threshold, username, level_threshold),
+                )
+            row = conn.execute(
+                "SELECT * FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return self._row_to_user(row)
+
+    def add_weak_area(self, username, topic):
+        """Atomically move topic to the front of the user's weak areas."""
+        with self._db.transaction() as conn:
+            row = conn.execute(
+                "SELECT weak_areas FROM users WHERE username = ?", (username,)
+            ).fetchone()
+            if row is None:
+                return
+            conn.execute(
+                "UPDATE users SET weak_areas = ? WHERE username = ?",
+                (json.dumps(add_weak_area(json.loads(row[0]), topic)), username),
+            )
+
+    def leaderboard(self, limit=10):
+        """Return (username, experience, completed_quizzes), best first."""
+        with self._db.connection() as conn:
+            rows = conn.execute(
+                "SELECT username, experience, completed_quizzes FROM users "
+                "ORDER BY experience DESC, username LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def rank(self, username):
+        """Return the user's 1-based leaderboard rank, or None if there is no such user.
+
+        Users with the same experience share a rank, one more than the number of users
+        with more experience, which is summed from experience_counts.
+        """
+        with self._db.connection() as conn:
+            row = conn.execute(
+                "SELECT experience FROM users WHERE username = ?", (username,)
+            ).fetchone()
+            if row is None:
+                return None
+            ahead = conn.execute(
+                "SELECT COALESCE(SUM(users), 0) FROM experience_counts "
+                "WHERE experience > ?",
+                (row[0],),
+            ).fetchone()[0]
+        return ahead + 1
+
+    def user_id(self, username):
+        """Return the user's numeric id, or None if there is no such user."""
+        with self._db.connection() as conn:
+            row = conn.execute(
+                "SELECT id FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def usernames(self, user_ids):
+        """Map numeric user ids back to usernames."""
+        user_ids = [int(user_id) for user_id in user_ids]
+        names = {}
+        with self._db.connection() as conn:
+            # Stay under SQLite's limit on bound parameters
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start : start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT id, username FROM users WHERE id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                names.update((row[0], row[1]) for row in rows)
+        return names
+
+    def count(self):
+        with self._db.connection() as conn:
+            return conn.execute(
+                "SELECT COALESCE(SUM(users), 0) FROM experience_counts"
+            ).fetchone()[0]